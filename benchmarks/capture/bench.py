@@ -0,0 +1,242 @@
+"""
+Capture throughput and latency benchmarks.
+
+Drives ``capture_command`` (pipe and PTY engines) with the synthetic producers
+in producers.py and prints one JSON document with, per scenario and engine:
+
+- ``mb_per_s``: captured bytes over the time from the producer starting to
+  ``capture_command`` returning (login-shell startup is excluded)
+- ``read_syscalls_per_mb`` / ``mirror_writes_per_mb``
+- ``peak_rss_kb``: max RSS of the capturing process (each run is a fresh process)
+- ``latency_ms``: child write → mirrored output, from ``@@T`` markers
+- ``exit_latency_ms``: child's last write before exiting → ``capture_command`` returning
+- ``ttfb_ms``: child started → first output byte read
+
+The ``pipe-unbuffered`` engine is the pipe engine with ``unbuffer=True``; the
+``buffered`` scenario (a Python child using print()) shows what it changes.
+
+Usage (from the repository root)::
+
+    python benchmarks/capture/bench.py --out results.json
+    python benchmarks/capture/bench.py --scenario firehose --engine pty --scale 4
+    python benchmarks/capture/bench.py --baseline old.json   # exit 1 on regressions
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+PRODUCERS = Path(__file__).resolve().with_name("producers.py")
+SCENARIOS = ("firehose", "tiny", "idle", "stdin", "spinner", "buffered")
+ENGINES = ("pipe", "pty", "pipe-unbuffered")
+_MARKER_RE = re.compile(rb"@@([STX])(\d+)")
+MB = 1 << 20
+
+
+def _producer_cmd(scenario: str, scale: float) -> str:
+    args = {
+        "firehose": ["firehose", str(int(64 * MB * scale))],
+        "tiny": ["tiny", str(int(200_000 * scale))],
+        "idle": ["idle", str(max(1, int(20 * scale))), "0.1"],
+        "stdin": ["echo"],
+        "spinner": ["spinner", str(int(5000 * scale))],
+        "buffered": ["buffered", str(max(1, int(20 * scale))), "0.1"],
+    }[scenario]
+    return shlex.join([sys.executable, str(PRODUCERS), *args])
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_one(scenario: str, engine: str, scale: float) -> dict:
+    """Run a single scenario in this process and return its measurements."""
+    from loopster.capture import sinks
+    from loopster.capture.stats import CaptureStats
+
+    latencies: list[float] = []
+    state = {"start": 0, "exit": 0, "carry": b""}
+    write_stdout = sinks._write_stdout
+
+    def timed_write(data: bytes) -> None:
+        write_stdout(data)
+        now = time.time_ns()
+        text = state["carry"] + data
+        for kind, stamp in _MARKER_RE.findall(text):
+            if kind == b"T":
+                latencies.append((now - int(stamp)) / 1e6)
+            elif kind == b"S":
+                state["start"] = int(stamp)
+            else:
+                state["exit"] = int(stamp)
+        # Keep a partial marker that may continue in the next write
+        cut = text.rfind(b"@@")
+        state["carry"] = text[cut:] if cut != -1 and b"\n" not in text[cut:] else b""
+
+    sinks._write_stdout = timed_write
+
+    if engine == "pty":
+        from loopster.capture.pty_capture import capture_command
+    else:
+        from loopster.capture.pipe_capture import capture_command
+
+    stats = CaptureStats()
+    with tempfile.TemporaryDirectory(prefix="loopster_bench_") as tmp:
+        kwargs: dict = {}
+        if scenario == "stdin":
+            feed = Path(tmp) / "input.txt"
+            line = b"x" * 99 + b"\n"
+            with feed.open("wb") as fh:
+                for _ in range(int(16 * MB * scale) // len(line)):
+                    fh.write(line)
+                fh.write(b"@@END\n")
+            kwargs["input_file"] = str(feed)
+        if engine == "pty":
+            kwargs["forward_stdin"] = False
+        elif engine == "pipe-unbuffered":
+            kwargs["unbuffer"] = True
+        if scenario == "buffered":
+            # Start from a buffered child even if the caller's shell sets this
+            kwargs["env"] = {k: v for k, v in os.environ.items() if k != "PYTHONUNBUFFERED"}
+        code = capture_command(
+            _producer_cmd(scenario, scale),
+            str(Path(tmp) / "session.log"),
+            timeout=600,
+            stats=stats,
+            **kwargs,
+        )
+        done = time.time_ns()
+
+    elapsed = (done - state["start"]) / 1e9 if state["start"] else 0.0
+    mb = stats.bytes_read / MB
+    result = {
+        "scenario": scenario,
+        "engine": engine,
+        "exit_code": code,
+        "bytes": stats.bytes_read,
+        "seconds": round(elapsed, 4),
+        "mb_per_s": round(mb / elapsed, 2) if elapsed else None,
+        "read_calls": stats.read_calls,
+        "bytes_per_read": round(stats.bytes_per_read, 1),
+        "read_syscalls_per_mb": round(stats.read_calls / mb, 1) if mb else None,
+        "mirror_writes_per_mb": round(stats.mirror_writes / mb, 1) if mb else None,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "latency_ms": None,
+        "exit_latency_ms": round((done - state["exit"]) / 1e6, 2) if state["exit"] else None,
+        "ttfb_ms": round(stats.first_output_seconds * 1000, 2) if stats.first_output_seconds is not None else None,
+    }
+    if latencies:
+        result["latency_ms"] = {
+            "samples": len(latencies),
+            "p50": round(_percentile(latencies, 0.5), 3),
+            "p95": round(_percentile(latencies, 0.95), 3),
+            "max": round(max(latencies), 3),
+        }
+    return result
+
+
+def _run_isolated(scenario: str, engine: str, scale: float) -> dict:
+    # A fresh interpreter per run keeps peak RSS meaningful
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as fh:
+        out = fh.name
+    try:
+        subprocess.run(
+            [sys.executable, __file__, "--single", scenario, engine, "--scale", str(scale), "--out", out],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        return json.loads(Path(out).read_text())
+    finally:
+        os.unlink(out)
+
+
+# Metrics where a larger value is a regression (throughput and latency are checked separately)
+_LOWER_IS_BETTER = ("read_syscalls_per_mb", "peak_rss_kb", "exit_latency_ms")
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """Describe every metric that got worse than `baseline` by more than `tolerance`."""
+    old = {(r["scenario"], r["engine"]): r for r in baseline}
+    problems = []
+    for r in results:
+        base = old.get((r["scenario"], r["engine"]))
+        if base is None:
+            continue
+        label = f"{r['scenario']}/{r['engine']}"
+        if base.get("mb_per_s") and r.get("mb_per_s") is not None:
+            if r["mb_per_s"] < base["mb_per_s"] * (1 - tolerance):
+                problems.append(f"{label}: mb_per_s {base['mb_per_s']} → {r['mb_per_s']}")
+        for key in _LOWER_IS_BETTER:
+            if base.get(key) and r.get(key) is not None and r[key] > base[key] * (1 + tolerance):
+                problems.append(f"{label}: {key} {base[key]} → {r[key]}")
+        if base.get("latency_ms") and r.get("latency_ms"):
+            if r["latency_ms"]["p95"] > base["latency_ms"]["p95"] * (1 + tolerance):
+                problems.append(f"{label}: latency p95 {base['latency_ms']['p95']} → {r['latency_ms']['p95']}")
+    return problems
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark loopster capture engines")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenario to run (repeatable)")
+    parser.add_argument("--engine", action="append", choices=ENGINES, help="Engine to run (repeatable)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every workload size")
+    parser.add_argument("--out", type=str, default=None, help="Write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", type=str, default=None, help="Earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (default 0.2)")
+    parser.add_argument("--single", nargs=2, metavar=("SCENARIO", "ENGINE"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single:
+        result = run_one(args.single[0], args.single[1], args.scale)
+        Path(args.out).write_text(json.dumps(result))
+        return 0
+
+    results = []
+    for scenario in args.scenario or SCENARIOS:
+        for engine in args.engine or ENGINES:
+            print(f"[bench] {scenario}/{engine} …", file=sys.stderr)
+            results.append(_run_isolated(scenario, engine, args.scale))
+    from loopster import __version__
+
+    report = {
+        "meta": {
+            "loopster": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "timestamp": int(time.time()),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2) + "\n"
+    if args.out:
+        Path(args.out).write_text(text)
+    else:
+        sys.stdout.write(text)
+
+    if args.baseline:
+        problems = compare(results, json.loads(Path(args.baseline).read_text())["results"], args.tolerance)
+        for line in problems:
+            print(f"[bench] regression: {line}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+"""
+Synthetic children for the capture benchmarks.
+
+Each producer writes to stdout and, where latency is measured, embeds markers
+``@@T<ns>`` (the wall clock in ns at the moment of the write). Every producer
+starts with ``@@S<ns>`` (so shell startup can be left out of throughput) and
+ends with ``@@X<ns>`` written just before it exits, so the harness can measure
+how long loopster takes to notice the exit.
+
+    python producers.py firehose BYTES
+    python producers.py tiny COUNT
+    python producers.py idle GAPS GAP_SECONDS
+    python producers.py echo            # copy stdin to stdout until an @@END line
+    python producers.py spinner FRAMES
+    python producers.py buffered LINES GAP_SECONDS   # print(), i.e. stdio buffering
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+
+
+def _write(data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        n = os.write(1, view)
+        view = view[n:]
+
+
+def _marker(kind: str) -> bytes:
+    return f"@@{kind}{time.time_ns()}\n".encode()
+
+
+def firehose(total: int) -> None:
+    # Same shape as `yes`: short lines, written in large blocks
+    block = b"y\n" * 32768
+    left = total
+    while left > 0:
+        _write(block[:left])
+        left -= len(block)
+
+
+def tiny(count: int) -> None:
+    # One write(2) per short line, like an unbuffered logger; every 1000th is timed
+    for n in range(count):
+        if n % 1000 == 0:
+            _write(_marker("T"))
+        else:
+            _write(b"tick %d\n" % n)
+
+
+def idle(gaps: int, gap: float) -> None:
+    for _ in range(gaps):
+        time.sleep(gap)
+        _write(_marker("T"))
+
+
+def echo() -> None:
+    # A terminal never reports EOF on its own, so the input ends with "@@END"
+    tail = b""
+    while True:
+        data = os.read(0, 65536)
+        if not data:
+            return
+        _write(data)
+        tail = (tail + data)[-8:]
+        if b"@@END" in tail:
+            return
+
+
+def spinner(frames: int) -> None:
+    # 24-bit color braille spinner redrawing one line, as agent TUIs do
+    glyphs = "⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏"
+    for n in range(frames):
+        r, g, b = (n * 7) % 256, (n * 13) % 256, (n * 29) % 256
+        frame = f"\r\x1b[2K\x1b[38;2;{r};{g};{b}m{glyphs[n % len(glyphs)]}\x1b[0m thinking… {n * 100 // frames}%"
+        _write(frame.encode())
+        if n % 500 == 0:
+            _write(b"\n" + _marker("T"))
+        time.sleep(0.0005)
+    _write(b"\n")
+
+
+def buffered(lines: int, gap: float) -> None:
+    # print() to a pipe is block-buffered unless PYTHONUNBUFFERED is set
+    for _ in range(lines):
+        time.sleep(gap)
+        print(_marker("T").decode(), end="")
+    sys.stdout.flush()
+
+
+def main(argv: list[str]) -> None:
+    kind, *args = argv
+    if kind == "buffered":
+        # Goes through the same buffer, so time to first byte shows the buffering too
+        print(_marker("S").decode(), end="")
+    else:
+        _write(_marker("S"))
+    if kind == "firehose":
+        firehose(int(args[0]))
+    elif kind == "tiny":
+        tiny(int(args[0]))
+    elif kind == "idle":
+        idle(int(args[0]), float(args[1]))
+    elif kind == "echo":
+        echo()
+    elif kind == "spinner":
+        spinner(int(args[0]))
+    elif kind == "buffered":
+        buffered(int(args[0]), float(args[1]))
+    else:
+        raise SystemExit(f"unknown producer: {kind}")
+    _write(_marker("X"))
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
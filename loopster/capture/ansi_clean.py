@@ -1,14 +1,12 @@
 from __future__ import annotations
 
 import re
-from typing import List
+from typing import Callable, Dict, List, Tuple
 
 
-# General CSI matcher. Allow private parameter bytes '<', '>', and '=' in addition
-# to digits, ';' and '?'.
-_CSI_RE = re.compile(
-    r"\x1B\[[0-9;?<>=]*[ -/]*[@-~]"
-)
+# Longest prefix of a CSI sequence without its final byte (used to detect a
+# sequence cut off at the end of a streamed chunk).
+_CSI_PARTIAL_RE = re.compile(r"\x1B\[[0-9;?<>=]*[ -/]*")
 
 
 def _ensure_line(lines: List[List[str]], row: int) -> None:
@@ -23,12 +21,387 @@ def _ensure_col(lines: List[List[str]], row: int, col: int) -> None:
         line.append(" ")
 
 
-def _write_char(lines: List[List[str]], row: int, col: int, ch: str) -> None:
-    _ensure_col(lines, row, col)
-    # Avoid erasing history: do not overwrite non-space with a space
-    if ch == " " and lines[row][col] != " ":
-        return
-    lines[row][col] = ch
+def _csi_cut_off(text: str, i: int) -> bool:
+    m = _CSI_PARTIAL_RE.match(text, i)
+    return m is not None and m.end() == len(text)
+
+
+def _param(params: List[str], n: int, default: int) -> int:
+    try:
+        return int(params[n]) if n < len(params) else default
+    except ValueError:
+        return default
+
+
+# CSI handlers take the parameters and the cursor state (row, col,
+# suppress_until_nl, plus the rows and their base) and return the new
+# (row, col, suppress_until_nl).
+_Cursor = Tuple[int, int, bool]
+
+
+def _csi_cup(params: List[str], row: int, col: int, suppress: bool, lines: List[List[str]], base: int) -> _Cursor:
+    # CUP: row;col (1-based)
+    r = max(1, _param(params, 0, 1)) - 1
+    c = max(1, _param(params, 1, 1)) - 1
+    if r < row:
+        # Upward move: suppress ephemeral repaint until newline, and do not
+        # move the logical row to preserve history
+        return row, 0, True
+    if r > row:
+        row = r
+    _ensure_col(lines, row - base, c)
+    return row, c, suppress
+
+
+def _csi_cha(params: List[str], row: int, col: int, suppress: bool, lines: List[List[str]], base: int) -> _Cursor:
+    # CHA: set column (1-based)
+    col = max(1, _param(params, 0, 1)) - 1
+    _ensure_col(lines, row - base, col)
+    return row, col, suppress
+
+
+def _csi_cuf(params: List[str], row: int, col: int, suppress: bool, lines: List[List[str]], base: int) -> _Cursor:
+    # CUF: forward n columns
+    col += max(1, _param(params, 0, 1))
+    _ensure_col(lines, row - base, col)
+    return row, col, suppress
+
+
+def _csi_cub(params: List[str], row: int, col: int, suppress: bool, lines: List[List[str]], base: int) -> _Cursor:
+    # CUB: back n columns
+    return row, max(0, col - max(1, _param(params, 0, 1))), suppress
+
+
+def _csi_cnl(params: List[str], row: int, col: int, suppress: bool, lines: List[List[str]], base: int) -> _Cursor:
+    # CNL: next line n, col=0. Moving down cancels any suppression from an
+    # earlier upward move
+    row += max(1, _param(params, 0, 1))
+    _ensure_line(lines, row - base)
+    return row, 0, False
+
+
+def _csi_cpl(params: List[str], row: int, col: int, suppress: bool, lines: List[List[str]], base: int) -> _Cursor:
+    # CPL: previous line n, col=0. Treat as an upward move and suppress
+    # subsequent writes until newline to preserve an append-only transcript.
+    return row, 0, True
+
+
+def _csi_ed(params: List[str], row: int, col: int, suppress: bool, lines: List[List[str]], base: int) -> _Cursor:
+    # ED (Erase in Display). TUIs frequently clear the screen before
+    # repainting. Represent this as a frame break: end the current logical
+    # line so subsequent content starts on a fresh line.
+    _ensure_line(lines, row - base)
+    if lines[row - base]:
+        row += 1
+        col = 0
+        _ensure_line(lines, row - base)
+    return row, col, suppress
+
+
+# CSI final byte -> handler. SGR (m) styling is dropped, and EL (K) is a no-op:
+# many TUIs clear the current visual line before redrawing, and truncating
+# there would lose previously printed content. Other finals are ignored too.
+_CSI_HANDLERS: Dict[str, Callable[..., _Cursor]] = {
+    "H": _csi_cup,
+    "f": _csi_cup,
+    "G": _csi_cha,
+    "C": _csi_cuf,
+    "D": _csi_cub,
+    "E": _csi_cnl,
+    "F": _csi_cpl,
+    "J": _csi_ed,
+}
+
+
+# Longest unterminated OSC string (title, hyperlink, clipboard write, ...) held
+# back while streaming. Past it, a body without a newline so far is dropped as
+# it arrives until its terminator (so pending text stays bounded and is not
+# rescanned); one with a newline is taken to be a stray ESC ].
+_OSC_MAX = 4096
+# Where an OSC string dropped as it arrives ends: its terminator, or a newline
+# (it was never going to be terminated)
+_OSC_END_RE = re.compile(r"\x07|\x1B\\|\n")
+
+# Escape sequences with no effect on the transcript: CSI sequences other than
+# the cursor and erase commands handled above (SGR styling, modes, ...; private
+# parameter bytes '<', '>' and '=' are allowed besides digits, ';' and '?'), OSC
+# strings (ESC ] ... BEL or ESC \\), and the 7-bit C1 escapes we see (RI: ESC M,
+# SC: ESC 7, RC: ESC 8).
+_HANDLED = "".join(_CSI_HANDLERS)
+_SKIP = r"\x1B(?:\[[0-9;?<>=]*+[ -/]*+(?![" + _HANDLED + r"])[@-~]|\](?s:.*?)(?:\x07|\x1B\\)|[M78])"
+_SKIP_RE = re.compile(_SKIP)
+# One token per match: a run of printable text (styling and other skipped
+# sequences inside it are dropped), a handled CSI sequence, or a single control
+# character (including an ESC that starts no complete sequence). Tokens cover
+# the input without gaps; the classes are disjoint, so nothing needs to
+# backtrack and the quantifiers are possessive.
+_TOKEN_RE = re.compile(
+    r"((?:[^\x00-\x1f]++|" + _SKIP + r")++)"
+    r"|(\x1B\[[0-9;?<>=]*+[ -/]*+[" + _HANDLED + r"])"
+    r"|([\x00-\x1f])"
+)
+# Capturing groups of _TOKEN_RE (``match.lastindex``)
+_TEXT, _CSI, _CTRL = 1, 2, 3
+# One or more complete lines of plain text (no controls or escapes)
+_PLAIN_LINES_RE = re.compile(r"(?:[^\x00-\x1f]*+\n)++")
+
+
+class AnsiSanitizer:
+    """
+    Incremental form of :func:`sanitize_ansi` for streaming captures.
+
+    Feed decoded text in arbitrary pieces via :meth:`feed`; each call returns the
+    newline-terminated lines that can no longer change. :meth:`close` returns the
+    remaining tail. Rows above the cursor are never rewritten (upward moves are
+    suppressed), so only the current row is kept in memory.
+
+    Escape sequences split across ``feed`` calls are held back until complete.
+    Input is split by one regex (_TOKEN_RE) into printable runs (written into
+    the row with slice assignment), cursor-moving CSI sequences (dispatched
+    through _CSI_HANDLERS) and single control characters. Complete lines of
+    plain text starting on a fresh row are taken as a block, which keeps
+    output like ``yes`` from being handled one short token at a time.
+    """
+
+    def __init__(self) -> None:
+        # Screen model rows, relative to ``_base`` (the first unflushed row)
+        self._lines: List[List[str]] = [[]]
+        self._base = 0
+        # Carriage-return overwrite intent per row: if a CR occurred, and then
+        # fewer characters were written before a newline, truncate the line at
+        # the last written column to avoid leftover spinner text. Maps an
+        # absolute row to the max column written since its last CR.
+        self._cr: Dict[int, int] = {}
+        self._row = 0
+        self._col = 0
+        # When TUIs repaint earlier rows (move cursor upward), writes often represent
+        # ephemeral UI state (typing echo, spinners). To keep a readable transcript,
+        # we suppress printable writes until the next newline when an upward move is
+        # detected, rather than attempting to render them at the current row.
+        self._suppress_until_nl = False
+        # Unconsumed tail of the previous feed (an incomplete escape sequence)
+        self._pending = ""
+        # Inside an over-long OSC string, dropped as it arrives (see _OSC_MAX)
+        self._in_osc = False
+        self._closed = False
+
+    def feed(self, text: str) -> str:
+        """Consume ``text`` and return any lines finalized by it."""
+        if self._closed:
+            raise ValueError("feed() on a closed AnsiSanitizer")
+        if self._in_osc:
+            rest = self._skip_osc(self._pending + text)
+            if rest is None:
+                return ""
+            text = rest
+        elif self._pending:
+            if (
+                self._pending.startswith("\x1b]")
+                and not self._pending.endswith("\x1b")
+                and len(self._pending) + len(text) < _OSC_MAX + 4
+                and "\x07" not in text
+                and "\x1b" not in text
+            ):
+                # Still inside an unterminated OSC string: nothing to rescan yet
+                self._pending += text
+                return ""
+            text = self._pending + text
+        self._pending = ""
+        self._consume(text, final=False)
+        return self._flush_rows()
+
+    def close(self) -> str:
+        """Finish the stream and return the remaining (unterminated) lines."""
+        if self._closed:
+            return ""
+        text, self._pending = self._pending, ""
+        if self._in_osc:
+            # The stream ended inside the OSC string
+            text, self._in_osc = "", False
+        self._consume(text, final=True)
+        head = self._flush_rows()
+        self._closed = True
+        # Finalize any pending CR-overwrite truncation at end-of-stream: if a line
+        # saw a CR but no following newline, trim it to the max columns written
+        # since that CR so leftover spinner/progress text does not remain.
+        lines = self._lines
+        for r, maxc in self._cr.items():
+            k = r - self._base
+            if maxc and 0 <= k < len(lines):
+                lines[k] = lines[k][:maxc]
+        self._cr.clear()
+        # Join lines, trimming trailing spaces but preserving deliberate gaps
+        tail = "\n".join("".join(line).rstrip() for line in lines)
+        self._lines = [[]]
+        return head + tail
+
+    def peek(self) -> str:
+        """The rows not yet finalized (e.g. a prompt awaiting input), as they stand; changes nothing."""
+        return "\n".join("".join(line).rstrip() for line in self._lines)
+
+    def _skip_osc(self, text: str) -> str | None:
+        """Drop the over-long OSC string `text` continues; return what follows it, or None if it goes on."""
+        m = _OSC_END_RE.search(text)
+        if m is None:
+            # Keep an ESC that may start the terminator
+            self._pending = "\x1b" if text.endswith("\x1b") else ""
+            return None
+        self._in_osc = False
+        self._pending = ""
+        return text[m.start():] if m.group() == "\n" else text[m.end():]
+
+    def _flush_rows(self) -> str:
+        # Every row above the cursor is final: emit and drop it.
+        n = self._row - self._base
+        if n <= 0:
+            return ""
+        lines = self._lines
+        _ensure_line(lines, n)
+        if not self._cr:
+            out = ["".join(line).rstrip() for line in lines[:n]]
+        else:
+            out = []
+            for k in range(n):
+                line = lines[k]
+                maxc = self._cr.pop(self._base + k, None)
+                if maxc:
+                    line = line[:maxc]
+                out.append("".join(line).rstrip())
+        out.append("")
+        del lines[:n]
+        self._base = self._row
+        return "\n".join(out)
+
+    def _consume(self, text: str, final: bool) -> None:
+        lines = self._lines
+        base = self._base
+        cr = self._cr
+        row = self._row
+        col = self._col
+        suppress_until_nl = self._suppress_until_nl
+
+        i = n = len(text)
+        pos = 0
+        token = _TOKEN_RE.match
+        # At the start of an empty last row, nothing can change the lines
+        # that follow until a control character or escape: take whole
+        # escape-free lines in one step instead of token by token
+        fresh = col == 0 and not suppress_until_nl and row not in cr and not lines[-1] and row - base == len(lines) - 1
+        while pos < n:
+            if fresh:
+                b = _PLAIN_LINES_RE.match(text, pos)
+                if b is not None:
+                    block = text[pos : b.end() - 1].split("\n")
+                    # These rows end above the cursor and are never written
+                    # again, so each is kept as one string rather than per column
+                    lines[-1:] = [[line] for line in block]
+                    lines.append([])
+                    row += len(block)
+                    pos = b.end()
+                    continue
+                fresh = False
+            m = token(text, pos)
+            pos = m.end()
+            kind = m.lastindex
+            if kind == _TEXT:
+                # A run of printable characters
+                if suppress_until_nl:
+                    continue
+                run = m.group(_TEXT)
+                if "\x1b" in run:
+                    run = _SKIP_RE.sub("", run)
+                    if not run:
+                        continue
+                r = row - base
+                if r >= len(lines):
+                    _ensure_line(lines, r)
+                line = lines[r]
+                have = len(line)
+                end = col + len(run)
+                if have <= col:
+                    # Appending (the usual case): pad any gap, then add the run
+                    if have < col:
+                        line.extend(" " * (col - have))
+                    line.extend(run)
+                elif " " in run:
+                    # Avoid erasing history: a space does not overwrite a non-space
+                    old = line[col:end]
+                    line[col:end] = run
+                    j = run.find(" ")
+                    while 0 <= j < len(old):
+                        if old[j] != " ":
+                            line[col + j] = old[j]
+                        j = run.find(" ", j + 1)
+                else:
+                    line[col:end] = run
+                # Track width written since last CR for truncation logic
+                if row in cr and end > cr[row]:
+                    cr[row] = end
+                col = end
+            elif kind == _CSI:
+                seq = m.group(_CSI)
+                # Parameters sit between ESC[ and the final byte
+                params = [p for p in seq[2:-1].split(";") if p]
+                row, col, suppress_until_nl = _CSI_HANDLERS[seq[-1]](params, row, col, suppress_until_nl, lines, base)
+            elif kind == _CTRL:
+                ch = m.group(_CTRL)
+                if ch == "\n":
+                    # If we had a CR on this line, truncate to last written col
+                    maxc = cr.pop(row, None)
+                    # Only truncate if we actually overwrote characters after CR.
+                    # If no characters were written post-CR before the newline,
+                    # preserve the original line content.
+                    if maxc:
+                        _ensure_line(lines, row - base)
+                        lines[row - base] = lines[row - base][:maxc]
+                    row += 1
+                    col = 0
+                    suppress_until_nl = False
+                    _ensure_line(lines, row - base)
+                    fresh = row - base == len(lines) - 1
+                elif ch == "\r":
+                    col = 0
+                    # Mark this line as subject to overwrite truncation
+                    cr[row] = 0
+                elif ch == "\b":
+                    col = max(0, col - 1)
+                elif ch == "\t":
+                    # Advance to next tab stop (8 columns), padding with spaces
+                    next_stop = ((col // 8) + 1) * 8
+                    _ensure_line(lines, row - base)
+                    line = lines[row - base]
+                    if len(line) < next_stop:
+                        line.extend(" " * (next_stop - len(line)))
+                    col = next_stop
+                elif ch == "\x1b":
+                    # An ESC that starts no complete sequence
+                    at = m.start()
+                    if at + 1 >= len(text):
+                        if not final:
+                            # Lone ESC at the end of this piece; wait for more input
+                            i = at
+                            break
+                    elif text[at + 1] == "]" and len(text) - at < _OSC_MAX + 4:
+                        # Unterminated OSC: drop the rest, or wait for the terminator
+                        i = at if not final else len(text)
+                        break
+                    elif text[at + 1] == "]" and not final and "\n" not in text[at:]:
+                        # Too long to hold back: drop it as it arrives, until its terminator
+                        self._in_osc = True
+                        self._skip_osc(text[at + 2 :])
+                        break
+                    elif not final and _csi_cut_off(text, at):
+                        # CSI cut off mid-sequence; wait for the rest
+                        i = at
+                        break
+                    # Otherwise an unknown escape: skip the ESC alone
+                # Other C0 controls are ignored
+
+        if i < len(text) and not final:
+            self._pending = text[i:]
+        self._row = row
+        self._col = col
+        self._suppress_until_nl = suppress_until_nl
 
 
 def sanitize_ansi(text: str) -> str:
@@ -39,211 +412,12 @@ def sanitize_ansi(text: str) -> str:
     - Interprets a subset of CSI cursor controls: CUP (H/f), CHA (G), CUF (C), CUB (D),
       CNL (E), CPL (F), EL (K). Styling (SGR m) is removed.
     - Other escape/control sequences are stripped.
+
+    Text without escapes goes through the same screen model (a CR overwrites
+    the line), so the result matches the streaming :class:`AnsiSanitizer`.
     """
-    # Quick path: if no ESC present, just normalize newlines
-    if "\x1b" not in text:
-        return text.replace("\r\n", "\n").replace("\r", "\n")
-
-    # We'll build a simple screen model
-    lines: List[List[str]] = [[]]
-    # Track carriage-return overwrite intent per line: if a CR occurred, and
-    # then fewer characters were written before a newline, truncate the line at
-    # the last written column to avoid leftover spinner text.
-    cr_active: List[bool] = [False]
-    cr_max_cols: List[int] = [0]
-    row = 0
-    col = 0
-    # When TUIs repaint earlier rows (move cursor upward), writes often represent
-    # ephemeral UI state (typing echo, spinners). To keep a readable transcript,
-    # we suppress printable writes until the next newline when an upward move is
-    # detected, rather than attempting to render them at the current row.
-    suppress_until_nl = False
-
-    i = 0
-    L = len(text)
-    while i < L:
-        ch = text[i]
-        # ESC sequences
-        if ch == "\x1b":
-            # Skip common 7-bit C1 single-char escapes we see (RI: ESC M, SC: ESC 7, RC: ESC 8)
-            if i + 1 < L and text[i + 1] in ("M", "7", "8"):
-                i += 2
-                continue
-            # OSC sequences: ESC ] ... BEL or ESC \
-            if i + 1 < L and text[i + 1] == "]":
-                # Find BEL or ST terminator
-                j = i + 2
-                bel = text.find("\x07", j)
-                st = text.find("\x1b\\", j)
-                if bel == -1 and st == -1:
-                    # Unterminated; drop rest
-                    break
-                if bel == -1:
-                    i = st + 2
-                    continue
-                if st == -1:
-                    i = bel + 1
-                    continue
-                # Take earliest terminator
-                i = min(bel + 1, st + 2)
-                continue
-            # Try to parse CSI
-            m = _CSI_RE.match(text, i)
-            if m:
-                seq = m.group(0)
-                final = seq[-1]
-                params = seq[2:-1]  # between ESC[ and final
-                # Split numeric params
-                ps = [p for p in params.split(";") if p]
-                def p(n: int, default: int) -> int:
-                    try:
-                        return int(ps[n]) if n < len(ps) else default
-                    except ValueError:
-                        return default
-                if final in ("m",):
-                    # SGR - ignore styling
-                    pass
-                elif final in ("H", "f"):
-                    # CUP: row;col (1-based)
-                    r = max(1, p(0, 1)) - 1
-                    c = max(1, p(1, 1)) - 1
-                    if r < row:
-                        # Upward move: suppress ephemeral repaint until newline
-                        suppress_until_nl = True
-                        # Do not move the logical row to preserve history
-                        col = 0
-                    else:
-                        if r > row:
-                            row = r
-                        col = c
-                        _ensure_col(lines, row, col)
-                elif final == "G":
-                    # CHA: set column (1-based)
-                    c = max(1, p(0, 1)) - 1
-                    col = c
-                    _ensure_col(lines, row, col)
-                elif final == "C":
-                    # CUF: forward n columns
-                    col += max(1, p(0, 1))
-                    _ensure_col(lines, row, col)
-                elif final == "D":
-                    # CUB: back n columns
-                    col = max(0, col - max(1, p(0, 1)))
-                elif final == "E":
-                    # CNL: next line n, col=0
-                    row += max(1, p(0, 1))
-                    col = 0
-                    # Moving down cancels any suppression from an earlier upward move
-                    suppress_until_nl = False
-                    _ensure_line(lines, row)
-                elif final == "F":
-                    # CPL: previous line n, col=0. Treat as an upward move and
-                    # suppress subsequent writes until newline to preserve an
-                    # append-only transcript.
-                    suppress_until_nl = True
-                    col = 0
-                elif final == "K":
-                    # EL (Erase in Line): For transcripts, do not erase history.
-                    # Many TUIs clear the current visual line before redrawing; if we
-                    # actually truncate here, we lose previously printed content.
-                    # Treat as a no-op in the sanitizer so logs remain readable.
-                    pass
-                elif final == "J":
-                    # ED (Erase in Display). TUIs frequently clear the screen before
-                    # repainting. Represent this as a frame break: end the current
-                    # logical line so subsequent content starts on a fresh line.
-                    _ensure_line(lines, row)
-                    if lines[row]:
-                        row += 1
-                        col = 0
-                        _ensure_line(lines, row)
-                # Ignore other CSI commands
-                i = m.end()
-                continue
-            else:
-                # Unknown escape sequence: skip ESC and continue
-                i += 1
-                continue
-
-        # Control characters
-        if ch == "\n":
-            # Ensure tracking arrays are large enough for current row
-            while len(cr_active) <= row:
-                cr_active.append(False)
-                cr_max_cols.append(0)
-            # If we had a CR on this line, truncate to last written col
-            if cr_active[row]:
-                # Ensure list exists
-                _ensure_line(lines, row)
-                # Only truncate if we actually overwrote characters after CR.
-                # If no characters were written post-CR before the newline,
-                # preserve the original line content.
-                maxc = cr_max_cols[row]
-                if maxc > 0:
-                    lines[row] = lines[row][:maxc]
-                cr_active[row] = False
-                cr_max_cols[row] = 0
-            row += 1
-            col = 0
-            suppress_until_nl = False
-            # Ensure tracking arrays large enough
-            _ensure_line(lines, row)
-            while len(cr_active) <= row:
-                cr_active.append(False)
-                cr_max_cols.append(0)
-            i += 1
-            continue
-        if ch == "\r":
-            col = 0
-            # Mark this line as subject to overwrite truncation
-            while len(cr_active) <= row:
-                cr_active.append(False)
-                cr_max_cols.append(0)
-            cr_active[row] = True
-            cr_max_cols[row] = 0
-            i += 1
-            continue
-        if ch == "\b":
-            col = max(0, col - 1)
-            i += 1
-            continue
-        if ch == "\t":
-            # Advance to next tab stop (8 columns)
-            next_stop = ((col // 8) + 1) * 8
-            while col < next_stop:
-                _write_char(lines, row, col, " ")
-                col += 1
-            i += 1
-            continue
-
-        # C0 controls we ignore (except those handled above)
-        if "\x00" <= ch <= "\x1f":
-            i += 1
-            continue
-
-        # Printable
-        if not suppress_until_nl:
-            _write_char(lines, row, col, ch)
-            # Track width written since last CR for truncation logic
-            if row < len(cr_active) and cr_active[row]:
-                cval = col + 1
-                if cval > cr_max_cols[row]:
-                    cr_max_cols[row] = cval
-            col += 1
-        i += 1
-
-    # Finalize any pending CR-overwrite truncation at end-of-stream: if a line
-    # saw a CR but no following newline, trim it to the max columns written
-    # since that CR so leftover spinner/progress text does not remain.
-    for r, active in enumerate(cr_active):
-        if active:
-            _ensure_line(lines, r)
-            maxc = cr_max_cols[r] if r < len(cr_max_cols) else 0
-            if maxc and r < len(lines):
-                lines[r] = lines[r][:maxc]
-
-    # Join lines, trimming trailing spaces but preserving deliberate gaps
-    return "\n".join("".join(line).rstrip() for line in lines)
-
-
-__all__ = ["sanitize_ansi"]
+    sanitizer = AnsiSanitizer()
+    return sanitizer.feed(text) + sanitizer.close()
+
+
+__all__ = ["AnsiSanitizer", "sanitize_ansi"]
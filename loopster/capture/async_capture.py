@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import subprocess
+import sys
+from typing import Iterable, Iterator, Sequence, Union
+
+from .inputs import iter_input_items
+from .sinks import KEEP_CHOICES, Sink, StdoutMirror, close_sinks, open_sinks
+from .shell import command_argv, spawn, spawn_error
+from .stats import CaptureStats, ResourceUsage
+from .unbuffer import unbuffer_env
+
+
+_READ_SIZE = 65536
+
+
+def _pidfd_works() -> bool:
+    try:
+        os.close(os.pidfd_open(os.getpid()))  # type: ignore[attr-defined]
+    except (AttributeError, OSError):
+        return False
+    return True
+
+
+# Before Python 3.12, asyncio's default child watcher (ThreadedChildWatcher)
+# starts a thread per child just to wait for it. Where pidfds work, children
+# are started here instead and their exit is watched on the event loop itself.
+_WATCH_PIDFD = sys.version_info < (3, 12) and sys.platform.startswith("linux") and _pidfd_works()
+
+
+class _PidfdProcess:
+    """
+    The part of ``asyncio.subprocess.Process`` used here, for a Popen child
+    whose pipes are loop transports and whose exit is a loop reader on its pidfd.
+    """
+
+    def __init__(self, popen: subprocess.Popen, loop: asyncio.AbstractEventLoop) -> None:
+        self._popen = popen
+        self._loop = loop
+        self.pid = popen.pid
+        self.stdin: asyncio.StreamWriter | None = None
+        self.stdout: asyncio.StreamReader | None = None
+        self._stdout_transport: asyncio.BaseTransport | None = None
+        self._exited: asyncio.Future[int] = loop.create_future()
+        self._pidfd: int | None = os.pidfd_open(popen.pid)  # type: ignore[attr-defined]
+        loop.add_reader(self._pidfd, self._on_exit)
+
+    @classmethod
+    async def spawn(cls, argv: Sequence[str], env: dict[str, str] | None) -> "_PidfdProcess":
+        loop = asyncio.get_running_loop()
+        popen = spawn(
+            argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env, bufsize=0
+        )
+        proc = cls(popen, loop)
+        try:
+            reader = asyncio.StreamReader(loop=loop)
+            proc._stdout_transport, _ = await loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader, loop=loop), popen.stdout
+            )
+            transport, protocol = await loop.connect_write_pipe(
+                lambda: asyncio.streams.FlowControlMixin(loop=loop), popen.stdin
+            )
+        except BaseException:
+            popen.kill()
+            proc.close()
+            raise
+        proc.stdout = reader
+        proc.stdin = asyncio.StreamWriter(transport, protocol, None, loop)  # type: ignore[arg-type]
+        return proc
+
+    def _on_exit(self) -> None:
+        self._popen.wait()
+        self._unwatch()
+        if not self._exited.done():
+            self._exited.set_result(self._popen.returncode)
+
+    @property
+    def returncode(self) -> int | None:
+        return self._popen.returncode
+
+    async def wait(self) -> int:
+        # Shielded: a cancelled waiter must not cancel the shared result
+        return await asyncio.shield(self._exited)
+
+    def terminate(self) -> None:
+        self._popen.terminate()
+
+    def kill(self) -> None:
+        self._popen.kill()
+
+    def _unwatch(self) -> None:
+        if self._pidfd is not None:
+            self._loop.remove_reader(self._pidfd)
+            os.close(self._pidfd)
+            self._pidfd = None
+
+    def close(self) -> None:
+        """Stop watching the child and drop its output pipe (a background job may still hold it open)."""
+        self._unwatch()
+        if self._stdout_transport is not None:
+            self._stdout_transport.close()
+
+
+_Process = Union[asyncio.subprocess.Process, _PidfdProcess]
+
+
+async def _feed_stdin(
+    stdin: asyncio.StreamWriter, items: Iterator[bytes], delay: float | None
+) -> None:
+    try:
+        for item in items:
+            if delay:
+                await asyncio.sleep(delay)
+            stdin.write(item)
+            await stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # The child stopped reading; the rest of the input is moot.
+        pass
+    finally:
+        close = getattr(items, "close", None)
+        if close is not None:
+            close()
+        stdin.close()
+
+
+async def _drain(
+    proc: _Process, sinks: Sequence[Sink], stats: CaptureStats | None
+) -> None:
+    assert proc.stdout is not None
+    exited = asyncio.ensure_future(proc.wait())
+    read: asyncio.Future[bytes] | None = None
+    try:
+        while True:
+            read = asyncio.ensure_future(proc.stdout.read(_READ_SIZE))
+            if not exited.done():
+                await asyncio.wait({read, exited}, return_when=asyncio.FIRST_COMPLETED)
+            if not read.done():
+                # The child exited but something still holds its stdout open:
+                # take what arrives promptly, then stop (like the sync engine).
+                done, _ = await asyncio.wait({read}, timeout=0.1)
+                if not done:
+                    return
+            chunk = read.result()
+            read = None
+            if not chunk:
+                return
+            if stats is not None:
+                if not stats.bytes_read:
+                    stats.output_seen()
+                stats.bytes_read += len(chunk)
+                stats.read_calls += 1
+                stats.max_read_size = max(stats.max_read_size, len(chunk))
+            for sink in sinks:
+                if isinstance(sink, StdoutMirror) and not sink.has_room(len(chunk)):
+                    # A slow terminal under the "block" policy: wait for it on
+                    # a worker thread so the other captures on the loop go on
+                    await asyncio.get_running_loop().run_in_executor(None, sink.wait_for_room, len(chunk))
+                sink.write(chunk)
+    finally:
+        for fut in (read, exited):
+            if fut is not None and not fut.done():
+                fut.cancel()
+
+
+async def _reap(proc: _Process) -> None:
+    try:
+        await asyncio.wait_for(proc.wait(), timeout=1)
+    except asyncio.TimeoutError:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=1)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def capture_command_async(
+    cmd: str,
+    output_path: str,
+    inputs: Iterable[str | bytes] | None = None,
+    timeout: float | None = None,
+    env: dict[str, str] | None = None,
+    mirror_to_stdout: bool = True,
+    raw_output_path: str | None = None,
+    prepend_header: str | None = None,
+    raw_fsync_interval: float | None = None,
+    stats: CaptureStats | None = None,
+    mirror_policy: str = "block",
+    input_file: str | None = None,
+    input_delay: float | None = None,
+    timeline_path: str | None = None,
+    max_bytes: int | None = None,
+    keep: Sequence[str] = KEEP_CHOICES,
+    usage: ResourceUsage | None = None,
+    shell: str = "login",
+    unbuffer: bool = False,
+) -> int:
+    """
+    Asyncio counterpart of :func:`loopster.capture.pipe_capture.capture_command`.
+
+    - Same outputs and semantics: cleaned log (with optional header, bounded by
+      `max_bytes`/`keep`), raw log, timeline, mirroring, scripted `inputs` and
+      `input_file` lines (each after `input_delay` seconds) followed by EOF,
+      and exit code 124 on timeout; `shell` picks login/non-login/exec and
+      `unbuffer` asks the child not to block-buffer its output.
+    - `stats` counts the chunks handed over by the stream reader.
+    - `usage` is filled from ``RUSAGE_CHILDREN`` (asyncio reaps the child
+      itself), so it is only exact when no other child exits meanwhile.
+    - Runs entirely on the event loop, so many captures can share one loop.
+      The mirror writes to the terminal from its own thread; when it falls
+      behind under the default "block" policy, this capture waits for it in
+      the loop's executor instead of stalling the loop (the other policies
+      never wait).
+      On Linux before Python 3.12, the child is watched through its pidfd on
+      the loop rather than by asyncio's default thread-per-child watcher.
+    - Cancelling the task terminates the child and flushes the logs before the
+      cancellation propagates.
+    """
+    argv = command_argv(cmd, shell)
+    if unbuffer:
+        env = unbuffer_env(env)
+    sinks = open_sinks(
+        output_path,
+        prepend_header=prepend_header,
+        raw_output_path=raw_output_path,
+        raw_fsync_interval=raw_fsync_interval,
+        mirror_to_stdout=mirror_to_stdout,
+        mirror_policy=mirror_policy,
+        stats=stats,
+        timeline_path=timeline_path,
+        timeline_command=cmd,
+        max_bytes=max_bytes,
+        keep=keep,
+    )
+    if usage is not None:
+        usage.begin()
+    if stats is not None:
+        stats.spawning(shell)
+    try:
+        proc: _Process
+        if _WATCH_PIDFD:
+            proc = await _PidfdProcess.spawn(argv, env)
+        else:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *argv,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    env=env,
+                )
+            except OSError as e:
+                raise spawn_error(argv, e) from e
+    except BaseException:
+        close_sinks(sinks)
+        raise
+    if stats is not None:
+        stats.spawned()
+
+    assert proc.stdin is not None
+    feeder = asyncio.ensure_future(
+        _feed_stdin(proc.stdin, iter_input_items(inputs, input_file, by_line=bool(input_delay)), input_delay)
+    )
+    exit_code: int | None = None
+    try:
+        try:
+            await asyncio.wait_for(_drain(proc, sinks, stats), timeout)
+        except asyncio.TimeoutError:
+            exit_code = 124
+            try:
+                proc.terminate()
+            except ProcessLookupError:
+                pass
+    except BaseException:
+        # Cancelled (or failed): do not leave the child running.
+        try:
+            proc.terminate()
+        except ProcessLookupError:
+            pass
+        raise
+    finally:
+        feeder.cancel()
+        try:
+            close_sinks(sinks)
+        finally:
+            await asyncio.shield(_reap(proc))
+            if isinstance(proc, _PidfdProcess):
+                proc.close()
+            if usage is not None:
+                usage.end()
+
+    if exit_code is not None:
+        return exit_code
+    return proc.returncode
+
+
+__all__ = ["capture_command_async"]
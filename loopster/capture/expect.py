@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import codecs
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from .ansi_clean import AnsiSanitizer
+
+
+# Characters of sanitized output kept for matching; a match must fit in it
+WINDOW = 16384
+
+_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "e": "\x1b", "0": "\0", "\\": "\\"}
+_ESCAPE_RE = re.compile(r"\\(x[0-9a-fA-F]{2}|.)")
+
+
+class ExpectError(RuntimeError):
+    """An interaction script failed: a wait timed out, a `fail` pattern matched, or output ended early."""
+
+    def __init__(self, message: str, line: int | None = None) -> None:
+        super().__init__(f"{message} (script line {line})" if line else message)
+        self.line = line
+
+
+def _unescape(text: str) -> str:
+    def repl(m: re.Match[str]) -> str:
+        code = m.group(1)
+        if code[0] == "x" and len(code) == 3:
+            return chr(int(code[1:], 16))
+        return _ESCAPES.get(code, "\\" + code)
+
+    return _ESCAPE_RE.sub(repl, text)
+
+
+@dataclass
+class Step:
+    """One script step: ``expect`` (with its compiled matcher), ``fail`` or ``send``."""
+
+    kind: str
+    arg: str
+    line: int = 0
+    timeout: float | None = None
+    # For expect steps: the pattern and every active `fail` pattern as named
+    # alternatives of one regex, so each scan checks them all in one pass
+    matcher: re.Pattern[str] | None = None
+    fails: list[str] = field(default_factory=list)
+
+
+class ExpectScript:
+    """
+    An interaction script: wait for output, then send input.
+
+    Text format, one step per line (``#`` starts a comment line)::
+
+        timeout 30              # default wait for the following expects (none: wait forever)
+        fail Traceback|FATAL    # from here on, abort if this ever shows up
+        expect Password:        # wait until the sanitized output matches this regex
+        sendline hunter2        # send text plus a newline
+        expect \\$ $
+        send exit\\r            # send text as is
+
+    The argument is the rest of the line. ``send``/``sendline`` text takes the
+    escapes ``\\n \\r \\t \\e \\0 \\\\`` and ``\\xHH``. Patterns are Python regexes
+    matched in multiline mode against the sanitized output, including the line
+    still being written (e.g. a prompt without a newline), with trailing spaces
+    stripped as in the cleaned log.
+    """
+
+    def __init__(self, steps: list[Step]) -> None:
+        self.steps = steps
+
+    @classmethod
+    def parse(cls, text: str, default_timeout: float | None = None) -> "ExpectScript":
+        steps: list[Step] = []
+        timeout = default_timeout
+        fails: list[str] = []
+        for n, raw in enumerate(text.splitlines(), 1):
+            line = raw.rstrip("\r\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            command, _, arg = line.lstrip().partition(" ")
+            if command == "timeout":
+                value = arg.strip()
+                try:
+                    timeout = None if value == "none" else float(value)
+                except ValueError:
+                    raise ValueError(f"line {n}: timeout needs seconds or 'none', got {value!r}") from None
+            elif command in ("expect", "fail"):
+                if not arg:
+                    raise ValueError(f"line {n}: {command} needs a pattern")
+                try:
+                    re.compile(arg)
+                except re.error as e:
+                    raise ValueError(f"line {n}: bad pattern {arg!r}: {e}") from None
+                if command == "fail":
+                    fails.append(arg)
+                    steps.append(Step("fail", arg, n))
+                else:
+                    steps.append(Step("expect", arg, n, timeout, _compile(arg, fails), list(fails)))
+            elif command in ("send", "sendline"):
+                value = _unescape(arg) + ("\n" if command == "sendline" else "")
+                if value:
+                    steps.append(Step("send", value, n))
+            else:
+                raise ValueError(f"line {n}: unknown step {command!r} (expected expect, fail, send, sendline, timeout)")
+        return cls(steps)
+
+    @classmethod
+    def load(cls, path: str | Path, default_timeout: float | None = None) -> "ExpectScript":
+        return cls.parse(Path(path).read_text(encoding="utf-8"), default_timeout=default_timeout)
+
+
+def _compile(pattern: str, fails: list[str]) -> re.Pattern[str]:
+    parts = [f"(?P<expect>{pattern})"] + [f"(?P<fail{k}>{p})" for k, p in enumerate(fails)]
+    return re.compile("|".join(parts), re.MULTILINE)
+
+
+class ExpectSession:
+    """
+    Run an :class:`ExpectScript` against a live capture.
+
+    Plays two roles in the capture loop: :attr:`sink` receives the child's
+    output, and the session itself is the input feeder (same interface as
+    :class:`~loopster.capture.inputs.InputFeeder`) that writes ``send`` text to
+    `fd` once the preceding ``expect`` has matched.
+
+    Output is decoded and sanitized incrementally; only the last `window`
+    characters are kept and searched, starting after the previous match, so
+    matching cost is bounded however long the session runs. `fail` patterns
+    keep being checked after the last step, until :meth:`finish`. Failures
+    (timeout, `fail` pattern, output ending first) call `on_fail` (e.g.
+    terminate the child) and are kept in :attr:`error`.
+    """
+
+    def __init__(self, script: ExpectScript, window: int = WINDOW) -> None:
+        self.script = script
+        self.fd = -1
+        self.done = False
+        self.error: ExpectError | None = None
+        self.bytes_written = 0
+        self.matches: list[tuple[float, int, str]] = []
+        self._window = window
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._sanitizer = AnsiSanitizer()
+        self._text = ""
+        self._base = 0  # absolute offset of _text[0] in the sanitized stream
+        self._consumed = 0  # absolute offset just past the last match
+        self._index = 0
+        # `fail` steps reached so far, checked on their own once no expect is waiting
+        self._fails: list[Step] = []
+        self._fail_re: re.Pattern[str] | None = None
+        self._ended = False
+        self._deadline: float | None = None
+        self._pending = memoryview(b"")
+        self._on_done: Callable[[], None] | None = None
+        self._on_fail: Callable[[], None] | None = None
+        self._started = time.monotonic()
+        self.sink = _ExpectSink(self)
+
+    def start(
+        self,
+        fd: int,
+        on_done: Callable[[], None] | None = None,
+        on_fail: Callable[[], None] | None = None,
+    ) -> None:
+        """Attach to the child's (non-blocking) input and begin the first step."""
+        self.fd = fd
+        self._on_done = on_done
+        self._on_fail = on_fail
+        self._started = time.monotonic()
+        self._advance()
+
+    # -- output side -------------------------------------------------------
+
+    def observe(self, chunk: bytes | memoryview) -> None:
+        if self._ended:
+            return
+        text = self._decoder.decode(chunk)
+        if not text:
+            return
+        final = self._sanitizer.feed(text)
+        if final:
+            self._text += final
+            excess = len(self._text) - self._window
+            if excess > 0:
+                self._text = self._text[excess:]
+                self._base += excess
+        if self.fd < 0:
+            return
+        if self._waiting():
+            self._match()
+        elif self._fail_re is not None and self.error is None:
+            self._match_fails()
+
+    def _waiting(self) -> bool:
+        return not self.done and self._index < len(self.script.steps) and self.script.steps[self._index].kind == "expect"
+
+    def _subject(self) -> tuple[str, int]:
+        subject = self._text + self._sanitizer.peek()
+        return subject, min(max(self._consumed - self._base, 0), len(subject))
+
+    def _match(self) -> None:
+        step = self.script.steps[self._index]
+        assert step.matcher is not None
+        subject, start = self._subject()
+        m = step.matcher.search(subject, start)
+        if m is None:
+            return
+        if m.group("expect") is None:
+            pattern = next(p for k, p in enumerate(step.fails) if m.group(f"fail{k}") is not None)
+            self._fail(f"fail pattern /{pattern}/ matched {m.group(0)!r}", step.line)
+            return
+        self._consumed = self._base + m.end()
+        self.matches.append((time.monotonic() - self._started, step.line, m.group(0)))
+        self._index += 1
+        self._advance()
+
+    def _match_fails(self) -> None:
+        assert self._fail_re is not None
+        subject, start = self._subject()
+        m = self._fail_re.search(subject, start)
+        if m is not None:
+            step = next(f for k, f in enumerate(self._fails) if m.group(f"fail{k}") is not None)
+            self._fail(f"fail pattern /{step.arg}/ matched {m.group(0)!r}", step.line)
+
+    def _advance(self) -> None:
+        """Queue the sends and arm the fails that follow, up to the next expect (or the end)."""
+        steps = self.script.steps
+        data = bytearray()
+        while self._index < len(steps) and steps[self._index].kind != "expect":
+            step = steps[self._index]
+            if step.kind == "send":
+                data += step.arg.encode()
+            else:
+                self._fails.append(step)
+                self._fail_re = re.compile(
+                    "|".join(f"(?P<fail{k}>{f.arg})" for k, f in enumerate(self._fails)), re.MULTILINE
+                )
+            self._index += 1
+        if data:
+            self._pending = memoryview(bytes(self._pending) + bytes(data))
+        if self._index < len(steps):
+            timeout = steps[self._index].timeout
+            self._deadline = time.monotonic() + timeout if timeout is not None else None
+            # What is already on screen may satisfy it
+            self._match()
+        else:
+            if not self._pending:
+                self._complete()
+            if self._fail_re is not None:
+                self._match_fails()
+
+    # -- input side (InputFeeder interface) --------------------------------
+
+    def wait_time(self) -> float | None:
+        """0 when there is input to write, else seconds until the current wait times out (None: no deadline)."""
+        if self._pending:
+            return 0.0
+        if self._deadline is None:
+            return None
+        left = self._deadline - time.monotonic()
+        if left <= 0:
+            step = self.script.steps[self._index]
+            self._fail(f"timed out after {step.timeout:g}s waiting for /{step.arg}/", step.line)
+            return None
+        return left
+
+    def on_writable(self) -> None:
+        while self._pending and not self.done:
+            try:
+                n = os.write(self.fd, self._pending)
+            except BlockingIOError:
+                return
+            except (BrokenPipeError, ConnectionResetError):
+                self._pending = memoryview(b"")
+                break
+            self.bytes_written += n
+            self._pending = self._pending[n:]
+        if not self._pending and self._index >= len(self.script.steps):
+            self._complete()
+
+    def finish(self) -> None:
+        """End the session; if a wait was still open, output ended before it matched."""
+        if self._ended:
+            return
+        self._ended = True
+        if self.done:
+            return
+        if self._waiting():
+            step = self.script.steps[self._index]
+            self.error = ExpectError(f"output ended while waiting for /{step.arg}/", step.line)
+        self._complete()
+
+    def _complete(self) -> None:
+        # No more input: the script ran to its end, or output ended first
+        if self.done:
+            return
+        self.done = True
+        self._pending = memoryview(b"")
+        self._deadline = None
+        if self._on_done is not None:
+            try:
+                self._on_done()
+            except OSError:
+                pass
+
+    def _fail(self, message: str, line: int) -> None:
+        self.error = ExpectError(message, line)
+        self.done = True
+        self._pending = memoryview(b"")
+        self._deadline = None
+        if self._on_fail is not None:
+            self._on_fail()
+
+
+class _ExpectSink:
+    def __init__(self, session: ExpectSession) -> None:
+        self._session = session
+
+    def write(self, chunk: bytes | memoryview) -> None:
+        self._session.observe(chunk)
+
+    def close(self) -> None:
+        pass
+
+
+__all__ = ["ExpectError", "ExpectScript", "ExpectSession", "Step", "WINDOW"]
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import os
+import time
+from typing import Callable, Iterable, Iterator
+
+
+# Upper bound on bytes handed to a single os.write
+WRITE_SIZE = 65536
+
+
+def iter_input_items(
+    inputs: Iterable[str | bytes] | None = None,
+    input_file: str | None = None,
+    by_line: bool = False,
+) -> Iterator[bytes]:
+    """
+    Lazily yield scripted stdin items: each of `inputs`, then `input_file`.
+
+    The file comes in blocks of WRITE_SIZE bytes, or line by line with
+    `by_line` (for a delay before each line). Nothing is joined or read
+    ahead, so multi-MB scripts, even ones without a newline, are never held
+    whole.
+    """
+    for item in inputs or ():
+        yield item if isinstance(item, bytes) else item.encode()
+    if input_file:
+        with open(input_file, "rb") as fh:
+            if by_line:
+                yield from fh
+            else:
+                yield from iter(lambda: fh.read(WRITE_SIZE), b"")
+
+
+class InputFeeder:
+    """
+    Feed scripted items to a non-blocking descriptor whenever it is writable.
+
+    - :meth:`on_writable` writes as much as the descriptor accepts right now,
+      coalescing consecutive items into writes of up to WRITE_SIZE bytes.
+    - With `delay`, the feeder waits that many seconds before each item;
+      :meth:`wait_time` tells the selector loop how long to stay away.
+    - When the items are exhausted (or the reader went away), `on_done` is
+      called, e.g. to close the child's stdin and signal EOF.
+    """
+
+    def __init__(
+        self,
+        fd: int,
+        items: Iterable[bytes],
+        delay: float | None = None,
+        on_done: Callable[[], None] | None = None,
+    ) -> None:
+        self.fd = fd
+        self.done = False
+        self._items = iter(items)
+        self._delay = delay or 0.0
+        self._on_done = on_done
+        self._pending = memoryview(b"")
+        self._due = time.monotonic() + self._delay if self._delay else 0.0
+        self.bytes_written = 0
+
+    def wait_time(self) -> float:
+        """Seconds until the next item may be written (0 if writable now)."""
+        if self._pending or not self._delay:
+            return 0.0
+        return max(0.0, self._due - time.monotonic())
+
+    def _refill(self) -> bool:
+        # Pull the next item(s) into the pending buffer; False when exhausted.
+        if self._delay:
+            if time.monotonic() < self._due:
+                return True
+            item = next(self._items, None)
+            if item is None:
+                return False
+            self._due = time.monotonic() + self._delay
+            self._pending = memoryview(item)
+            return True
+        parts: list[bytes] = []
+        size = 0
+        while size < WRITE_SIZE:
+            item = next(self._items, None)
+            if item is None:
+                break
+            parts.append(item)
+            size += len(item)
+        if not parts:
+            return False
+        self._pending = memoryview(b"".join(parts))
+        return True
+
+    def on_writable(self) -> None:
+        while not self.done:
+            if not self._pending:
+                if not self._refill():
+                    self.finish()
+                    return
+                if not self._pending:
+                    return  # waiting out a delay
+            try:
+                n = os.write(self.fd, self._pending[:WRITE_SIZE])
+            except BlockingIOError:
+                return
+            except (BrokenPipeError, ConnectionResetError):
+                # The child stopped reading; the rest of the input is moot.
+                self.finish()
+                return
+            self.bytes_written += n
+            self._pending = self._pending[n:]
+
+    def finish(self) -> None:
+        if self.done:
+            return
+        self.done = True
+        self._pending = memoryview(b"")
+        close = getattr(self._items, "close", None)
+        if close is not None:
+            close()
+        if self._on_done is not None:
+            try:
+                self._on_done()
+            except OSError:
+                pass
+
+
+__all__ = ["InputFeeder", "WRITE_SIZE", "iter_input_items"]
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import json
+import re
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+
+# Output separated by less than this is one burst; longer silences are idle gaps
+BURST_GAP = 0.5
+# Rough size of a token in visible characters, as commonly used for English text
+CHARS_PER_TOKEN = 4.0
+
+# Escape sequences (CSI, OSC, two-byte) and C0 controls other than whitespace;
+# removing them leaves roughly the text the assistant produced
+_NOT_TEXT = re.compile(rb"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)?|\x1b.|[\x00-\x08\x0b-\x1f\x7f]")
+
+
+@dataclass
+class Burst:
+    """A run of output chunks with no gap of BURST_GAP or more (times in seconds since the start)."""
+
+    start: float
+    end: float
+    bytes: int = 0
+
+
+@dataclass
+class Turn:
+    """
+    One prompt and the output that answers it.
+
+    Turn 0 starts when the child is started (`trigger` "start"); later turns
+    start when input ending a line is sent to the child (`trigger` "input").
+    """
+
+    index: int
+    trigger: str
+    start: float
+    input_bytes: int = 0
+    output_bytes: int = 0
+    visible_chars: int = 0
+    bursts: int = 0
+    first_output: float | None = None
+    last_output: float | None = None
+    max_idle_seconds: float = 0.0
+    chars_per_token: float = field(default=CHARS_PER_TOKEN, repr=False)
+
+    @property
+    def first_output_seconds(self) -> float | None:
+        """Time to first output: from the prompt to the first visible output."""
+        return self.first_output - self.start if self.first_output is not None else None
+
+    @property
+    def response_seconds(self) -> float | None:
+        """From the prompt to the last output of the turn."""
+        return self.last_output - self.start if self.last_output is not None else None
+
+    @property
+    def tokens(self) -> int:
+        return round(self.visible_chars / self.chars_per_token)
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        """Streaming rate: estimated tokens over the time from first to last output."""
+        if self.first_output is None or self.last_output is None or self.last_output <= self.first_output:
+            return None
+        return self.tokens / (self.last_output - self.first_output)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "index": self.index,
+            "trigger": self.trigger,
+            "start": round(self.start, 4),
+            "input_bytes": self.input_bytes,
+            "output_bytes": self.output_bytes,
+            "first_output_seconds": _round(self.first_output_seconds),
+            "response_seconds": _round(self.response_seconds),
+            "bursts": self.bursts,
+            "max_idle_seconds": round(self.max_idle_seconds, 4),
+            "tokens": self.tokens,
+            "tokens_per_second": _round(self.tokens_per_second, 1),
+        }
+
+
+def _round(value: float | None, digits: int = 4) -> float | None:
+    return round(value, digits) if value is not None else None
+
+
+class LatencyProfile:
+    """
+    Per-turn responsiveness of the captured program, from chunk timestamps.
+
+    The engines pass every output chunk to :attr:`sink` as it is read (before
+    the other sinks) and report input sent to the child through :meth:`input`
+    (keystrokes forwarded to a PTY) and :meth:`sent` (scripted input, via
+    :meth:`watch`). From that alone it derives:
+
+    - bursts of output, and the idle gaps of `burst_gap` seconds or more between them;
+    - turns: the startup turn, then one per submitted prompt (input ending in
+      a newline or carriage return; scripted input counts on every write);
+    - per turn, time to first output, response time, output size, and a token
+      estimate (visible characters / `chars_per_token`, escape sequences
+      excluded) with the streaming rate in tokens per second.
+
+    Output that is only whitespace does not count as the first output, so the
+    terminal echoing a newline does not hide the assistant's latency. The work
+    per chunk is a clock read and one regex pass, in the selector loop's thread.
+    """
+
+    def __init__(self, burst_gap: float = BURST_GAP, chars_per_token: float = CHARS_PER_TOKEN) -> None:
+        self.burst_gap = burst_gap
+        self.chars_per_token = chars_per_token
+        self.turns: list[Turn] = []
+        self.bursts: list[Burst] = []
+        self.idle_gaps: list[float] = []
+        self.duration = 0.0
+        self._started: float | None = None
+        self._typed = 0
+        self.sink = _LatencySink(self)
+
+    def _now(self) -> float:
+        if self._started is None:
+            self.begin()
+        assert self._started is not None
+        return time.monotonic() - self._started
+
+    def begin(self) -> None:
+        """Mark the start of the capture (call right before starting the child)."""
+        self._started = time.monotonic()
+        self.turns = [Turn(0, "start", 0.0, chars_per_token=self.chars_per_token)]
+
+    def output(self, chunk: bytes | memoryview) -> None:
+        now = self._now()
+        turn = self.turns[-1]
+        last = self.bursts[-1] if self.bursts else None
+        if last is None or now - last.end >= self.burst_gap:
+            if last is not None:
+                self.idle_gaps.append(now - last.end)
+            last = Burst(now, now)
+            self.bursts.append(last)
+            turn.bursts += 1
+        last.end = now
+        last.bytes += len(chunk)
+        text = _NOT_TEXT.sub(b"", chunk)
+        turn.output_bytes += len(chunk)
+        if turn.first_output is None:
+            if not text.strip():
+                return
+            turn.first_output = now
+        elif now - turn.last_output > turn.max_idle_seconds:  # type: ignore[operator]
+            turn.max_idle_seconds = now - turn.last_output  # type: ignore[operator]
+        turn.last_output = now
+        turn.visible_chars += len(text)
+
+    def input(self, data: bytes) -> None:
+        """Note keystrokes forwarded to the child; a line ending submits a prompt."""
+        self._prompt(len(data), b"\n" in data or b"\r" in data)
+
+    def sent(self, n: int) -> None:
+        """Note `n` bytes of scripted input written to the child (always a prompt)."""
+        self._prompt(n, True)
+
+    def _prompt(self, n: int, submitted: bool) -> None:
+        # Prompts sent before the current turn produced any output are merged
+        # into it, and its latency is measured from the last of them
+        now = self._now()
+        self._typed += n
+        if not submitted:
+            return
+        turn = self.turns[-1]
+        if turn.first_output is None:
+            turn.trigger = "input"
+            turn.start = now
+            turn.input_bytes += self._typed
+        else:
+            self.turns.append(Turn(len(self.turns), "input", now, self._typed, chars_per_token=self.chars_per_token))
+        self._typed = 0
+
+    def watch(self, feeder: Any) -> "InputTap":
+        """Wrap a scripted-input feeder (InputFeeder, ExpectSession) so its writes count as prompts."""
+        return InputTap(feeder, self)
+
+    def end(self) -> None:
+        """Mark the end of the capture."""
+        self.duration = self._now()
+
+    def summary(self) -> dict[str, Any]:
+        answered = [t for t in self.turns if t.first_output is not None]
+        rates = [r for r in (t.tokens_per_second for t in answered) if r is not None]
+        streaming = sum(t.last_output - t.first_output for t in answered)  # type: ignore[operator]
+        tokens = sum(t.tokens for t in answered)
+        return {
+            "turns": len(self.turns),
+            "answered_turns": len(answered),
+            "first_output_seconds_median": _median([t.first_output_seconds for t in answered]),
+            "first_output_seconds_max": _max([t.first_output_seconds for t in answered]),
+            "response_seconds_median": _median([t.response_seconds for t in answered]),
+            "response_seconds_max": _max([t.response_seconds for t in answered]),
+            "tokens": tokens,
+            "tokens_per_second": round(tokens / streaming, 1) if streaming > 0 else None,
+            "tokens_per_second_median": round(statistics.median(rates), 1) if rates else None,
+            "bursts": len(self.bursts),
+            "idle_gaps": len(self.idle_gaps),
+            "idle_seconds_total": round(sum(self.idle_gaps), 4),
+            "idle_seconds_max": round(max(self.idle_gaps), 4) if self.idle_gaps else 0.0,
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "burst_gap_seconds": self.burst_gap,
+            "chars_per_token": self.chars_per_token,
+            "duration_seconds": round(self.duration, 4),
+            "summary": self.summary(),
+            "turns": [t.to_dict() for t in self.turns],
+            "bursts": [{k: round(v, 4) for k, v in asdict(b).items()} for b in self.bursts],
+        }
+
+    def write_json(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2) + "\n", encoding="utf-8")
+
+    def banner(self) -> str:
+        """A summary line plus one line per turn, for logs."""
+        s = self.summary()
+        lines = [
+            f"[loopster] latency: {s['turns']} turns over {self.duration:.2f}s,"
+            f" first output median {_fmt(s['first_output_seconds_median'])} max {_fmt(s['first_output_seconds_max'])},"
+            f" response median {_fmt(s['response_seconds_median'])} max {_fmt(s['response_seconds_max'])},"
+            f" ~{s['tokens']} tokens at {_fmt(s['tokens_per_second'], ' tok/s')};"
+            f" {s['bursts']} bursts, {s['idle_gaps']} idle gaps ({s['idle_seconds_total']:.2f}s)"
+        ]
+        for t in self.turns:
+            lines.append(
+                f"[loopster]   turn {t.index} ({t.trigger} at {t.start:.2f}s): first output {_fmt(t.first_output_seconds)},"
+                f" response {_fmt(t.response_seconds)}, {t.bursts} bursts,"
+                f" ~{t.tokens} tokens at {_fmt(t.tokens_per_second, ' tok/s')}"
+            )
+        return "\n".join(lines)
+
+
+def _median(values: list[float | None]) -> float | None:
+    present = [v for v in values if v is not None]
+    return round(statistics.median(present), 4) if present else None
+
+
+def _max(values: list[float | None]) -> float | None:
+    present = [v for v in values if v is not None]
+    return round(max(present), 4) if present else None
+
+
+def _fmt(value: float | None, unit: str = "s") -> str:
+    if value is None:
+        return "n/a"
+    return f"{value:.1f}{unit}" if unit != "s" else f"{value:.2f}s"
+
+
+class _LatencySink:
+    def __init__(self, profile: LatencyProfile) -> None:
+        self._profile = profile
+
+    def write(self, chunk: bytes | memoryview) -> None:
+        self._profile.output(chunk)
+
+    def close(self) -> None:
+        pass
+
+
+class InputTap:
+    """Feeder wrapper that reports each write to a LatencyProfile (see LatencyProfile.watch)."""
+
+    def __init__(self, feeder: Any, profile: LatencyProfile) -> None:
+        self._feeder = feeder
+        self._profile = profile
+
+    @property
+    def fd(self) -> int:
+        return self._feeder.fd
+
+    @property
+    def done(self) -> bool:
+        return self._feeder.done
+
+    def wait_time(self) -> float | None:
+        return self._feeder.wait_time()
+
+    def on_writable(self) -> None:
+        before = self._feeder.bytes_written
+        self._feeder.on_writable()
+        written = self._feeder.bytes_written - before
+        if written:
+            self._profile.sent(written)
+
+    def finish(self) -> None:
+        self._feeder.finish()
+
+
+__all__ = ["BURST_GAP", "CHARS_PER_TOKEN", "Burst", "InputTap", "LatencyProfile", "Turn"]
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import asyncio
+import codecs
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator
+
+from .ansi_clean import AnsiSanitizer
+from .loop import pump, reap, terminate_group
+from .shell import command_argv, spawn
+from .sinks import RawLogSink, Sink, StdoutMirror, close_sinks, open_sinks
+from .stats import CaptureStats
+from .unbuffer import unbuffer_env
+
+
+@dataclass(frozen=True)
+class CapturedLine:
+    """One sanitized line and when it was finalized (seconds since the capture started)."""
+
+    time: float
+    text: str
+
+
+# Queue item marking the end of the stream
+_DONE = object()
+
+# Seconds stop() gives the child's process group to exit after SIGTERM before SIGKILL
+STOP_GRACE = 2.0
+
+
+class _LineSink:
+    """Sink that sanitizes output and hands finished lines to a LiveCapture."""
+
+    def __init__(self, owner: "LiveCapture") -> None:
+        self._owner = owner
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._sanitizer = AnsiSanitizer()
+
+    def _emit(self, text: str) -> None:
+        if not text:
+            return
+        now = time.monotonic() - self._owner.started
+        for line in text.splitlines():
+            self._owner._put(CapturedLine(now, line))
+
+    def write(self, chunk: bytes | memoryview) -> None:
+        text = self._decoder.decode(chunk)
+        if text:
+            self._emit(self._sanitizer.feed(text))
+
+    def close(self) -> None:
+        self._emit(self._sanitizer.feed(self._decoder.decode(b"", final=True)) + self._sanitizer.close())
+
+
+class LiveCapture:
+    """
+    Run a command and iterate over its sanitized output lines while it runs.
+
+    Returned by :func:`iter_capture`. Iterate it with ``for`` or ``async for``
+    (once); each item is a :class:`CapturedLine`. The child is read by the same
+    selector loop as ``capture_command`` (on a background thread), so the
+    optional cleaned/raw logs and mirroring behave as they do there.
+
+    - Lines are queued up to `max_pending`; a consumer that falls further behind
+      pauses reading, and the child eventually blocks on a full pipe.
+    - :meth:`stop` (or leaving the ``with`` block, or ``break`` followed by
+      garbage collection of the iterator) terminates the child and everything
+      it started (it runs in its own session), killing them after
+      STOP_GRACE seconds if they are still there.
+    - After the iteration ends, :attr:`returncode` holds the exit code (124 on
+      timeout). Errors raised by the capture loop are re-raised to the consumer.
+    """
+
+    def __init__(
+        self,
+        cmd: str,
+        output_path: str | None = None,
+        timeout: float | None = None,
+        env: dict[str, str] | None = None,
+        mirror_to_stdout: bool = False,
+        raw_output_path: str | None = None,
+        prepend_header: str | None = None,
+        stats: CaptureStats | None = None,
+        shell: str = "login",
+        unbuffer: bool = False,
+        max_pending: int = 10000,
+    ) -> None:
+        self.cmd = cmd
+        self.returncode: int | None = None
+        self.started = 0.0
+        self._argv = command_argv(cmd, shell)
+        self._env = unbuffer_env(env) if unbuffer else env
+        self._shell = shell
+        self._timeout = timeout
+        self._stats = stats
+        self._output_path = output_path
+        self._raw_output_path = raw_output_path
+        self._prepend_header = prepend_header
+        self._mirror_to_stdout = mirror_to_stdout
+        self._queue: queue.Queue = queue.Queue(max_pending)
+        self._stopped = threading.Event()
+        self._wake: tuple[asyncio.AbstractEventLoop, asyncio.Event] | None = None
+        self._proc: subprocess.Popen | None = None
+        self._thread: threading.Thread | None = None
+        self._error: BaseException | None = None
+        self._finished = False
+
+    def _sinks(self) -> list[Sink]:
+        if self._output_path:
+            sinks = open_sinks(
+                self._output_path,
+                prepend_header=self._prepend_header,
+                raw_output_path=self._raw_output_path,
+                mirror_to_stdout=self._mirror_to_stdout,
+                stats=self._stats,
+                timeline_command=self.cmd,
+            )
+        else:
+            sinks = []
+            if self._raw_output_path:
+                sinks.append(RawLogSink(self._raw_output_path))
+            if self._mirror_to_stdout:
+                sinks.append(StdoutMirror(stats=self._stats))
+        # Lines go out before the (possibly blocking) mirror
+        sinks.insert(0, _LineSink(self))
+        return sinks
+
+    def _start(self) -> None:
+        if self._thread is not None:
+            raise RuntimeError("a LiveCapture can only be iterated once")
+        sinks = self._sinks()
+        if self._stats is not None:
+            self._stats.spawning(self._shell)
+        self.started = time.monotonic()
+        try:
+            self._proc = spawn(
+                self._argv,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env=self._env,
+                bufsize=0,
+                start_new_session=True,
+            )
+        except BaseException:
+            close_sinks(sinks)
+            raise
+        if self._stats is not None:
+            self._stats.spawned()
+        self._thread = threading.Thread(target=self._run, args=(sinks,), name="loopster-live", daemon=True)
+        self._thread.start()
+
+    def _run(self, sinks: list[Sink]) -> None:
+        proc = self._proc
+        assert proc is not None and proc.stdout is not None
+        timed_out = False
+        try:
+            timed_out = pump(
+                proc, proc.stdout.fileno(), sinks, timeout=self._timeout, terminate=terminate_group, stats=self._stats
+            )
+        except BaseException as e:
+            self._error = e
+        finally:
+            try:
+                close_sinks(sinks)
+            except BaseException as e:
+                if self._error is None:
+                    self._error = e
+            reap(proc)
+            proc.stdout.close()
+            self.returncode = 124 if timed_out else proc.returncode
+            self._put(_DONE, force=True)
+
+    def _put(self, item: object, force: bool = False) -> None:
+        while True:
+            if self._stopped.is_set() and not force:
+                return
+            try:
+                self._queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                if force and self._stopped.is_set():
+                    # Nobody is reading anymore; make room for the end marker
+                    try:
+                        self._queue.get_nowait()
+                    except queue.Empty:
+                        pass
+        wake = self._wake
+        if wake is not None:
+            loop, event = wake
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The consumer's event loop is already closed
+                pass
+
+    def _next(self, item: object) -> CapturedLine:
+        if item is _DONE:
+            self._finished = True
+            assert self._thread is not None
+            self._thread.join()
+            if self._error is not None:
+                raise self._error
+            raise StopIteration
+        assert isinstance(item, CapturedLine)
+        return item
+
+    def __iter__(self) -> Iterator[CapturedLine]:
+        self._start()
+        try:
+            while not self._stopped.is_set():
+                try:
+                    yield self._next(self._queue.get())
+                except StopIteration:
+                    return
+        finally:
+            self.stop()
+
+    async def _aiter(self) -> AsyncIterator[CapturedLine]:
+        event = asyncio.Event()
+        self._wake = (asyncio.get_running_loop(), event)
+        self._start()
+        try:
+            while not self._stopped.is_set():
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    event.clear()
+                    if self._queue.empty():
+                        await event.wait()
+                    continue
+                try:
+                    yield self._next(item)
+                except StopIteration:
+                    return
+        finally:
+            self.stop()
+
+    def __aiter__(self) -> AsyncIterator[CapturedLine]:
+        return self._aiter()
+
+    def stop(self) -> None:
+        """Terminate the child (if still running) and wait for the capture to wind down."""
+        if self._thread is None or self._finished:
+            return
+        self._stopped.set()
+        assert self._proc is not None
+        terminate_group(self._proc)
+        self._thread.join(STOP_GRACE)
+        if self._thread.is_alive():
+            try:
+                os.killpg(self._proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            # Something outside the group may still hold the output open; the
+            # capture thread is a daemon, so do not wait on it forever
+            self._thread.join(STOP_GRACE)
+        self._finished = True
+
+    def __enter__(self) -> "LiveCapture":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+
+def iter_capture(cmd: str, output_path: str | None = None, **kwargs) -> LiveCapture:
+    """
+    Capture `cmd` and yield its sanitized lines, with timestamps, as they appear::
+
+        with iter_capture("agent --task x", "session.log") as lines:
+            for line in lines:
+                if "Traceback" in line.text:
+                    lines.stop()
+        print(lines.returncode)
+
+    ``async for line in iter_capture(...)`` works the same way on an event loop.
+    `output_path`, if given, also gets the cleaned log as with ``capture_command``;
+    other options are those of :class:`LiveCapture`.
+    """
+    return LiveCapture(cmd, output_path, **kwargs)
+
+
+__all__ = ["STOP_GRACE", "CapturedLine", "LiveCapture", "iter_capture"]
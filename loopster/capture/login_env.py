@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Mapping
+
+
+# What `bash -l` reads: /etc/profile (and what it pulls in on most distros),
+# then the first of ~/.bash_profile, ~/.bash_login, ~/.profile, which usually
+# source ~/.bashrc. All of them are part of the cache key.
+SYSTEM_PROFILES = ("/etc/profile", "/etc/bash.bashrc", "/etc/bashrc", "/etc/profile.d/*.sh")
+USER_PROFILES = ("~/.bash_profile", "~/.bash_login", "~/.profile", "~/.bashrc")
+
+# Ambient variables that also shape what the profiles do. A login shell builds
+# on the PATH it inherits, so a changed PATH (e.g. an activated virtualenv)
+# must not get the PATH snapshotted from another one.
+_KEY_ENV = ("HOME", "USER", "SHELL", "PATH")
+
+# Per-process variables that must not be replayed into later commands
+_VOLATILE = frozenset({"_", "PWD", "OLDPWD", "SHLVL"})
+
+_MARKER = "__LOOPSTER_LOGIN_ENV__"
+
+
+def default_cache_path() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "loopster" / "login-env.json"
+
+
+def profile_files() -> list[Path]:
+    """Profile files that exist on this machine, in the order bash reads them."""
+    out: list[Path] = []
+    for pattern in SYSTEM_PROFILES + USER_PROFILES:
+        for name in sorted(glob.glob(os.path.expanduser(pattern))):
+            p = Path(name)
+            if p.is_file() and p not in out:
+                out.append(p)
+    return out
+
+
+def snapshot_key(files: list[Path] | None = None) -> str:
+    """
+    Hash of every profile file's path, mtime, size and contents, plus the bash
+    binary and the ambient variables the profiles usually read.
+
+    Files sourced from inside a profile (nvm.sh, conda's hook, ...) are not
+    followed; editing one of those needs a refresh.
+    """
+    h = hashlib.sha256()
+    h.update(f"bash={shutil.which('bash')}\n".encode())
+    for name in _KEY_ENV:
+        h.update(f"{name}={os.environ.get(name, '')}\n".encode())
+    for p in profile_files() if files is None else files:
+        try:
+            st = p.stat()
+            data = p.read_bytes()
+        except OSError:
+            continue
+        h.update(f"{p}\0{st.st_mtime_ns}\0{st.st_size}\0".encode())
+        h.update(hashlib.sha256(data).digest())
+    return h.hexdigest()
+
+
+def capture_login_env(timeout: float = 30.0) -> dict[str, str]:
+    """Run a login shell once and return the environment it ends up with."""
+    # Profiles may print to stdout; everything before the marker is theirs
+    proc = subprocess.run(
+        ["bash", "-lc", f"printf '%s\\0' {_MARKER}; env -0"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        timeout=timeout,
+    )
+    marker = _MARKER.encode() + b"\0"
+    if proc.returncode != 0 or marker not in proc.stdout:
+        raise RuntimeError(f"login shell exited with {proc.returncode} before printing its environment")
+    body = proc.stdout.split(marker, 1)[1]
+    env: dict[str, str] = {}
+    for item in body.split(b"\0"):
+        name, sep, value = item.partition(b"=")
+        if sep and name:
+            env[os.fsdecode(name)] = os.fsdecode(value)
+    return env
+
+
+def _delta(before: Mapping[str, str], after: Mapping[str, str]) -> tuple[dict[str, str], list[str]]:
+    """What the login shell set and unset, relative to the environment it started from."""
+    changed = {k: v for k, v in after.items() if k not in _VOLATILE and before.get(k) != v}
+    removed = sorted(k for k in before if k not in after and k not in _VOLATILE)
+    return changed, removed
+
+
+def login_env(
+    base: Mapping[str, str] | None = None,
+    cache_path: str | Path | None = None,
+    refresh: bool = False,
+) -> tuple[dict[str, str], bool]:
+    """
+    Environment a login shell would give a command, without running one each time.
+
+    The first call (or any call after a profile file changed) runs ``bash -l``
+    once and caches what it set and unset. Later calls apply that delta to
+    `base` (default: ``os.environ``), so the result can be passed as ``env=``
+    with ``shell="non-login"``. Returns ``(env, cache_hit)``.
+
+    The cache file is written with mode 0600 since environments tend to hold
+    tokens.
+    """
+    base = dict(os.environ if base is None else base)
+    path = Path(cache_path) if cache_path is not None else default_cache_path()
+    key = snapshot_key()
+    data = None
+    if not refresh:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = None
+        if not isinstance(data, dict) or data.get("key") != key:
+            data = None
+    hit = data is not None
+    if data is None:
+        changed, removed = _delta(os.environ, capture_login_env())
+        data = {"key": key, "created": time.time(), "set": changed, "unset": removed}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+        os.replace(tmp, path)
+    for name in data.get("unset", []):
+        base.pop(name, None)
+    base.update(data.get("set", {}))
+    return base, hit
+
+
+__all__ = ["capture_login_env", "default_cache_path", "login_env", "profile_files", "snapshot_key"]
@@ -0,0 +1,371 @@
+from __future__ import annotations
+
+import errno
+import fcntl
+import os
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Sequence
+
+from .inputs import InputFeeder
+from .sinks import Sink
+from .stats import CaptureStats, ResourceUsage
+
+if TYPE_CHECKING:
+    from .zerocopy import SpliceTee
+
+
+MIN_READ_SIZE = 4096
+MAX_READ_SIZE = 1 << 20
+
+
+class AdaptiveReader:
+    """
+    Read a descriptor into one reusable buffer, sizing reads to the traffic.
+
+    - Reads go straight into a preallocated buffer (no per-read bytes object);
+      :meth:`read` returns a memoryview that is only valid until the next read.
+    - After consecutive reads fill the buffer, the read size doubles (up to
+      `max_size`) and, for pipes, the kernel pipe buffer is enlarged to match.
+      A run of small reads shrinks it back.
+    """
+
+    # Consecutive full reads before growing / small reads before shrinking
+    GROW_AFTER = 2
+    SHRINK_AFTER = 16
+
+    def __init__(
+        self,
+        fd: int,
+        stats: CaptureStats | None = None,
+        min_size: int = MIN_READ_SIZE,
+        max_size: int = MAX_READ_SIZE,
+    ) -> None:
+        self.fd = fd
+        self.stats = stats
+        self.size = min_size
+        self._min_size = min_size
+        self._max_size = max_size
+        self._view = memoryview(bytearray(min_size))
+        self._full = 0
+        self._small = 0
+
+    def read(self) -> memoryview:
+        size = self.size
+        n = os.readv(self.fd, [self._view[:size]])
+        if self.stats is not None and n:
+            # The zero-byte read at end of file is not a read of output
+            if not self.stats.bytes_read:
+                self.stats.output_seen()
+            self.stats.bytes_read += n
+            self.stats.read_calls += 1
+            if n > self.stats.max_read_size:
+                self.stats.max_read_size = n
+        chunk = self._view[:n]
+        if n == size:
+            self._small = 0
+            self._full += 1
+            if self._full >= self.GROW_AFTER and size < self._max_size:
+                self._grow(min(size * 2, self._max_size))
+        elif n < size // 4:
+            self._full = 0
+            self._small += 1
+            if self._small >= self.SHRINK_AFTER and size > self._min_size:
+                self.size = max(size // 2, self._min_size)
+                self._small = 0
+        else:
+            self._full = self._small = 0
+        return chunk
+
+    def _grow(self, size: int) -> None:
+        self._full = 0
+        self.size = size
+        if len(self._view) < size:
+            # Fresh buffer: the caller may still hold a view of the old one.
+            self._view = memoryview(bytearray(size))
+        try:
+            if fcntl.fcntl(self.fd, fcntl.F_GETPIPE_SZ) < size:
+                fcntl.fcntl(self.fd, fcntl.F_SETPIPE_SZ, size)
+        except (AttributeError, OSError):
+            # Not a pipe (e.g. a PTY), not Linux, or above the system limit
+            pass
+
+
+def _terminate(proc: subprocess.Popen) -> None:
+    try:
+        proc.terminate()
+    except Exception:
+        pass
+
+
+def terminate_group(proc: subprocess.Popen) -> None:
+    """
+    SIGTERM the process group led by a child started in its own session, and so
+    everything it started; a child that leads no group is terminated alone.
+    """
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except Exception:
+        _terminate(proc)
+
+
+def poll_child(proc: subprocess.Popen, usage: ResourceUsage | None = None) -> int | None:
+    """
+    Like ``proc.poll()``, but with `usage`, reap through ``os.wait4`` so the
+    child's resource usage is recorded before it is gone.
+    """
+    if usage is None or proc.returncode is not None:
+        return proc.poll()
+    try:
+        pid, status, ru = os.wait4(proc.pid, os.WNOHANG)
+    except ChildProcessError:
+        return proc.poll()
+    if pid == 0:
+        return None
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    usage.record_child(ru)
+    return proc.returncode
+
+
+# Poll interval used only when neither pidfd nor SIGCHLD can signal child exit
+POLL_INTERVAL = 0.1
+
+
+class _ExitWatch:
+    """
+    A descriptor that becomes readable when the child exits.
+
+    Prefers ``os.pidfd_open`` (Linux 5.3+). Otherwise, on the main thread, a
+    SIGCHLD handler writes to a self-pipe (any child's exit wakes it, so callers
+    confirm with ``proc.poll()``). Elsewhere ``fd`` is None and callers poll.
+    """
+
+    def __init__(self, proc: subprocess.Popen) -> None:
+        self.fd: int | None = None
+        self._pipe: tuple[int, int] | None = None
+        self._previous: object = None
+        pidfd_open = getattr(os, "pidfd_open", None)
+        if pidfd_open is not None:
+            try:
+                self.fd = pidfd_open(proc.pid)
+                return
+            except OSError:
+                pass
+        if threading.current_thread() is threading.main_thread():
+            r, w = os.pipe()
+            os.set_blocking(r, False)
+            os.set_blocking(w, False)
+            self._pipe = (r, w)
+            self._previous = signal.signal(signal.SIGCHLD, self._on_sigchld)
+            self.fd = r
+
+    def _on_sigchld(self, signum: int, frame: object) -> None:
+        assert self._pipe is not None
+        try:
+            os.write(self._pipe[1], b"\0")
+        except OSError:
+            pass
+        if callable(self._previous):
+            self._previous(signum, frame)
+
+    def clear(self) -> None:
+        """Consume pending self-pipe wakeups."""
+        if self._pipe is None:
+            return
+        try:
+            while os.read(self._pipe[0], 512):
+                pass
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        if self._pipe is not None:
+            previous = self._previous if self._previous is not None else signal.SIG_DFL
+            signal.signal(signal.SIGCHLD, previous)
+            for end in self._pipe:
+                os.close(end)
+            self._pipe = None
+        elif self.fd is not None:
+            os.close(self.fd)
+        self.fd = None
+
+
+def pump(
+    proc: subprocess.Popen,
+    fd: int,
+    sinks: Sequence[Sink],
+    timeout: float | None = None,
+    readers: dict[int, Callable[[int], bool]] | None = None,
+    terminate: Callable[[subprocess.Popen], None] = _terminate,
+    stats: CaptureStats | None = None,
+    feeder: InputFeeder | None = None,
+    streams: dict[int, Sequence[Sink]] | None = None,
+    usage: ResourceUsage | None = None,
+    reader: "SpliceTee | None" = None,
+) -> bool:
+    """
+    Selector loop shared by the capture engines.
+
+    - Reads the child's output `fd` until EOF (or EIO, as a PTY master reports
+      once the child side is closed) or until the child has exited and no more
+      output is immediately available.
+    - `streams` maps further output descriptors of the child (e.g. a separate
+      stderr pipe) to their own sinks; they are read in the same selector, and
+      the loop only ends at EOF once every output has reached it.
+    - Child exit is an event in the same selector (pidfd, or a SIGCHLD
+      self-pipe), and the select timeout is the time left until the deadline,
+      so idle children cause no periodic wakeups.
+    - Hands every chunk to each sink in order. Chunks are views into a reused
+      buffer (see :class:`AdaptiveReader`); read counters go to `stats`.
+    - `readers` maps extra file descriptors to callbacks run when they become
+      readable; a callback returns False to stop watching its descriptor.
+    - `feeder` streams scripted input to the child whenever its descriptor is
+      writable (it may share `fd`, as with a PTY master), so large inputs never
+      block reading the child's output.
+    - With `usage`, the child is reaped through :func:`poll_child` so its
+      resource usage is recorded.
+    - `reader` replaces the :class:`AdaptiveReader` for `fd`: a
+      :class:`~loopster.capture.zerocopy.SpliceTee` moves each chunk to its
+      outputs inside the kernel and returns only the byte count, so `sinks`
+      should be empty.
+    - On timeout, calls `terminate(proc)` and returns True; otherwise False.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    outputs: dict[int, tuple] = {fd: (reader or AdaptiveReader(fd, stats=stats), sinks)}
+    for extra_fd, extra_sinks in (streams or {}).items():
+        outputs[extra_fd] = (AdaptiveReader(extra_fd, stats=stats), extra_sinks)
+    sel = selectors.DefaultSelector()
+    masks: dict[int, int] = {}
+
+    def watch_fd(target: int, mask: int, on: bool) -> None:
+        old = masks.get(target, 0)
+        new = old | mask if on else old & ~mask
+        if new == old:
+            return
+        if not old:
+            sel.register(target, new)
+        elif not new:
+            sel.unregister(target)
+        else:
+            sel.modify(target, new)
+        if new:
+            masks[target] = new
+        else:
+            masks.pop(target, None)
+
+    watch = _ExitWatch(proc)
+    exited = False
+    try:
+        for out_fd in outputs:
+            watch_fd(out_fd, selectors.EVENT_READ, True)
+        for extra_fd in readers or {}:
+            watch_fd(extra_fd, selectors.EVENT_READ, True)
+        if watch.fd is not None:
+            watch_fd(watch.fd, selectors.EVENT_READ, True)
+            # The child may have exited before the watch was armed
+            exited = poll_child(proc, usage) is not None
+        while True:
+            feed_wait: float | None = None
+            if feeder is not None and not feeder.done:
+                feed_wait = feeder.wait_time()
+                watch_fd(feeder.fd, selectors.EVENT_WRITE, feed_wait == 0)
+            if exited:
+                # Drain what is already buffered, then stop. A background job
+                # that keeps writing would make that endless, so the deadline
+                # still applies
+                wait: float | None = 0
+                if deadline is not None and time.monotonic() >= deadline:
+                    terminate(proc)
+                    return True
+            elif deadline is not None:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    terminate(proc)
+                    return True
+                if watch.fd is None:
+                    wait = min(wait, POLL_INTERVAL)
+            else:
+                wait = None if watch.fd is not None else POLL_INTERVAL
+            if feed_wait:
+                wait = feed_wait if wait is None else min(wait, feed_wait)
+
+            events = sel.select(timeout=wait)
+            if not events:
+                if exited:
+                    return False
+                if watch.fd is None and poll_child(proc, usage) is not None:
+                    # Polling fallback
+                    return False
+                continue
+            for key, mask in events:
+                if feeder is not None and key.fd == feeder.fd and mask & selectors.EVENT_WRITE:
+                    feeder.on_writable()
+                    if feeder.done:
+                        watch_fd(feeder.fd, selectors.EVENT_WRITE, False)
+                    if not mask & selectors.EVENT_READ:
+                        continue
+                if key.fd == watch.fd:
+                    watch.clear()
+                    if poll_child(proc, usage) is not None:
+                        exited = True
+                        watch_fd(key.fd, selectors.EVENT_READ, False)
+                    continue
+                if key.fd not in outputs:
+                    assert readers is not None
+                    if not readers[key.fd](key.fd):
+                        watch_fd(key.fd, selectors.EVENT_READ, False)
+                    continue
+                reader, out_sinks = outputs[key.fd]
+                try:
+                    chunk = reader.read()
+                except BlockingIOError:
+                    continue
+                except OSError as e:
+                    if e.errno != errno.EIO:
+                        raise
+                    chunk = b""
+                if not chunk:
+                    # EOF on one of the child's outputs
+                    watch_fd(key.fd, selectors.EVENT_READ, False)
+                    del outputs[key.fd]
+                    if not outputs:
+                        return False
+                    continue
+                for sink in out_sinks:
+                    sink.write(chunk)
+    finally:
+        sel.close()
+        watch.close()
+
+
+def _wait(proc: subprocess.Popen, timeout: float, usage: ResourceUsage | None) -> None:
+    if usage is None:
+        proc.wait(timeout=timeout)
+        return
+    # os.wait4 has no timeout: poll it (the child has normally exited already)
+    deadline = time.monotonic() + timeout
+    while poll_child(proc, usage) is None:
+        if time.monotonic() >= deadline:
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+        time.sleep(0.005)
+
+
+def reap(proc: subprocess.Popen, usage: ResourceUsage | None = None) -> None:
+    """Wait briefly for the child to exit, killing it if needed; ignore errors."""
+    try:
+        _wait(proc, 1, usage)
+    except Exception:
+        try:
+            proc.kill()
+        except Exception:
+            pass
+        try:
+            _wait(proc, 1, usage)
+        except Exception:
+            pass
+
+
+__all__ = ["AdaptiveReader", "MAX_READ_SIZE", "MIN_READ_SIZE", "poll_child", "pump", "reap", "terminate_group"]
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Any, Callable, Sequence
+
+from ..config import load_toml
+from .async_capture import capture_command_async
+from .inputs import iter_input_items
+from .shell import SpawnError
+from .worker import ShellWorker
+
+
+@dataclass
+class CaptureJob:
+    cmd: str
+    log: str
+    timeout: float | None = None
+    raw: str | None = None
+    inputs: list[str] = field(default_factory=list)
+    input_file: str | None = None
+
+
+def parse_manifest(data: dict[str, Any], base: str | os.PathLike[str] | None = None) -> list[CaptureJob]:
+    """
+    Build capture jobs from a manifest mapping.
+
+    Relative `log`, `raw` and `input_file` paths are taken relative to `base`
+    (the manifest's directory, for :func:`load_manifest`) when given.
+
+    Expected shape (TOML)::
+
+        timeout = 60            # optional default for every job
+
+        [[job]]
+        cmd = "your-cli --args"
+        log = "logs/one.log"
+        timeout = 10            # optional, overrides the default
+        raw = "logs/one.raw"    # optional
+        inputs = ["y\\n"]        # optional scripted stdin
+        input_file = "in.txt"   # optional, fed after inputs
+    """
+    entries = data.get("job")
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("manifest needs at least one [[job]] entry")
+    default_timeout = data.get("timeout")
+
+    def resolve(path: str) -> str:
+        return os.path.join(base, path) if base is not None else path
+
+    jobs: list[CaptureJob] = []
+    for n, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"job {n}: expected a table")
+        cmd = entry.get("cmd")
+        log = entry.get("log")
+        if not isinstance(cmd, str) or not cmd:
+            raise ValueError(f"job {n}: missing 'cmd'")
+        if not isinstance(log, str) or not log:
+            raise ValueError(f"job {n}: missing 'log'")
+        timeout = entry.get("timeout", default_timeout)
+        # bool is an int subclass, but `timeout = true` is a mistake
+        if timeout is not None and (not isinstance(timeout, (int, float)) or isinstance(timeout, bool)):
+            raise ValueError(f"job {n}: 'timeout' must be a number")
+        raw = entry.get("raw")
+        if raw is not None and not isinstance(raw, str):
+            raise ValueError(f"job {n}: 'raw' must be a path")
+        inputs = entry.get("inputs", [])
+        if not isinstance(inputs, list) or not all(isinstance(it, str) for it in inputs):
+            raise ValueError(f"job {n}: 'inputs' must be a list of strings")
+        input_file = entry.get("input_file")
+        if input_file is not None and not isinstance(input_file, str):
+            raise ValueError(f"job {n}: 'input_file' must be a path")
+        jobs.append(
+            CaptureJob(
+                cmd=cmd,
+                log=resolve(log),
+                timeout=float(timeout) if timeout is not None else None,
+                raw=resolve(raw) if raw is not None else None,
+                inputs=inputs,
+                input_file=resolve(input_file) if input_file is not None else None,
+            )
+        )
+    return jobs
+
+
+def load_manifest(path: str | os.PathLike[str]) -> list[CaptureJob]:
+    return parse_manifest(load_toml(path), base=os.path.dirname(os.fspath(path)))
+
+
+async def run_jobs_async(
+    jobs: Sequence[CaptureJob],
+    max_parallel: int | None = None,
+    env: dict[str, str] | None = None,
+    raw_fsync_interval: float | None = None,
+    on_done: Callable[[int, CaptureJob, int], None] | None = None,
+    shell: str = "login",
+    header: Callable[[CaptureJob], str] | None = None,
+    unbuffer: bool = False,
+    on_error: Callable[[int, CaptureJob, Exception], None] | None = None,
+) -> list[int]:
+    """
+    Capture every job concurrently on the running event loop.
+
+    - At most `max_parallel` children run at once (unbounded if None).
+    - Each command is started per `shell` (login, non-login or exec; see
+      loopster.capture.shell), with `unbuffer` as in capture_command_async.
+    - `header(job)`, if given, is written at the top of each job's log.
+    - Output is never mirrored; each job writes only its own logs.
+    - A job that cannot run (e.g. its program or log cannot be opened) does
+      not stop the others: `on_error(index, job, error)` is called and it
+      gets exit code 127 if the program could not be started, else 1.
+    - `on_done(index, job, exit_code)` is called as each job finishes.
+    - Returns exit codes in job order (124 for jobs that timed out).
+    """
+    limit = asyncio.Semaphore(max_parallel) if max_parallel else None
+
+    async def run_one(index: int, job: CaptureJob) -> int:
+        async def capture() -> int:
+            try:
+                return await capture_command_async(
+                    job.cmd,
+                    job.log,
+                    inputs=job.inputs,
+                    input_file=job.input_file,
+                    timeout=job.timeout,
+                    env=env,
+                    mirror_to_stdout=False,
+                    raw_output_path=job.raw,
+                    prepend_header=header(job) if header is not None else None,
+                    raw_fsync_interval=raw_fsync_interval,
+                    shell=shell,
+                    unbuffer=unbuffer,
+                )
+            except Exception as e:
+                if on_error is not None:
+                    on_error(index, job, e)
+                return 127 if isinstance(e, SpawnError) else 1
+
+        if limit is None:
+            code = await capture()
+        else:
+            async with limit:
+                code = await capture()
+        if on_done is not None:
+            on_done(index, job, code)
+        return code
+
+    return list(await asyncio.gather(*(run_one(i, job) for i, job in enumerate(jobs))))
+
+
+def run_jobs(
+    jobs: Sequence[CaptureJob],
+    max_parallel: int | None = None,
+    env: dict[str, str] | None = None,
+    raw_fsync_interval: float | None = None,
+    on_done: Callable[[int, CaptureJob, int], None] | None = None,
+    shell: str = "login",
+    header: Callable[[CaptureJob], str] | None = None,
+    unbuffer: bool = False,
+    on_error: Callable[[int, CaptureJob, Exception], None] | None = None,
+) -> list[int]:
+    """Blocking wrapper around :func:`run_jobs_async` (one event loop for all jobs)."""
+    return asyncio.run(
+        run_jobs_async(
+            jobs,
+            max_parallel=max_parallel,
+            env=env,
+            raw_fsync_interval=raw_fsync_interval,
+            on_done=on_done,
+            shell=shell,
+            header=header,
+            unbuffer=unbuffer,
+            on_error=on_error,
+        )
+    )
+
+
+def run_jobs_in_worker(
+    jobs: Sequence[CaptureJob],
+    shell: str = "login",
+    env: dict[str, str] | None = None,
+    raw_fsync_interval: float | None = None,
+    on_done: Callable[[int, CaptureJob, int], None] | None = None,
+    header: Callable[[CaptureJob], str] | None = None,
+) -> list[int]:
+    """
+    Capture every job in order through one persistent shell (see ShellWorker).
+
+    - Much cheaper than a process per job when jobs are many and short; jobs
+      run one at a time.
+    - Scripted `inputs` and `input_file` are written to a temporary file that
+      becomes the job's stdin.
+    - `header(job)`, if given, is written at the top of each job's log.
+    - Returns exit codes in job order (124 for jobs that timed out).
+    """
+    codes: list[int] = []
+    with ShellWorker(shell=shell, env=env) as worker, tempfile.TemporaryDirectory(prefix="loopster_") as tmp:
+        for index, job in enumerate(jobs):
+            stdin_path = None
+            if job.inputs or job.input_file:
+                stdin_path = os.path.join(tmp, f"stdin-{index}")
+                with open(stdin_path, "wb") as fh:
+                    fh.writelines(iter_input_items(job.inputs, job.input_file))
+            code = worker.run(
+                job.cmd,
+                job.log,
+                timeout=job.timeout,
+                stdin_path=stdin_path,
+                prepend_header=header(job) if header is not None else None,
+                raw_output_path=job.raw,
+                raw_fsync_interval=raw_fsync_interval,
+            )
+            if stdin_path is not None:
+                os.unlink(stdin_path)
+            codes.append(code)
+            if on_done is not None:
+                on_done(index, job, code)
+    return codes
+
+
+__all__ = ["CaptureJob", "load_manifest", "parse_manifest", "run_jobs", "run_jobs_async", "run_jobs_in_worker"]
@@ -2,19 +2,17 @@ from __future__ import annotations
 
 import os
 import subprocess
-import sys
-import locale
-import time
-from pathlib import Path
-from typing import Iterable
-from .ansi_clean import sanitize_ansi
-import selectors
-
-
-def _to_bytes(items: Iterable[str | bytes] | None) -> list[bytes]:
-    if not items:
-        return []
-    return [it if isinstance(it, bytes) else it.encode() for it in items]
+from typing import Iterable, Sequence
+from .expect import ExpectScript, ExpectSession
+from .inputs import InputFeeder, iter_input_items
+from .latency import InputTap, LatencyProfile
+from .loop import poll_child, pump, reap, terminate_group
+from .sinks import KEEP_CHOICES, CleanLogSink, Sink, channel_of, close_sinks, open_sinks
+from .shell import command_argv, spawn
+from .stats import CaptureStats, ResourceUsage
+from .streams import STDERR, STDOUT, StreamIndexWriter
+from .unbuffer import unbuffer_env
+from .zerocopy import SpliceTee, can_zero_copy, stdout_fd
 
 
 def capture_command(
@@ -26,119 +24,229 @@ def capture_command(
     mirror_to_stdout: bool = True,
     raw_output_path: str | None = None,
     prepend_header: str | None = None,
+    raw_fsync_interval: float | None = None,
+    stats: CaptureStats | None = None,
+    mirror_policy: str = "block",
+    input_file: str | None = None,
+    input_delay: float | None = None,
+    timeline_path: str | None = None,
+    max_bytes: int | None = None,
+    keep: Sequence[str] = KEEP_CHOICES,
+    stderr_output_path: str | None = None,
+    stream_index_path: str | None = None,
+    usage: ResourceUsage | None = None,
+    shell: str = "login",
+    unbuffer: bool = False,
+    zero_copy: bool = False,
+    pipeline: bool = False,
+    expect: ExpectScript | None = None,
+    latency: LatencyProfile | None = None,
 ) -> int:
     """
     Capture a command's stdout/stderr to a file using pipes.
 
+    - `cmd` runs through ``bash -lc`` by default; `shell` may instead be
+      "non-login" (``bash -c``, skipping the login profile) or "exec" (split
+      into argv and run with no shell at all).
     - No PTY is allocated; programs will see non-interactive stdio.
-    - Writes combined stdout+stderr to `output_path`.
-    - Optionally feeds scripted `inputs` to stdin (then closes stdin).
-    - Returns the process exit code; raises TimeoutError on timeout.
+    - Writes combined stdout+stderr to `output_path`, sanitized as it streams
+      (the log is readable while the command runs).
+    - Optionally appends the exact raw bytes to `raw_output_path` as they are
+      read (fsync'd every `raw_fsync_interval` seconds, if given).
+    - Optionally feeds scripted `inputs`, then the lines of `input_file`, to
+      stdin while output is being read (waiting `input_delay` seconds before
+      each item), then closes stdin.
+    - Mirroring runs on a writer thread; `mirror_policy` ("block", "drop" or
+      "summarize") applies when the terminal falls behind (see StdoutMirror).
+    - If `stats` is given, read counters are recorded into it.
+    - Optionally records every chunk with its timestamp to `timeline_path`
+      (asciicast v2, or the binary format for ``.lpt``; see TimelineSink).
+    - With `max_bytes`, the cleaned log keeps only the first and/or last
+      `max_bytes` of output (`keep`), with an elision marker; the raw log and
+      mirror still see everything.
+    - With `stderr_output_path` and/or `stream_index_path`, stderr is read from
+      its own pipe in the same selector: the regular outputs still get the
+      merged stream, `stderr_output_path` gets stderr alone (sanitized), and
+      `stream_index_path` records (stream, offset, length, time) per chunk so
+      either view can be rebuilt (see StreamIndex).
+    - If `usage` is given, the child's CPU time, max RSS, context switches and
+      wall time, plus loopster's own CPU time, are recorded into it.
+    - With `unbuffer`, the child's environment asks Python and C stdio not to
+      block-buffer the pipe (see unbuffer_env), so output is mirrored as it is
+      written rather than in bursts; ``stats.first_output_seconds`` shows the
+      effect on time to first byte.
+    - With `zero_copy` (Linux), when the raw log is uncompressed and there is
+      no timeline, stderr split or non-blocking mirror policy, the output is
+      spliced into the raw log and mirrored from it inside the kernel (see
+      SpliceTee), and the cleaned log is sanitized from the raw log on a side
+      thread, lagging behind a fast child instead of slowing it down.
+      Otherwise the flag is ignored.
+    - With `pipeline`, the raw and cleaned logs are written by their own
+      threads behind bounded queues, so sanitizing never stalls reading;
+      per-stage counters go to ``stats.stages`` (see ThreadedSink).
+    - With `expect`, stdin is driven by that script instead of `inputs`: each
+      ``send`` waits for the preceding ``expect`` pattern to show up in the
+      sanitized output. When the script ends, stdin is closed; if it fails
+      (timeout, ``fail`` pattern, output ending first) the child, which then
+      runs in its own session, is terminated with its whole process group,
+      and ExpectError is raised after the logs are closed (see ExpectSession).
+    - If `latency` is given, output chunk times and the writes of scripted
+      input are recorded into it, for per-turn time to first output, response
+      time and token rate (see LatencyProfile).
+    - Returns the process exit code, or 124 on timeout.
     """
-    out_file = Path(output_path)
-    out_file.parent.mkdir(parents=True, exist_ok=True)
-    raw_file: Path | None = Path(raw_output_path) if raw_output_path else None
-    if raw_file is not None:
-        raw_file.parent.mkdir(parents=True, exist_ok=True)
-
-    proc = subprocess.Popen(
-        ["bash", "-lc", cmd],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        env=env,
-        bufsize=0,
+    if expect is not None and (inputs or input_file):
+        raise ValueError("expect cannot be combined with inputs or input_file")
+    argv = command_argv(cmd, shell)
+    if unbuffer:
+        env = unbuffer_env(env)
+    split = bool(stderr_output_path or stream_index_path)
+    spliced = (
+        zero_copy
+        and not split
+        and not timeline_path
+        and mirror_policy == "block"
+        and expect is None
+        and latency is None
+        and can_zero_copy(raw_output_path, mirror_to_stdout)
     )
+    if spliced:
+        # Only the cleaned log is a sink; SpliceTee fills it from the raw log
+        sinks: list[Sink] = [CleanLogSink(output_path, header=prepend_header, max_bytes=max_bytes, keep=keep)]
+    else:
+        sinks = open_sinks(
+            output_path,
+            prepend_header=prepend_header,
+            raw_output_path=raw_output_path,
+            raw_fsync_interval=raw_fsync_interval,
+            mirror_to_stdout=mirror_to_stdout,
+            mirror_policy=mirror_policy,
+            stats=stats,
+            timeline_path=timeline_path,
+            timeline_command=cmd,
+            max_bytes=max_bytes,
+            keep=keep,
+            pipeline=pipeline,
+        )
+    session: ExpectSession | None = None
+    if expect is not None:
+        session = ExpectSession(expect)
+        # Matched before the (possibly blocking) mirror sees the chunk
+        sinks.insert(0, session.sink)
+    if latency is not None:
+        # First, so chunks are timed as they are read
+        sinks.insert(0, latency.sink)
+
+    stdout_sinks: list[Sink] = [] if spliced else list(sinks)
+    # The cleaned log decodes each stream on its own before merging them
+    stderr_sinks: list[Sink] = [channel_of(s, STDERR) for s in sinks]
+    own_sinks: list[Sink] = []
+    if stream_index_path:
+        index = StreamIndexWriter(stream_index_path)
+        stdout_sinks.insert(0, index.sink(STDOUT))
+        stderr_sinks.insert(0, index.sink(STDERR))
+        own_sinks.append(stdout_sinks[0])  # closing it closes the index
+    if stderr_output_path:
+        stderr_log = CleanLogSink(stderr_output_path)
+        own_sinks.append(stderr_log)
+        stderr_sinks.append(stderr_log)
 
-    # Preload inputs, if any, and close stdin to signal EOF when done.
+    if stats is not None:
+        stats.spawning(shell)
+    if usage is not None:
+        usage.begin()
+    if latency is not None:
+        latency.begin()
+    try:
+        proc = spawn(
+            argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE if split else subprocess.STDOUT,
+            env=env,
+            bufsize=0,
+            # So a failed script can stop what the command started, too
+            start_new_session=session is not None,
+        )
+    except BaseException:
+        # e.g. an unknown program with shell="exec"
+        close_sinks(sinks + own_sinks)
+        raise
+    if stats is not None:
+        stats.spawned()
+
+    # Stream inputs, if any, from the selector loop; stdin is closed to signal
+    # EOF once they are exhausted.
+    feeder: InputFeeder | ExpectSession | InputTap | None = None
     if proc.stdin is not None:
-        if inputs:
-            proc.stdin.write(b"".join(_to_bytes(inputs)))
-            proc.stdin.flush()
-        proc.stdin.close()
+        if session is not None:
+            os.set_blocking(proc.stdin.fileno(), False)
+            session.start(proc.stdin.fileno(), on_done=proc.stdin.close, on_fail=lambda: terminate_group(proc))
+            feeder = session
+        elif inputs or input_file:
+            os.set_blocking(proc.stdin.fileno(), False)
+            feeder = InputFeeder(
+                proc.stdin.fileno(),
+                iter_input_items(inputs, input_file, by_line=bool(input_delay)),
+                delay=input_delay,
+                on_done=proc.stdin.close,
+            )
+        else:
+            proc.stdin.close()
+    if latency is not None and feeder is not None:
+        feeder = latency.watch(feeder)
 
-    start = time.monotonic()
-    raw = bytearray()
     exit_code: int | None = None
-    timed_out = False
+    tee: SpliceTee | None = None
 
     try:
         assert proc.stdout is not None
-        sel = selectors.DefaultSelector()
-        sel.register(proc.stdout, selectors.EVENT_READ)
-        fd = proc.stdout.fileno()
-        while True:
-            # Check timeout first
-            if timeout is not None and (time.monotonic() - start) > timeout:
-                timed_out = True
-                exit_code = 124
-                try:
-                    proc.terminate()
-                except Exception:
-                    pass
-                break
-
-            events = sel.select(timeout=0.1)
-            if not events:
-                # Poll process state to see if it exited
-                if proc.poll() is not None:
-                    break
-                continue
-            saw_eof = False
-            for key, _ in events:
-                try:
-                    chunk = os.read(fd, 4096)
-                except BlockingIOError:
-                    chunk = b""
-                if not chunk:
-                    # EOF on pipe: unregister and break outer loop after this batch
-                    try:
-                        sel.unregister(proc.stdout)
-                    except Exception:
-                        pass
-                    saw_eof = True
-                    break
-                raw.extend(chunk)
-                if mirror_to_stdout:
-                    buf = getattr(sys.stdout, "buffer", None)
-                    if buf is not None:
-                        buf.write(chunk)
-                        buf.flush()
-                    else:
-                        enc = getattr(sys.stdout, "encoding", None) or locale.getpreferredencoding(False) or "utf-8"
-                        sys.stdout.write(chunk.decode(enc, errors="replace"))
-                        sys.stdout.flush()
-            if saw_eof:
-                break
+        if spliced:
+            assert raw_output_path is not None
+            tee = SpliceTee(
+                proc.stdout.fileno(),
+                raw_output_path,
+                mirror_fd=stdout_fd() if mirror_to_stdout else None,
+                fsync_interval=raw_fsync_interval,
+                stats=stats,
+                clean=sinks[0],
+            )
+        streams = {proc.stderr.fileno(): stderr_sinks} if proc.stderr is not None else None
+        if pump(
+            proc,
+            proc.stdout.fileno(),
+            stdout_sinks,
+            timeout=timeout,
+            stats=stats,
+            feeder=feeder,
+            streams=streams,
+            usage=usage,
+            reader=tee,
+            terminate=terminate_group,
+        ):
+            exit_code = 124
     finally:
-        # Always write whatever we captured so far
-        decoded = raw.decode("utf-8", errors="replace")
-        if raw_file is not None:
-            try:
-                raw_file.write_text(decoded, encoding="utf-8")
-            except Exception:
-                # Raw writing is best-effort; continue to write cleaned
-                pass
-        cleaned = sanitize_ansi(decoded)
-        if prepend_header:
-            header = prepend_header
-            if not header.endswith("\n"):
-                header += "\n"
-            cleaned = header + cleaned
-        out_file.write_text(cleaned, encoding="utf-8")
-        # Try to reap the child; ignore errors
+        # Flush whatever we captured so far, then reap the child
+        if feeder is not None:
+            feeder.finish()
+        if latency is not None:
+            latency.end()
+        if usage is not None:
+            # Usually exited by now; reaping here keeps log flushing out of its wall time
+            poll_child(proc, usage)
         try:
-            proc.wait(timeout=1)
-        except Exception:
-            try:
-                proc.kill()
-            except Exception:
-                pass
-            try:
-                proc.wait(timeout=1)
-            except Exception:
-                pass
+            if tee is not None:
+                tee.close()
+            close_sinks(sinks + own_sinks)
+        finally:
+            reap(proc, usage)
+            if proc.stderr is not None:
+                proc.stderr.close()
+            if usage is not None:
+                usage.end()
 
     if exit_code is not None:
         return exit_code
+    if session is not None and session.error is not None:
+        raise session.error
     return proc.returncode
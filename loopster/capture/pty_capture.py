@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import fcntl
+import os
+import struct
+import sys
+import termios
+import tty
+from typing import Iterable, Sequence
+
+from .expect import ExpectScript, ExpectSession
+from .inputs import InputFeeder, iter_input_items
+from .latency import InputTap, LatencyProfile
+from .loop import poll_child, pump, reap, terminate_group
+from .sinks import KEEP_CHOICES, close_sinks, open_sinks
+from .shell import command_argv, spawn
+from .stats import CaptureStats, ResourceUsage
+
+
+DEFAULT_SIZE = (24, 80)
+
+
+def _terminal_size() -> tuple[int, int]:
+    """(rows, cols) of our own terminal, or DEFAULT_SIZE when not attached to one."""
+    try:
+        size = os.get_terminal_size(sys.stdout.fileno())
+    except (AttributeError, OSError, ValueError):
+        return DEFAULT_SIZE
+    return size.lines, size.columns
+
+
+def _set_winsize(fd: int, rows: int, cols: int) -> None:
+    fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+
+
+def _stdin_tty_fd() -> int | None:
+    try:
+        fd = sys.stdin.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+    return fd if os.isatty(fd) else None
+
+
+def _make_controlling_tty() -> None:  # pragma: no cover - runs in the child
+    fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+
+
+def capture_command(
+    cmd: str,
+    output_path: str,
+    inputs: Iterable[str | bytes] | None = None,
+    timeout: float | None = None,
+    env: dict[str, str] | None = None,
+    mirror_to_stdout: bool = True,
+    raw_output_path: str | None = None,
+    prepend_header: str | None = None,
+    raw_fsync_interval: float | None = None,
+    stats: CaptureStats | None = None,
+    mirror_policy: str = "block",
+    input_file: str | None = None,
+    input_delay: float | None = None,
+    timeline_path: str | None = None,
+    max_bytes: int | None = None,
+    keep: Sequence[str] = KEEP_CHOICES,
+    size: tuple[int, int] | None = None,
+    forward_stdin: bool = True,
+    usage: ResourceUsage | None = None,
+    shell: str = "login",
+    pipeline: bool = False,
+    expect: ExpectScript | None = None,
+    latency: LatencyProfile | None = None,
+) -> int:
+    """
+    Capture a command's terminal output to a file through a pseudo-terminal.
+
+    - `cmd` runs through ``bash -lc`` unless `shell` says otherwise (see
+      pipe_capture.capture_command).
+    - The child gets a PTY of `size` (rows, cols) as its controlling terminal,
+      defaulting to this terminal's size (or 24x80), so interactive programs keep
+      line buffering and full TUI output.
+    - Writes the terminal output to `output_path`, sanitized as it streams, and
+      the exact raw bytes to `raw_output_path` if given.
+    - Streams scripted `inputs`, then the lines of `input_file`, to the terminal
+      (waiting `input_delay` seconds before each item); if `forward_stdin` and our
+      stdin is a terminal, also forwards keystrokes in raw mode as they are typed.
+    - Mirroring runs on a writer thread; `mirror_policy` ("block", "drop" or
+      "summarize") applies when the terminal falls behind (see StdoutMirror).
+    - If `stats` is given, read counters are recorded into it.
+    - Optionally records every chunk with its timestamp to `timeline_path`,
+      with the PTY size in the header (see TimelineSink).
+    - With `max_bytes`, the cleaned log keeps only the first and/or last
+      `max_bytes` of output (`keep`; see CleanLogSink).
+    - If `usage` is given, the child's and loopster's resource usage is
+      recorded into it (see ResourceUsage).
+    - `pipeline` moves the raw and cleaned logs onto their own threads (see
+      open_sinks).
+    - With `expect`, the terminal's input is driven by that script instead of
+      `inputs` (see pipe_capture.capture_command and ExpectSession); on
+      failure the child's process group is terminated and ExpectError raised.
+    - If `latency` is given, output chunk times, forwarded keystrokes and
+      scripted input are recorded into it (see LatencyProfile).
+    - Returns the process exit code, or 124 on timeout.
+    """
+    if expect is not None and (inputs or input_file):
+        raise ValueError("expect cannot be combined with inputs or input_file")
+    rows, cols = size or _terminal_size()
+    argv = command_argv(cmd, shell)
+    sinks = open_sinks(
+        output_path,
+        prepend_header=prepend_header,
+        raw_output_path=raw_output_path,
+        raw_fsync_interval=raw_fsync_interval,
+        mirror_to_stdout=mirror_to_stdout,
+        mirror_policy=mirror_policy,
+        stats=stats,
+        timeline_path=timeline_path,
+        timeline_command=cmd,
+        max_bytes=max_bytes,
+        keep=keep,
+        timeline_size=(rows, cols),
+        pipeline=pipeline,
+    )
+    session: ExpectSession | None = None
+    if expect is not None:
+        session = ExpectSession(expect)
+        sinks.insert(0, session.sink)
+    if latency is not None:
+        sinks.insert(0, latency.sink)
+
+    master, slave = os.openpty()
+    try:
+        _set_winsize(slave, rows, cols)
+        if stats is not None:
+            stats.spawning(shell)
+        if usage is not None:
+            usage.begin()
+        if latency is not None:
+            latency.begin()
+        proc = spawn(
+            argv,
+            stdin=slave,
+            stdout=slave,
+            stderr=slave,
+            env=env,
+            start_new_session=True,
+            preexec_fn=_make_controlling_tty,
+        )
+        if stats is not None:
+            stats.spawned()
+    except BaseException:
+        os.close(master)
+        close_sinks(sinks)
+        raise
+    finally:
+        os.close(slave)
+
+    stdin_fd = _stdin_tty_fd() if forward_stdin else None
+    saved_tty = None
+    readers = {}
+    if stdin_fd is not None:
+
+        def _forward(fd: int) -> bool:
+            data = os.read(fd, 1024)
+            if not data:
+                return False
+            os.write(master, data)
+            if latency is not None:
+                latency.input(data)
+            return True
+
+        saved_tty = termios.tcgetattr(stdin_fd)
+        tty.setraw(stdin_fd)
+        readers[stdin_fd] = _forward
+
+    feeder: InputFeeder | ExpectSession | InputTap | None = None
+    if session is not None:
+        os.set_blocking(master, False)
+        session.start(master, on_fail=lambda: terminate_group(proc))
+        feeder = session
+    elif inputs or input_file:
+        os.set_blocking(master, False)
+        items = iter_input_items(inputs, input_file, by_line=bool(input_delay))
+        feeder = InputFeeder(master, items, delay=input_delay)
+    if latency is not None and feeder is not None:
+        feeder = latency.watch(feeder)
+
+    exit_code: int | None = None
+    try:
+        if pump(
+            proc,
+            master,
+            sinks,
+            timeout=timeout,
+            readers=readers,
+            terminate=terminate_group,
+            stats=stats,
+            feeder=feeder,
+            usage=usage,
+        ):
+            exit_code = 124
+    finally:
+        if feeder is not None:
+            feeder.finish()
+        if latency is not None:
+            latency.end()
+        if saved_tty is not None:
+            termios.tcsetattr(stdin_fd, termios.TCSADRAIN, saved_tty)
+        if usage is not None:
+            poll_child(proc, usage)
+        try:
+            close_sinks(sinks)
+        finally:
+            reap(proc, usage)
+            os.close(master)
+            if usage is not None:
+                usage.end()
+
+    if exit_code is not None:
+        return exit_code
+    if session is not None and session.error is not None:
+        raise session.error
+    return proc.returncode
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+
+class RingBuffer:
+    """
+    Fixed-size byte ring that keeps the most recent `capacity` bytes written.
+
+    Memory is allocated once; writes copy into it with at most two slice
+    assignments, so keeping the tail of an endless stream costs O(chunk).
+    """
+
+    def __init__(self, capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._pos = 0  # next write position
+        self._size = 0
+        self.total = 0  # bytes ever written
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dropped(self) -> int:
+        """Bytes written but no longer held."""
+        return self.total - self._size
+
+    def write(self, chunk: bytes | memoryview) -> None:
+        data = memoryview(chunk)
+        n = len(data)
+        self.total += n
+        cap = self.capacity
+        if n >= cap:
+            self._buf[:] = data[n - cap:]
+            self._pos = 0
+            self._size = cap
+            return
+        first = min(n, cap - self._pos)
+        self._buf[self._pos:self._pos + first] = data[:first]
+        if first < n:
+            self._buf[:n - first] = data[first:]
+        self._pos = (self._pos + n) % cap
+        self._size = min(cap, self._size + n)
+
+    def getvalue(self) -> bytes:
+        """The held bytes, oldest first."""
+        if self._size < self.capacity:
+            return bytes(self._buf[:self._size])
+        return bytes(self._buf[self._pos:] + self._buf[:self._pos])
+
+
+__all__ = ["RingBuffer"]
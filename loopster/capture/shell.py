@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import shlex
+import subprocess
+from typing import Any, Sequence
+
+
+# How the command string is started:
+# - login:     bash -lc CMD (sources the login profile; the historical default)
+# - non-login: bash -c CMD  (no profile, still shell syntax)
+# - exec:      CMD split like a shell would and executed directly, no shell at all
+SHELL_MODES = ("login", "non-login", "exec")
+
+
+class SpawnError(OSError):
+    """The command could not be started (e.g. an unknown program with shell="exec"); the exec error is its cause."""
+
+
+def command_argv(cmd: str, shell: str = "login") -> list[str]:
+    """argv that runs `cmd` in the given shell mode."""
+    if shell == "login":
+        return ["bash", "-lc", cmd]
+    if shell == "non-login":
+        return ["bash", "-c", cmd]
+    if shell == "exec":
+        argv = shlex.split(cmd)
+        if not argv:
+            raise ValueError("empty command")
+        return argv
+    raise ValueError(f"shell must be one of {', '.join(SHELL_MODES)}, got {shell!r}")
+
+
+def spawn(argv: Sequence[str], **kwargs: Any) -> subprocess.Popen:
+    """``subprocess.Popen(argv, **kwargs)``, raising :class:`SpawnError` if the program cannot be executed."""
+    try:
+        return subprocess.Popen(argv, **kwargs)
+    except OSError as e:
+        raise spawn_error(argv, e) from e
+
+
+def spawn_error(argv: Sequence[str], error: OSError) -> SpawnError:
+    return SpawnError(error.errno, f"cannot execute {argv[0]!r}: {error.strerror or error}")
+
+
+__all__ = ["SHELL_MODES", "SpawnError", "command_argv", "spawn"]
@@ -0,0 +1,557 @@
+from __future__ import annotations
+
+import codecs
+import io
+import locale
+import os
+import sys
+import threading
+import time
+from collections import deque
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from typing import Protocol, Sequence
+
+from ..compression import codec_for, compress_writer, open_output
+from .ansi_clean import AnsiSanitizer
+from .ring import RingBuffer
+from .stats import CaptureStats, StageStats
+from .timeline import TimelineSink
+
+
+class Sink(Protocol):
+    """
+    Consumer of captured output chunks.
+
+    Chunks may be memoryviews into a buffer the engine reuses: a sink must copy
+    anything it keeps beyond the ``write`` call.
+    """
+
+    def write(self, chunk: bytes | memoryview) -> None: ...
+
+    def close(self) -> None: ...
+
+
+KEEP_CHOICES = ("head", "tail")
+
+
+class CleanLogSink:
+    """
+    Sanitize captured bytes as they arrive and append the cleaned text to a file.
+
+    - Decodes UTF-8 incrementally (multibyte sequences may span chunks).
+    - Feeds an :class:`AnsiSanitizer` and writes each finalized line right away,
+      so the log is readable while the session is still running.
+    - An optional header is written before any captured output.
+    - A ``.gz``/``.xz``/``.bz2``/``.zst`` path is compressed as it is written;
+      such logs are not flushed per line (that would defeat the compression).
+    - With `max_bytes`, only the first and/or last `max_bytes` of output (per
+      `keep`) are cleaned into the log, with a marker for what was elided.
+      The head streams as usual; the tail is held in a fixed-size ring buffer
+      and written on close.
+    - Output merged from several streams (stdout and stderr) should come in
+      through :meth:`channel`: each channel decodes and sanitizes on its own,
+      so a character or escape sequence cut by a switch to another stream is
+      not garbled, and only finished lines are interleaved. The bounded tail
+      is kept as raw bytes, so it is cleaned as one stream.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        header: str | None = None,
+        max_bytes: int | None = None,
+        keep: Sequence[str] = KEEP_CHOICES,
+    ) -> None:
+        if max_bytes is not None:
+            if max_bytes <= 0:
+                raise ValueError("max_bytes must be positive")
+            if not keep or any(k not in KEEP_CHOICES for k in keep):
+                raise ValueError(f"keep must name one or both of {', '.join(KEEP_CHOICES)}")
+        self.path = Path(path)
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._sanitizer = AnsiSanitizer()
+        self._compressed = codec_for(self.path) is not None
+        self._head_left = max_bytes if max_bytes is not None and "head" in keep else None
+        self._tail = RingBuffer(max_bytes) if max_bytes is not None and "tail" in keep else None
+        self._bounded = max_bytes is not None
+        self._elided = 0
+        self._channels: dict[object, tuple[codecs.IncrementalDecoder, AnsiSanitizer]] = {}
+        self._fh = io.TextIOWrapper(open_output(self.path), encoding="utf-8", newline="")
+        if header:
+            if not header.endswith("\n"):
+                header += "\n"
+            self._write(header)
+
+    def _write(self, text: str) -> None:
+        if text:
+            self._fh.write(text)
+            if not self._compressed:
+                self._fh.flush()
+
+    def channel(self, key: object) -> Sink:
+        """A sink writing into this log with its own decoder and sanitizer (one per `key`)."""
+        if key not in self._channels:
+            self._channels[key] = (codecs.getincrementaldecoder("utf-8")(errors="replace"), AnsiSanitizer())
+        return _Channel(self, key)
+
+    def _clean(self, chunk: bytes | memoryview, channel: object = None) -> None:
+        if channel is None:
+            decoder, sanitizer = self._decoder, self._sanitizer
+        else:
+            decoder, sanitizer = self._channels[channel]
+        text = decoder.decode(chunk)
+        if text:
+            self._write(sanitizer.feed(text))
+
+    def _finish(self) -> str:
+        text = ""
+        for decoder, sanitizer in [(self._decoder, self._sanitizer), *self._channels.values()]:
+            part = sanitizer.feed(decoder.decode(b"", final=True)) + sanitizer.close()
+            if part:
+                # Each channel's unfinished line ends up on a line of its own
+                if text and not text.endswith("\n"):
+                    text += "\n"
+                text += part
+        return text
+
+    def write(self, chunk: bytes | memoryview, channel: object = None) -> None:
+        if not self._bounded:
+            self._clean(chunk, channel)
+            return
+        if self._head_left:
+            head = chunk[: self._head_left]
+            self._head_left -= len(head)
+            self._clean(head, channel)
+            chunk = chunk[len(head):]
+            if not chunk:
+                return
+        if self._tail is not None:
+            self._tail.write(chunk)
+        else:
+            self._elided += len(chunk)
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        try:
+            tail = b""
+            if self._tail is not None:
+                self._elided += self._tail.dropped
+                tail = self._tail.getvalue()
+            if not self._elided:
+                self._clean(tail)
+                self._write(self._finish())
+                return
+            text = self._finish()
+            if text and not text.endswith("\n"):
+                text += "\n"
+            self._write(text + f"[loopster] elided {self._elided} bytes of output\n")
+            if tail:
+                # Start the tail from a clean slate: the head may end mid-line
+                # or mid-escape-sequence.
+                sanitizer = AnsiSanitizer()
+                text = sanitizer.feed(tail.decode("utf-8", errors="replace")) + sanitizer.close()
+                # The tail starts mid-line; an empty fragment of that line is
+                # not a line of its own, and a blank tail is left out
+                text = text.removeprefix("\n")
+                if text.strip():
+                    self._write(text)
+        finally:
+            self._fh.close()
+
+
+class _Channel:
+    """One input stream of a sink that takes several (see CleanLogSink.channel); closing it is a no-op."""
+
+    def __init__(self, sink: CleanLogSink | ThreadedSink, key: object) -> None:
+        self._sink = sink
+        self._key = key
+
+    def write(self, chunk: bytes | memoryview) -> None:
+        self._sink.write(chunk, self._key)
+
+    def close(self) -> None:
+        pass
+
+
+def channel_of(sink: Sink, key: object) -> Sink:
+    """`sink`'s channel for stream `key` if it decodes per stream (see CleanLogSink.channel), else `sink`."""
+    channel = getattr(sink, "channel", None)
+    return channel(key) if channel is not None else sink
+
+
+class RawLogSink:
+    """
+    Append the exact captured bytes to a file as they arrive.
+
+    - The file is unbuffered: every chunk is handed to the OS immediately, so a
+      crashed or killed capture still leaves a usable raw log.
+    - With `fsync_interval` (seconds), data is also forced to disk at most that
+      often (``0`` syncs after every chunk). The file is always synced on close.
+    - Raw writing is best-effort: after an I/O error the sink stops writing so
+      the cleaned log keeps being captured.
+    - A ``.gz``/``.xz``/``.bz2``/``.zst`` path is compressed as it is written.
+      The codec buffers, so each fsync first flushes what it can.
+    """
+
+    def __init__(self, path: str | Path, fsync_interval: float | None = None) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("wb", buffering=0)
+        codec = codec_for(self.path)
+        self._fh = compress_writer(self._file, codec) if codec else self._file
+        self._fsync_interval = fsync_interval
+        self._last_sync = time.monotonic()
+
+    def write(self, chunk: bytes | memoryview) -> None:
+        if self._file.closed:
+            return
+        try:
+            self._fh.write(chunk)
+            if self._fsync_interval is not None:
+                now = time.monotonic()
+                if now - self._last_sync >= self._fsync_interval:
+                    self._fh.flush()
+                    os.fsync(self._file.fileno())
+                    self._last_sync = now
+        except OSError:
+            self.close()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        try:
+            if self._fh is not self._file:
+                self._fh.close()  # writes the codec trailer
+            os.fsync(self._file.fileno())
+        except OSError:
+            pass
+        finally:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+
+
+MIRROR_POLICIES = ("block", "drop", "summarize")
+
+
+class StdoutMirror:
+    """
+    Echo captured bytes to this process's stdout from a dedicated writer thread.
+
+    The capture loop only enqueues; the writer coalesces everything queued into
+    one write + flush, so a slow terminal never stalls reading from the child
+    unless asked to. When more than `max_backlog` bytes are waiting, `policy`
+    decides what happens:
+
+    - ``block``: wait for the terminal (nothing is lost; the old behavior).
+    - ``drop``: discard new output until the terminal catches up, then print a
+      marker with the number of bytes skipped.
+    - ``summarize``: discard the stale backlog instead, print a marker with the
+      lines and bytes skipped, and continue with the newest output.
+
+    Only the mirror is affected; the raw and cleaned logs always get everything.
+    """
+
+    def __init__(
+        self,
+        policy: str = "block",
+        max_backlog: int = 1 << 20,
+        stats: CaptureStats | None = None,
+    ) -> None:
+        if policy not in MIRROR_POLICIES:
+            raise ValueError(f"unknown mirror policy: {policy}")
+        self.policy = policy
+        self._max_backlog = max_backlog
+        self._stats = stats
+        self._queue: deque[bytes] = deque()
+        self._backlog = 0
+        self._skipped_bytes = 0
+        self._skipped_lines = 0
+        self._closed = False
+        self._failed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="loopster-mirror", daemon=True)
+        self._thread.start()
+
+    def write(self, chunk: bytes | memoryview) -> None:
+        data = bytes(chunk)
+        with self._cond:
+            if self._failed:
+                return
+            if self._backlog and self._backlog + len(data) > self._max_backlog:
+                if self.policy == "block":
+                    while self._backlog and self._backlog + len(data) > self._max_backlog and not self._failed:
+                        self._cond.wait()
+                elif self.policy == "drop":
+                    self._skip(data)
+                    return
+                else:
+                    for old in self._queue:
+                        self._skip(old)
+                    self._queue.clear()
+                    self._backlog = 0
+            self._enqueue_marker()
+            self._queue.append(data)
+            self._backlog += len(data)
+            if self._stats is not None and self._backlog > self._stats.mirror_max_backlog:
+                self._stats.mirror_max_backlog = self._backlog
+            self._cond.notify_all()
+
+    def has_room(self, n: int) -> bool:
+        """False if writing `n` bytes now would wait for the terminal (``block`` policy only)."""
+        if self.policy != "block":
+            return True
+        with self._cond:
+            return self._failed or not self._backlog or self._backlog + n <= self._max_backlog
+
+    def wait_for_room(self, n: int) -> None:
+        """Wait until `n` bytes can be written without blocking (see :meth:`has_room`)."""
+        with self._cond:
+            while self._backlog and self._backlog + n > self._max_backlog and not self._failed and not self._closed:
+                self._cond.wait()
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._enqueue_marker()
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _skip(self, data: bytes) -> None:
+        self._skipped_bytes += len(data)
+        self._skipped_lines += data.count(b"\n")
+        if self._stats is not None:
+            self._stats.mirror_dropped_bytes += len(data)
+
+    def _enqueue_marker(self) -> None:
+        if not self._skipped_bytes:
+            return
+        if self.policy == "summarize":
+            note = f"{self._skipped_lines} lines ({self._skipped_bytes} bytes)"
+        else:
+            note = f"{self._skipped_bytes} bytes"
+        marker = f"\n[loopster] mirror fell behind; skipped {note}\n".encode()
+        self._queue.append(marker)
+        self._backlog += len(marker)
+        self._skipped_bytes = self._skipped_lines = 0
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                data = b"".join(self._queue)
+                self._queue.clear()
+                self._backlog = 0
+                self._cond.notify_all()
+            try:
+                _write_stdout(data)
+            except Exception:
+                # The terminal went away (e.g. a closed pipe); stop mirroring.
+                with self._cond:
+                    self._failed = True
+                    self._queue.clear()
+                    self._backlog = 0
+                    self._cond.notify_all()
+                return
+            if self._stats is not None:
+                self._stats.mirror_bytes += len(data)
+                self._stats.mirror_writes += 1
+
+
+class ThreadedSink:
+    """
+    Run another sink on its own thread, behind a bounded queue.
+
+    The capture loop only copies each chunk into the queue, so CPU-heavy work
+    (sanitizing large TUI repaints, compression, disk writes) overlaps reading
+    instead of stalling it. The thread coalesces everything queued into one
+    ``write`` of the wrapped sink.
+
+    - At most `max_backlog` bytes wait in the queue; beyond that the capture
+      loop blocks until the stage catches up (nothing is dropped).
+    - Counters go to `stage`: chunks and bytes queued, batches written, peak
+      backlog, time spent in the wrapped sink and time the loop was blocked.
+    - An error from the wrapped sink stops the stage; it is raised from
+      :meth:`close`, after the wrapped sink has been closed.
+    - :meth:`channel` passes through to the wrapped sink's channels; chunks
+      keep their order and only consecutive ones of a channel are coalesced.
+    """
+
+    def __init__(
+        self,
+        sink: Sink,
+        name: str = "sink",
+        max_backlog: int = 64 << 20,
+        stage: StageStats | None = None,
+    ) -> None:
+        self.sink = sink
+        self._max_backlog = max_backlog
+        self._stage = stage if stage is not None else StageStats()
+        self._queue: deque[tuple[object, bytes]] = deque()
+        self._backlog = 0
+        self._closed = False
+        self._error: BaseException | None = None
+        self._targets: dict[object, Sink] = {None: sink}
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"loopster-{name}", daemon=True)
+        self._thread.start()
+
+    def channel(self, key: object) -> Sink:
+        """The wrapped sink's channel for `key`, fed through this stage; this sink if it has none."""
+        channel = getattr(self.sink, "channel", None)
+        if channel is None:
+            return self
+        if key not in self._targets:
+            self._targets[key] = channel(key)
+        return _Channel(self, key)
+
+    def write(self, chunk: bytes | memoryview, channel: object = None) -> None:
+        data = bytes(chunk)
+        stage = self._stage
+        with self._cond:
+            if self._error is not None:
+                return
+            if self._backlog and self._backlog + len(data) > self._max_backlog:
+                start = time.monotonic()
+                while self._backlog and self._backlog + len(data) > self._max_backlog and self._error is None:
+                    self._cond.wait()
+                stage.blocked_seconds += time.monotonic() - start
+            self._queue.append((channel, data))
+            self._backlog += len(data)
+            stage.chunks += 1
+            stage.bytes += len(data)
+            if self._backlog > stage.max_backlog:
+                stage.max_backlog = self._backlog
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.sink.close()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        stage = self._stage
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                batch = list(self._queue)
+                self._queue.clear()
+                self._backlog = 0
+                self._cond.notify_all()
+            start = time.monotonic()
+            try:
+                for channel, run in groupby(batch, key=itemgetter(0)):
+                    self._targets[channel].write(b"".join(data for _, data in run))
+            except BaseException as e:
+                with self._cond:
+                    self._error = e
+                    self._queue.clear()
+                    self._backlog = 0
+                    self._cond.notify_all()
+                return
+            stage.busy_seconds += time.monotonic() - start
+            stage.batches += 1
+
+
+def _write_stdout(data: bytes) -> None:
+    buf = getattr(sys.stdout, "buffer", None)
+    if buf is not None:
+        buf.write(data)
+        buf.flush()
+    else:
+        enc = getattr(sys.stdout, "encoding", None) or locale.getpreferredencoding(False) or "utf-8"
+        sys.stdout.write(data.decode(enc, errors="replace"))
+        sys.stdout.flush()
+
+
+def open_sinks(
+    output_path: str,
+    prepend_header: str | None = None,
+    raw_output_path: str | None = None,
+    raw_fsync_interval: float | None = None,
+    mirror_to_stdout: bool = True,
+    mirror_policy: str = "block",
+    stats: CaptureStats | None = None,
+    timeline_path: str | None = None,
+    timeline_command: str | None = None,
+    timeline_size: tuple[int, int] | None = None,
+    max_bytes: int | None = None,
+    keep: Sequence[str] = KEEP_CHOICES,
+    pipeline: bool = False,
+) -> list[Sink]:
+    """
+    Build the standard sink chain: raw log and timeline (optional), cleaned log, mirror.
+
+    With `pipeline`, the raw log and the cleaned log (sanitizer and compressor)
+    each run on their own thread (see ThreadedSink; the mirror always does),
+    with per-stage counters in ``stats.stages``. The timeline stays on the
+    capture loop so its timestamps remain exact.
+    """
+
+    def stage(name: str, sink: Sink) -> Sink:
+        if not pipeline:
+            return sink
+        return ThreadedSink(sink, name=name, stage=stats.stage(name) if stats is not None else None)
+
+    sinks: list[Sink] = []
+    try:
+        if raw_output_path:
+            sinks.append(stage("raw", RawLogSink(raw_output_path, fsync_interval=raw_fsync_interval)))
+        if timeline_path:
+            sinks.append(TimelineSink(timeline_path, command=timeline_command, size=timeline_size))
+        sinks.append(stage("clean", CleanLogSink(output_path, header=prepend_header, max_bytes=max_bytes, keep=keep)))
+        if mirror_to_stdout:
+            sinks.append(StdoutMirror(policy=mirror_policy, stats=stats))
+    except BaseException:
+        # e.g. a .zst log without zstd support: do not leak the sinks already open
+        try:
+            close_sinks(sinks)
+        except BaseException:
+            pass
+        raise
+    return sinks
+
+
+def close_sinks(sinks: list[Sink]) -> None:
+    """Close every sink, even if an earlier one fails; re-raise the first error."""
+    error: BaseException | None = None
+    for sink in sinks:
+        try:
+            sink.close()
+        except BaseException as e:
+            if error is None:
+                error = e
+    if error is not None:
+        raise error
+
+
+__all__ = [
+    "KEEP_CHOICES",
+    "MIRROR_POLICIES",
+    "CleanLogSink",
+    "RawLogSink",
+    "Sink",
+    "StdoutMirror",
+    "ThreadedSink",
+    "channel_of",
+    "close_sinks",
+    "open_sinks",
+]
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import json
+import resource
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+
+@dataclass
+class StageStats:
+    """Counters for one consumer stage of a threaded capture pipeline (see ThreadedSink)."""
+
+    chunks: int = 0
+    bytes: int = 0
+    # Coalesced writes the stage's thread handed to its sink
+    batches: int = 0
+    max_backlog: int = 0
+    # Time the stage spent processing, and time the reader waited on its full queue
+    busy_seconds: float = 0.0
+    blocked_seconds: float = 0.0
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes / self.busy_seconds / (1 << 20) if self.busy_seconds else 0.0
+
+
+@dataclass
+class CaptureStats:
+    """Per-session counters filled in by the capture engines."""
+
+    bytes_read: int = 0
+    read_calls: int = 0
+    max_read_size: int = 0
+    mirror_bytes: int = 0
+    mirror_writes: int = 0
+    mirror_dropped_bytes: int = 0
+    mirror_max_backlog: int = 0
+    # How the child was started, how long spawning took, and how long until its
+    # first output byte (shell startup included); see loopster.capture.shell.
+    shell: str = ""
+    spawn_seconds: float = 0.0
+    first_output_seconds: float | None = None
+    # Consumer stages by name when the sinks run on their own threads
+    stages: dict[str, StageStats] = field(default_factory=dict)
+
+    @property
+    def bytes_per_read(self) -> float:
+        return self.bytes_read / self.read_calls if self.read_calls else 0.0
+
+    def spawning(self, shell: str) -> None:
+        """Call right before starting the child."""
+        self.shell = shell
+        self._spawned = time.monotonic()
+
+    def spawned(self) -> None:
+        """Call once the child has been started."""
+        self.spawn_seconds = time.monotonic() - self._spawned
+
+    def output_seen(self) -> None:
+        """Note the first output byte (later calls are ignored)."""
+        if self.first_output_seconds is None and hasattr(self, "_spawned"):
+            self.first_output_seconds = time.monotonic() - self._spawned
+
+    def stage(self, name: str) -> StageStats:
+        """Counters for the named pipeline stage, created on first use."""
+        return self.stages.setdefault(name, StageStats())
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        for name, stage in self.stages.items():
+            entry = data["stages"][name]
+            entry["busy_seconds"] = round(stage.busy_seconds, 4)
+            entry["blocked_seconds"] = round(stage.blocked_seconds, 4)
+            entry["mb_per_s"] = round(stage.mb_per_s, 2)
+        data["bytes_per_read"] = round(self.bytes_per_read, 1)
+        data["spawn_seconds"] = round(self.spawn_seconds, 4)
+        if self.first_output_seconds is not None:
+            data["first_output_seconds"] = round(self.first_output_seconds, 4)
+        return data
+
+    def write_json(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2) + "\n", encoding="utf-8")
+
+
+@dataclass
+class ResourceUsage:
+    """
+    What a capture cost: the child's resource usage and loopster's own.
+
+    - Child figures come from ``os.wait4`` on the shell the engine started
+      (which includes every descendant it waited for). Engines that cannot reap
+      the child themselves fall back to the change in ``RUSAGE_CHILDREN``,
+      which also counts any other child reaped meanwhile; `source` says which.
+    - ``loop_*`` is this process's CPU time over the capture (reading,
+      sanitizing, mirroring), i.e. loopster's overhead.
+    """
+
+    wall_seconds: float = 0.0
+    user_seconds: float = 0.0
+    sys_seconds: float = 0.0
+    max_rss_kb: int = 0
+    voluntary_switches: int = 0
+    involuntary_switches: int = 0
+    loop_user_seconds: float = 0.0
+    loop_sys_seconds: float = 0.0
+    source: str = ""
+
+    def begin(self) -> None:
+        """Mark the start of the capture (call right before starting the child)."""
+        self._started = time.monotonic()
+        self._self_before = resource.getrusage(resource.RUSAGE_SELF)
+        self._children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    def record_child(self, ru: resource.struct_rusage) -> None:
+        """Take the child's figures from the rusage returned by ``os.wait4``."""
+        self.wall_seconds = time.monotonic() - self._started
+        self.user_seconds = ru.ru_utime
+        self.sys_seconds = ru.ru_stime
+        self.max_rss_kb = ru.ru_maxrss
+        self.voluntary_switches = ru.ru_nvcsw
+        self.involuntary_switches = ru.ru_nivcsw
+        self.source = "wait4"
+
+    def end(self) -> None:
+        """Mark the end of the capture (after the child was reaped and logs closed)."""
+        now = resource.getrusage(resource.RUSAGE_SELF)
+        self.loop_user_seconds = now.ru_utime - self._self_before.ru_utime
+        self.loop_sys_seconds = now.ru_stime - self._self_before.ru_stime
+        if not self.source:
+            children = resource.getrusage(resource.RUSAGE_CHILDREN)
+            before = self._children_before
+            self.wall_seconds = time.monotonic() - self._started
+            self.user_seconds = children.ru_utime - before.ru_utime
+            self.sys_seconds = children.ru_stime - before.ru_stime
+            self.max_rss_kb = children.ru_maxrss
+            self.voluntary_switches = children.ru_nvcsw - before.ru_nvcsw
+            self.involuntary_switches = children.ru_nivcsw - before.ru_nivcsw
+            self.source = "rusage_children"
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        for key, value in data.items():
+            if isinstance(value, float):
+                data[key] = round(value, 4)
+        return data
+
+    def write_json(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2) + "\n", encoding="utf-8")
+
+    def banner(self) -> str:
+        """One-line human summary for logs."""
+        return (
+            f"[loopster] usage: wall {self.wall_seconds:.2f}s, cpu user {self.user_seconds:.2f}s"
+            f" sys {self.sys_seconds:.2f}s, max rss {self.max_rss_kb / 1024:.1f} MB,"
+            f" context switches {self.voluntary_switches} voluntary / {self.involuntary_switches} involuntary;"
+            f" loopster cpu user {self.loop_user_seconds:.2f}s sys {self.loop_sys_seconds:.2f}s"
+        )
+
+
+__all__ = ["CaptureStats", "ResourceUsage", "StageStats"]
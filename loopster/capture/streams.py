@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import struct
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Mapping
+
+
+STDOUT = 1
+STDERR = 2
+
+# Index file: magic, then one record per chunk in arrival order:
+# (f64 seconds since start, u8 stream id, u32 length, u64 offset within that stream)
+INDEX_MAGIC = b"LOOPSTER-SX1\n"
+_RECORD = struct.Struct("<dBIQ")
+
+
+@dataclass(frozen=True)
+class StreamChunk:
+    time: float
+    stream: int
+    offset: int
+    length: int
+
+
+class StreamIndexWriter:
+    """
+    Record how the child's output streams interleave.
+
+    Each stream gets a sink from :meth:`sink`; every chunk it sees appends one
+    21-byte record, so the index stays small next to the output itself.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = self.path.open("wb")
+        self._fh.write(INDEX_MAGIC)
+        self._start = time.monotonic()
+        self._offsets: dict[int, int] = {}
+
+    def record(self, stream: int, length: int) -> None:
+        if self._fh.closed or not length:
+            return
+        offset = self._offsets.get(stream, 0)
+        self._fh.write(_RECORD.pack(time.monotonic() - self._start, stream, length, offset))
+        self._offsets[stream] = offset + length
+
+    def sink(self, stream: int) -> "_StreamSink":
+        return _StreamSink(self, stream)
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self._fh.close()
+
+
+class _StreamSink:
+    def __init__(self, writer: StreamIndexWriter, stream: int) -> None:
+        self._writer = writer
+        self._stream = stream
+
+    def write(self, chunk: bytes | memoryview) -> None:
+        self._writer.record(self._stream, len(chunk))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class StreamIndex:
+    """Reader for an interleaving index written by :class:`StreamIndexWriter`."""
+
+    def __init__(self, path: str | Path) -> None:
+        data = Path(path).read_bytes()
+        if not data.startswith(INDEX_MAGIC):
+            raise ValueError(f"{path}: not a loopster stream index")
+        body = memoryview(data)[len(INDEX_MAGIC):]
+        usable = len(body) - len(body) % _RECORD.size
+        self.chunks = [
+            StreamChunk(time=t, stream=stream, offset=offset, length=length)
+            for t, stream, length, offset in _RECORD.iter_unpack(body[:usable])
+        ]
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def __iter__(self) -> Iterator[StreamChunk]:
+        return iter(self.chunks)
+
+    def totals(self) -> dict[int, int]:
+        """Bytes per stream id."""
+        out: dict[int, int] = {}
+        for c in self.chunks:
+            out[c.stream] = out.get(c.stream, 0) + c.length
+        return out
+
+    def merge(self, streams: Mapping[int, bytes]) -> bytes:
+        """Rebuild the merged output from each stream's bytes, in arrival order."""
+        return b"".join(streams[c.stream][c.offset:c.offset + c.length] for c in self.chunks)
+
+    def split(self, merged: bytes) -> dict[int, bytes]:
+        """Separate a merged output (e.g. the raw log) back into its streams."""
+        parts: dict[int, list[bytes]] = {}
+        pos = 0
+        for c in self.chunks:
+            parts.setdefault(c.stream, []).append(merged[pos:pos + c.length])
+            pos += c.length
+        return {stream: b"".join(chunks) for stream, chunks in parts.items()}
+
+    def windows(self, stream: int = STDERR, gap: float = 1.0) -> list[tuple[float, float, int]]:
+        """
+        Time windows in which `stream` produced output, as (start, end, bytes).
+
+        Chunks less than `gap` seconds apart fall into the same window, so a burst
+        of errors becomes one window that can be cut out of a timeline or log.
+        """
+        out: list[tuple[float, float, int]] = []
+        for c in self.chunks:
+            if c.stream != stream:
+                continue
+            if out and c.time - out[-1][1] < gap:
+                start, _, size = out[-1]
+                out[-1] = (start, c.time, size + c.length)
+            else:
+                out.append((c.time, c.time, c.length))
+        return out
+
+
+__all__ = ["STDERR", "STDOUT", "StreamChunk", "StreamIndex", "StreamIndexWriter"]
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import bisect
+import codecs
+import json
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+
+from .ansi_clean import AnsiSanitizer
+
+
+# Binary timeline: magic, u32 header length, JSON header, then records of
+# (f64 seconds since start, u32 length, payload bytes).
+BINARY_MAGIC = b"LOOPSTER-TL1\n"
+_BIN_RECORD = struct.Struct("<dI")
+_HEADER_LEN = struct.Struct("<I")
+
+# Index sidecar (<timeline>.idx): magic, then one (f64 seconds, u64 file offset)
+# entry per chunk. Fixed-size entries allow binary search without loading it.
+INDEX_MAGIC = b"LOOPSTER-IX1\n"
+_INDEX_ENTRY = struct.Struct("<dQ")
+
+BINARY_SUFFIXES = (".lpt",)
+
+
+def is_binary_path(path: str | Path) -> bool:
+    """Timelines ending in ``.lpt`` use the binary format; anything else is asciicast v2."""
+    return Path(path).suffix.lower() in BINARY_SUFFIXES
+
+
+def index_path(path: str | Path) -> Path:
+    return Path(str(path) + ".idx")
+
+
+class TimelineSink:
+    """
+    Record every captured chunk with its time since the capture started.
+
+    - ``.cast`` (or any other suffix): asciicast v2, one ``[t, "o", text]`` event
+      per chunk, playable by standard asciinema tools. Text is decoded
+      incrementally, so multibyte characters split across reads stay intact.
+    - ``.lpt``: compact binary records that keep the exact bytes.
+
+    Both write a ``.idx`` sidecar with the offset of every event so readers can
+    seek by time in O(log n) (see :class:`Timeline`).
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        command: str | None = None,
+        size: tuple[int, int] | None = None,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.binary = is_binary_path(self.path)
+        self._start = time.monotonic()
+        rows, cols = size or (24, 80)
+        header: dict[str, Any] = {"version": 2, "width": cols, "height": rows, "timestamp": int(time.time())}
+        if command:
+            header["command"] = command
+        self._fh = self.path.open("wb")
+        self._index = index_path(self.path).open("wb")
+        self._index.write(INDEX_MAGIC)
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        if self.binary:
+            data = json.dumps(header).encode()
+            self._fh.write(BINARY_MAGIC + _HEADER_LEN.pack(len(data)) + data)
+        else:
+            self._fh.write(json.dumps(header).encode() + b"\n")
+
+    def write(self, chunk: bytes | memoryview) -> None:
+        t = time.monotonic() - self._start
+        self._index.write(_INDEX_ENTRY.pack(t, self._fh.tell()))
+        if self.binary:
+            self._fh.write(_BIN_RECORD.pack(t, len(chunk)))
+            self._fh.write(chunk)
+        else:
+            text = self._decoder.decode(chunk)
+            self._fh.write(json.dumps([round(t, 6), "o", text], ensure_ascii=False).encode() + b"\n")
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        try:
+            if not self.binary:
+                tail = self._decoder.decode(b"", final=True)
+                if tail:
+                    t = time.monotonic() - self._start
+                    self._index.write(_INDEX_ENTRY.pack(t, self._fh.tell()))
+                    self._fh.write(json.dumps([round(t, 6), "o", tail], ensure_ascii=False).encode() + b"\n")
+        finally:
+            self._fh.close()
+            self._index.close()
+
+
+class Timeline:
+    """
+    Reader for timelines written by :class:`TimelineSink`.
+
+    Uses the ``.idx`` sidecar when present (rebuilding it in memory otherwise)
+    so that :meth:`events` can start at any time offset with a binary search.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._fh: BinaryIO = self.path.open("rb")
+        self.binary = self._fh.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+        if self.binary:
+            (n,) = _HEADER_LEN.unpack(self._fh.read(_HEADER_LEN.size))
+            self.header: dict[str, Any] = json.loads(self._fh.read(n))
+        else:
+            self._fh.seek(0)
+            self.header = json.loads(self._fh.readline())
+        self._data_start = self._fh.tell()
+        self._times, self._offsets = self._load_index()
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def __enter__(self) -> "Timeline":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    @property
+    def duration(self) -> float:
+        return self._times[-1] if self._times else 0.0
+
+    def _load_index(self) -> tuple[list[float], list[int]]:
+        idx = index_path(self.path)
+        if idx.exists():
+            raw = idx.read_bytes()
+            if raw.startswith(INDEX_MAGIC):
+                body = memoryview(raw)[len(INDEX_MAGIC):]
+                usable = len(body) - len(body) % _INDEX_ENTRY.size
+                entries = list(_INDEX_ENTRY.iter_unpack(body[:usable]))
+                # A crashed capture may index a record it never finished writing
+                size = self.path.stat().st_size
+                entries = [e for e in entries if e[1] < size]
+                return [t for t, _ in entries], [o for _, o in entries]
+        times: list[float] = []
+        offsets: list[int] = []
+        self._fh.seek(self._data_start)
+        while True:
+            offset = self._fh.tell()
+            event = self._read_event()
+            if event is None:
+                break
+            times.append(event[0])
+            offsets.append(offset)
+        return times, offsets
+
+    def _read_event(self) -> tuple[float, bytes] | None:
+        if self.binary:
+            head = self._fh.read(_BIN_RECORD.size)
+            if len(head) < _BIN_RECORD.size:
+                return None
+            t, n = _BIN_RECORD.unpack(head)
+            data = self._fh.read(n)
+            if len(data) < n:
+                return None
+            return t, data
+        while True:
+            line = self._fh.readline()
+            if not line:
+                return None
+            try:
+                t, kind, text = json.loads(line)
+            except ValueError:
+                # Truncated last line of an interrupted capture
+                return None
+            if kind == "o":
+                return float(t), text.encode("utf-8")
+
+    def events(self, start: float | None = None, end: float | None = None) -> Iterator[tuple[float, bytes]]:
+        """Yield (seconds, chunk) for events with start <= t < end."""
+        i = bisect.bisect_left(self._times, start) if start is not None else 0
+        if i >= len(self._offsets):
+            return
+        self._fh.seek(self._offsets[i])
+        while True:
+            event = self._read_event()
+            if event is None or (end is not None and event[0] >= end):
+                return
+            yield event
+
+    def sanitize(self, start: float | None = None, end: float | None = None) -> str:
+        """Cleaned text of the events in [start, end)."""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        sanitizer = AnsiSanitizer()
+        out = [sanitizer.feed(decoder.decode(chunk)) for _, chunk in self.events(start, end)]
+        out.append(sanitizer.feed(decoder.decode(b"", final=True)))
+        out.append(sanitizer.close())
+        return "".join(out)
+
+    def replay(
+        self,
+        out: BinaryIO | None = None,
+        speed: float = 1.0,
+        max_idle: float | None = None,
+        start: float | None = None,
+        end: float | None = None,
+    ) -> None:
+        """Write events to `out` (default: stdout) with their original pacing."""
+        if out is None:
+            out = sys.stdout.buffer
+        prev: float | None = None
+        for t, chunk in self.events(start, end):
+            if prev is not None and speed > 0:
+                gap = t - prev
+                if max_idle is not None:
+                    gap = min(gap, max_idle)
+                if gap > 0:
+                    time.sleep(gap / speed)
+            prev = t
+            out.write(chunk)
+            out.flush()
+
+
+__all__ = ["BINARY_SUFFIXES", "Timeline", "TimelineSink", "index_path", "is_binary_path"]
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+import shutil
+from functools import lru_cache
+from pathlib import Path
+from typing import Mapping
+
+
+# Where coreutils installs the helper `stdbuf` preloads, relative to its prefix
+_STDBUF_LIBS = (
+    "libexec/coreutils/libstdbuf.so",
+    "lib/coreutils/libstdbuf.so",
+    "lib64/coreutils/libstdbuf.so",
+    "lib/x86_64-linux-gnu/coreutils/libstdbuf.so",
+    "lib/aarch64-linux-gnu/coreutils/libstdbuf.so",
+)
+
+
+@lru_cache(maxsize=None)
+def find_libstdbuf() -> str | None:
+    """Path of coreutils' libstdbuf.so, or None if it is not installed."""
+    prefixes = []
+    stdbuf = shutil.which("stdbuf")
+    if stdbuf:
+        prefixes.append(Path(os.path.realpath(stdbuf)).parent.parent)
+    prefixes += [Path("/usr"), Path("/usr/local")]
+    for prefix in prefixes:
+        for rel in _STDBUF_LIBS:
+            lib = prefix / rel
+            if lib.is_file():
+                return str(lib)
+    return None
+
+
+def unbuffer_env(env: Mapping[str, str] | None = None) -> dict[str, str]:
+    """
+    Child environment that asks common runtimes not to block-buffer a pipe.
+
+    Without a terminal, Python and C stdio switch stdout to full buffering, so
+    output reaches the capture in bursts (or only at exit). This sets:
+
+    - ``PYTHONUNBUFFERED=1`` for Python children;
+    - what ``stdbuf -oL`` sets: coreutils' libstdbuf.so in ``LD_PRELOAD`` with
+      ``_STDBUF_O=L``, making stdout line-buffered in dynamically linked
+      programs that use C stdio (when the library is installed).
+
+    Programs that manage their own buffers (or are static or setuid) are
+    unaffected; those need the PTY engine.
+    """
+    out = dict(os.environ if env is None else env)
+    out["PYTHONUNBUFFERED"] = "1"
+    lib = find_libstdbuf()
+    if lib is not None:
+        preload = out.get("LD_PRELOAD", "")
+        if lib not in preload.split():
+            out["LD_PRELOAD"] = f"{preload} {lib}".strip()
+        out["_STDBUF_O"] = "L"
+    return out
+
+
+__all__ = ["find_libstdbuf", "unbuffer_env"]
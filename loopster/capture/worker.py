@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import os
+import secrets
+import selectors
+import shlex
+import signal
+import subprocess
+import time
+from typing import Sequence
+
+from .loop import AdaptiveReader, reap
+from .sinks import KEEP_CHOICES, Sink, close_sinks, open_sinks
+from .stats import CaptureStats
+
+
+# Exit code reported for a command that hit its timeout (as capture_command)
+TIMEOUT_EXIT = 124
+
+
+def _new_token() -> str:
+    return f"__loopster_{secrets.token_hex(8)}__"
+
+
+class WorkerDied(RuntimeError):
+    """The worker shell exited before finishing a command."""
+
+
+class ShellWorker:
+    """
+    One long-lived bash that runs captured commands back to back.
+
+    A batch of short commands otherwise pays for a fork/exec of bash (and, for
+    login shells, sourcing the profile) per command. Here the shell starts once
+    (with job control on, ``set -m``); each command is written to its stdin as
+    one frame::
+
+        ( printf '%s@%d\\n' <token> "$BASHPID"; eval '<cmd>' ) </dev/null 2>&1 &
+        job=$!; wait $job; status=$?; kill -KILL -- -$job; printf '%s:%d\\n' <token> "$status"
+
+    and its output is everything the shell prints after the ``<token>@<pid>``
+    header up to the random per-command `token`, which is followed by the exit
+    code. The subshell keeps ``cd``, ``exit`` and variables from leaking into
+    later commands, and redirecting its stdin keeps commands from reading the
+    rest of the script. Job control gives each frame its own process group:
+    background jobs the command left behind are killed with it before the
+    token, so their output never lands in the next command's log.
+
+    - `shell` is "login" (``bash -l``) or "non-login" (no profile or rc files).
+    - A command that times out takes the worker down with it (its whole process
+      group is killed); the next :meth:`run` starts a fresh one.
+    - Output is pipe-based, so commands see non-interactive stdio as with the
+      pipe engine.
+    """
+
+    def __init__(self, shell: str = "login", env: dict[str, str] | None = None, cwd: str | None = None) -> None:
+        if shell not in ("login", "non-login"):
+            raise ValueError(f"shell must be 'login' or 'non-login', got {shell!r}")
+        self.shell = shell
+        self.env = env
+        self.cwd = cwd
+        self.starts = 0
+        self.commands = 0
+        self._proc: subprocess.Popen | None = None
+        self._reader: AdaptiveReader | None = None
+        self._pending = bytearray()
+        # Process group of the command running now (see the frame header)
+        self._group: int | None = None
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self, timeout: float | None = 60.0) -> None:
+        """Start the shell (if needed) and wait until its profile has been sourced."""
+        if self.alive:
+            return
+        self.stop()
+        argv = ["bash", "-l"] if self.shell == "login" else ["bash", "--noprofile", "--norc"]
+        self._proc = subprocess.Popen(
+            argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=self.env,
+            cwd=self.cwd,
+            bufsize=0,
+            # Own process group, so a timed-out command's children die with it
+            start_new_session=True,
+        )
+        assert self._proc.stdout is not None
+        self._reader = AdaptiveReader(self._proc.stdout.fileno())
+        self._pending.clear()
+        self.starts += 1
+        # Whatever the profile prints is discarded with this frame, which also
+        # turns on job control (one process group per command)
+        token = _new_token()
+        self._send("set -m", token)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        if self._read_frame(token, [], deadline, None, header=False) is None:
+            self.stop()
+            raise TimeoutError("shell worker did not start in time")
+
+    def run(
+        self,
+        cmd: str,
+        output_path: str,
+        timeout: float | None = None,
+        stdin_path: str | None = None,
+        prepend_header: str | None = None,
+        raw_output_path: str | None = None,
+        raw_fsync_interval: float | None = None,
+        mirror_to_stdout: bool = False,
+        stats: CaptureStats | None = None,
+        max_bytes: int | None = None,
+        keep: Sequence[str] = KEEP_CHOICES,
+    ) -> int:
+        """
+        Run `cmd` in the worker, writing its own logs as capture_command would.
+
+        - stdin is `stdin_path` if given, else /dev/null.
+        - Returns the command's exit code, or 124 on timeout (the worker is
+          killed and restarted lazily).
+        - Raises :class:`WorkerDied` if the shell itself exits mid-command.
+        """
+        self.start()
+        sinks = open_sinks(
+            output_path,
+            prepend_header=prepend_header,
+            raw_output_path=raw_output_path,
+            raw_fsync_interval=raw_fsync_interval,
+            mirror_to_stdout=mirror_to_stdout,
+            stats=stats,
+            max_bytes=max_bytes,
+            keep=keep,
+        )
+        try:
+            if stats is not None:
+                stats.spawning("worker")
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            source = shlex.quote(stdin_path) if stdin_path else "/dev/null"
+            token = _new_token()
+            self._send(
+                f"( printf '%s@%d\\n' {token} \"$BASHPID\"; eval {shlex.quote(cmd)} ) <{source} 2>&1 &"
+                " __loopster_job=$!; wait $__loopster_job; __loopster_status=$?;"
+                " kill -KILL -- -$__loopster_job 2>/dev/null",
+                token,
+                status="$__loopster_status",
+            )
+            if stats is not None:
+                stats.spawned()
+            self.commands += 1
+            code = self._read_frame(token, sinks, deadline, stats)
+            if code is None:
+                self.stop()
+                return TIMEOUT_EXIT
+            return code
+        finally:
+            close_sinks(sinks)
+
+    def stop(self) -> None:
+        """Kill the shell and anything it started; safe to call repeatedly."""
+        proc, self._proc = self._proc, None
+        group, self._group = self._group, None
+        if proc is None:
+            return
+        for pgid in (group, proc.pid):
+            if pgid is None:
+                continue
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+            except OSError:
+                pass
+        reap(proc)
+        for stream in (proc.stdin, proc.stdout):
+            if stream is not None:
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+
+    def close(self) -> None:
+        """Let the shell exit on its own (end of script), then clean up."""
+        if self.alive:
+            assert self._proc is not None and self._proc.stdin is not None
+            try:
+                self._proc.stdin.close()
+                self._proc.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self.stop()
+
+    def __enter__(self) -> "ShellWorker":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _send(self, line: str, token: str, status: str = "$?") -> None:
+        assert self._proc is not None and self._proc.stdin is not None
+        frame = f"{line}; printf '%s:%d\\n' {token} \"{status}\"\n"
+        try:
+            self._proc.stdin.write(frame.encode())
+        except BrokenPipeError:
+            self.stop()
+            raise WorkerDied("shell worker is gone") from None
+
+    def _read_frame(
+        self,
+        token: str,
+        sinks: Sequence[Sink],
+        deadline: float | None,
+        stats: CaptureStats | None,
+        header: bool = True,
+    ) -> int | None:
+        """
+        Pass output to `sinks` up to `token`; return the exit code after it, or None on timeout.
+
+        With `header`, output is held back until the ``<token>@<pgid>`` line
+        that starts a command frame, and the command's process group is noted.
+        """
+        assert self._proc is not None and self._reader is not None
+        marker = token.encode() + b":"
+        head = token.encode() + b"@" if header else None
+        buf = self._pending
+        reader = self._reader
+        reader.stats = stats
+        sel = selectors.DefaultSelector()
+        sel.register(reader.fd, selectors.EVENT_READ)
+        try:
+            while True:
+                if head is not None:
+                    # Nothing is passed on before the frame's header line
+                    at = buf.find(head)
+                    end = buf.find(b"\n", at) if at >= 0 else -1
+                    if end >= 0:
+                        self._group = int(buf[at + len(head):end])
+                        del buf[:end + 1]
+                        head = None
+                if head is None:
+                    at = buf.find(marker)
+                    if at >= 0:
+                        end = buf.find(b"\n", at)
+                        if end >= 0:
+                            self._emit(sinks, buf, at)
+                            code = int(buf[len(marker):end - at])
+                            del buf[:end - at + 1]
+                            # The frame has killed what was left in the command's group
+                            self._group = None
+                            return code
+                        self._emit(sinks, buf, at)
+                    else:
+                        # Hold back a tail that could be the start of the marker
+                        self._emit(sinks, buf, len(buf) - len(marker) + 1)
+                wait = None
+                if deadline is not None:
+                    wait = deadline - time.monotonic()
+                    if wait <= 0:
+                        self._emit(sinks, buf, len(buf))
+                        return None
+                if not sel.select(timeout=wait):
+                    continue
+                chunk = reader.read()
+                if not chunk:
+                    self._emit(sinks, buf, len(buf))
+                    self.stop()
+                    raise WorkerDied("shell worker exited before the command finished")
+                buf += chunk
+        finally:
+            reader.stats = None
+            sel.close()
+
+    @staticmethod
+    def _emit(sinks: Sequence[Sink], buf: bytearray, n: int) -> None:
+        if n <= 0:
+            return
+        chunk = bytes(buf[:n])
+        del buf[:n]
+        for sink in sinks:
+            sink.write(chunk)
+
+
+__all__ = ["ShellWorker", "WorkerDied"]
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import errno
+import fcntl
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from ..compression import codec_for
+from .sinks import CleanLogSink
+from .stats import CaptureStats
+
+
+# Bytes moved per splice(2) call (the pipe never holds more than its buffer)
+SPLICE_CHUNK = 1 << 20
+
+
+def splice_available() -> bool:
+    """True where ``os.splice`` exists (Linux, Python 3.10+)."""
+    return hasattr(os, "splice") and sys.platform.startswith("linux")
+
+
+def stdout_fd() -> int | None:
+    """This process's stdout descriptor (flushed first), or None if it has none."""
+    try:
+        sys.stdout.flush()
+        return sys.stdout.fileno()
+    except (AttributeError, OSError, ValueError):
+        # e.g. replaced by a StringIO
+        return None
+
+
+def can_zero_copy(raw_output_path: str | None, mirror_to_stdout: bool) -> bool:
+    """Whether a capture with these outputs can take the :class:`SpliceTee` path."""
+    if not splice_available() or not raw_output_path or codec_for(Path(raw_output_path)) is not None:
+        return False
+    return not mirror_to_stdout or stdout_fd() is not None
+
+
+class SpliceTee:
+    """
+    Move the child's output to the raw log and the terminal inside the kernel.
+
+    Used by :func:`loopster.capture.loop.pump` as the reader of the child's pipe: each
+    call to :meth:`read` splices up to SPLICE_CHUNK bytes from the pipe into the
+    raw log, then copies the same range from the raw log's page cache to
+    `mirror_fd` with ``sendfile``. The bytes never enter Python. (Python has no
+    ``tee(2)`` wrapper; the raw log serves as the tap instead.)
+
+    - ``read`` returns the number of bytes moved, 0 at EOF.
+    - Where the kernel cannot ``sendfile`` to the mirror (a terminal on Linux
+      5.10+), the range is copied with ``pread``/``write`` instead, still
+      without going through the capture's buffers and sinks.
+    - The mirror blocks like the "block" mirror policy; if it fails (e.g. a
+      closed pipe), mirroring stops and capture continues.
+    - With `clean`, a side thread tails the raw log and sanitizes it into that
+      sink, so cleaning overlaps the capture instead of throttling it; it may
+      lag behind while the child is fast, and catches up on :meth:`close`.
+    """
+
+    def __init__(
+        self,
+        fd: int,
+        raw_output_path: str | Path,
+        mirror_fd: int | None = None,
+        fsync_interval: float | None = None,
+        stats: CaptureStats | None = None,
+        clean: CleanLogSink | None = None,
+    ) -> None:
+        self.fd = fd
+        self.path = Path(raw_output_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Read-write: the mirror is fed from this descriptor too
+        self._raw = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        self._mirror_fd = mirror_fd
+        self._sendfile = True
+        self._fsync_interval = fsync_interval
+        self._last_sync = time.monotonic()
+        self._offset = 0
+        self.stats = stats
+        try:
+            if fcntl.fcntl(fd, fcntl.F_GETPIPE_SZ) < SPLICE_CHUNK:
+                fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, SPLICE_CHUNK)
+        except (AttributeError, OSError):
+            # Above the system limit (fs.pipe-max-size); splice what fits
+            pass
+        self._clean = clean
+        self._cond = threading.Condition()
+        self._done = False
+        self._tap: threading.Thread | None = None
+        if clean is not None:
+            self._tap = threading.Thread(target=self._run_tap, name="loopster-clean-tap", daemon=True)
+            self._tap.start()
+
+    def read(self) -> int:
+        n = os.splice(self.fd, self._raw, SPLICE_CHUNK, flags=os.SPLICE_F_MOVE)
+        stats = self.stats
+        if stats is not None and n:
+            # Like AdaptiveReader, the end-of-file splice is not counted
+            if not stats.bytes_read:
+                stats.output_seen()
+            stats.bytes_read += n
+            stats.read_calls += 1
+            if n > stats.max_read_size:
+                stats.max_read_size = n
+        if n:
+            if self._mirror_fd is not None:
+                self._mirror(self._offset, n)
+            with self._cond:
+                self._offset += n
+                self._cond.notify()
+            if self._fsync_interval is not None:
+                now = time.monotonic()
+                if now - self._last_sync >= self._fsync_interval:
+                    os.fsync(self._raw)
+                    self._last_sync = now
+        return n
+
+    def _mirror(self, offset: int, count: int) -> None:
+        assert self._mirror_fd is not None
+        end = offset + count
+        try:
+            while offset < end:
+                if self._sendfile:
+                    try:
+                        sent = os.sendfile(self._mirror_fd, self._raw, offset, end - offset)
+                    except OSError as e:
+                        if e.errno not in (errno.EINVAL, errno.ENOSYS):
+                            raise
+                        sent = 0
+                    if sent:
+                        offset += sent
+                        continue
+                    self._sendfile = False
+                view = memoryview(os.pread(self._raw, end - offset, offset))
+                while view:
+                    view = view[os.write(self._mirror_fd, view):]
+                offset = end
+            if self.stats is not None:
+                self.stats.mirror_bytes += count
+                self.stats.mirror_writes += 1
+        except OSError:
+            # The terminal went away; keep capturing without it
+            self._mirror_fd = None
+
+    def write(self, chunk: bytes | memoryview) -> None:
+        # Data reaches the raw log through read(); nothing is handed to sinks
+        pass
+
+    def _run_tap(self) -> None:
+        assert self._clean is not None
+        fd = os.open(self.path, os.O_RDONLY)
+        pos = 0
+        try:
+            while True:
+                with self._cond:
+                    while pos >= self._offset and not self._done:
+                        self._cond.wait()
+                    end = self._offset
+                if pos >= end:
+                    return
+                block = os.pread(fd, min(end - pos, SPLICE_CHUNK), pos)
+                if not block:
+                    return
+                pos += len(block)
+                self._clean.write(block)
+        finally:
+            os.close(fd)
+
+    def close(self) -> None:
+        """Finish the raw log, let the tap catch up, and close the cleaned log."""
+        if self._raw < 0:
+            return
+        try:
+            os.fsync(self._raw)
+        except OSError:
+            pass
+        with self._cond:
+            self._done = True
+            self._cond.notify()
+        try:
+            if self._tap is not None:
+                self._tap.join()
+        finally:
+            os.close(self._raw)
+            self._raw = -1
+            if self._clean is not None:
+                self._clean.close()
+
+
+__all__ = ["SPLICE_CHUNK", "SpliceTee", "can_zero_copy", "splice_available", "stdout_fd"]
@@ -4,6 +4,337 @@ import argparse
 import sys
 from .llm import LLMClient
 import os
+import subprocess
+
+
+def _parse_pty_size(value: str) -> tuple[int, int]:
+    try:
+        rows, cols = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected ROWSxCOLS, got {value!r}")
+    if rows <= 0 or cols <= 0:
+        raise argparse.ArgumentTypeError(f"expected positive ROWSxCOLS, got {value!r}")
+    return rows, cols
+
+
+def _parse_size(value: str) -> int:
+    units = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+    text = value.strip().lower().removesuffix("b")
+    scale = units.get(text[-1:], 1)
+    if scale != 1:
+        text = text[:-1]
+    try:
+        size = int(text) * scale
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a byte count like 65536 or 10M, got {value!r}")
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive byte count, got {value!r}")
+    return size
+
+
+def _parse_keep(value: str) -> tuple[str, ...]:
+    parts = tuple(part.strip() for part in value.split(",") if part.strip())
+    if not parts or any(part not in ("head", "tail") for part in parts):
+        raise argparse.ArgumentTypeError(f"expected head, tail or head,tail, got {value!r}")
+    return parts
+
+
+def _capture_with_engine(args: argparse.Namespace, cmd: str, output: str, header: str | None) -> int:
+    """Run the selected capture engine with the shared capture flags."""
+    kwargs: dict = dict(
+        timeout=getattr(args, "timeout", None),
+        mirror_to_stdout=not getattr(args, "no_mirror", False),
+        raw_output_path=getattr(args, "raw", None),
+        prepend_header=header,
+    )
+    # Newer options are only passed when set, keeping the call compatible with
+    # engines (and stand-ins) that predate them.
+    if getattr(args, "raw_fsync", None) is not None:
+        kwargs["raw_fsync_interval"] = args.raw_fsync
+    if getattr(args, "mirror_policy", "block") != "block":
+        kwargs["mirror_policy"] = args.mirror_policy
+    if getattr(args, "input_file", None):
+        # It is read lazily while the command runs; check it before starting one
+        try:
+            open(args.input_file, "rb").close()
+        except OSError as e:
+            print(f"[loopster] cannot read --input-file {args.input_file}: {e.strerror or e}")
+            return 2
+        kwargs["input_file"] = args.input_file
+    if getattr(args, "input_delay", None) is not None:
+        kwargs["input_delay"] = args.input_delay
+    if getattr(args, "expect", None):
+        from .capture.expect import ExpectScript
+
+        if "input_file" in kwargs:
+            print("[loopster] --expect and --input-file both drive stdin; pick one")
+            return 2
+        try:
+            kwargs["expect"] = ExpectScript.load(args.expect)
+        except (OSError, ValueError) as e:
+            print(f"[loopster] expect: invalid script {args.expect}: {e}")
+            return 2
+    if getattr(args, "timeline", None):
+        kwargs["timeline_path"] = args.timeline
+    if getattr(args, "max_bytes", None) is not None:
+        kwargs["max_bytes"] = args.max_bytes
+        kwargs["keep"] = getattr(args, "keep", None) or ("head", "tail")
+    if getattr(args, "stderr", None):
+        kwargs["stderr_output_path"] = args.stderr
+    if getattr(args, "stream_index", None):
+        kwargs["stream_index_path"] = args.stream_index
+    shell = "exec" if getattr(args, "exec_direct", False) else getattr(args, "shell", "login")
+    if shell == "cached-login":
+        from .capture.login_env import default_cache_path, login_env
+
+        try:
+            kwargs["env"], hit = login_env(refresh=getattr(args, "refresh_login_env", False))
+        except (OSError, RuntimeError, subprocess.SubprocessError) as e:
+            print(f"[loopster] could not snapshot the login environment: {e}")
+            return 2
+        if not hit:
+            print(f"[loopster] login environment snapshot saved → {default_cache_path()}")
+        shell = "non-login"
+    from .capture.shell import SpawnError, command_argv
+
+    if shell == "exec":
+        # A command line that does not even split is as unrunnable as an unknown program
+        try:
+            command_argv(cmd, shell)
+        except ValueError as e:
+            print(f"[loopster] cannot execute {cmd!r}: {e}")
+            return 127
+    if shell != "login":
+        kwargs["shell"] = shell
+    if getattr(args, "unbuffer", False) and getattr(args, "engine", "pipe") != "pty":
+        # A terminal already gets line-buffered output
+        kwargs["unbuffer"] = True
+    if getattr(args, "zero_copy", False) and getattr(args, "engine", "pipe") != "pty":
+        from .capture.zerocopy import can_zero_copy
+
+        if not can_zero_copy(getattr(args, "raw", None), mirror_to_stdout=False):
+            print("[loopster] --zero-copy needs Linux and an uncompressed --raw file; using the regular loop")
+        kwargs["zero_copy"] = True
+    if getattr(args, "pipeline", False):
+        kwargs["pipeline"] = True
+    if getattr(args, "engine", "pipe") == "pty" and ("stderr_output_path" in kwargs or "stream_index_path" in kwargs):
+        print("[loopster] --stderr and --stream-index need --engine pipe (a terminal merges both streams)")
+        return 2
+    stats = None
+    if getattr(args, "stats", None):
+        from .capture.stats import CaptureStats
+
+        stats = kwargs["stats"] = CaptureStats()
+    usage = None
+    if getattr(args, "usage", None) or getattr(args, "usage_banner", False):
+        from .capture.stats import ResourceUsage
+
+        usage = kwargs["usage"] = ResourceUsage()
+    latency = None
+    if getattr(args, "latency", None) or getattr(args, "latency_banner", False):
+        from .capture.latency import LatencyProfile
+
+        latency = kwargs["latency"] = LatencyProfile()
+    try:
+        if getattr(args, "engine", "pipe") == "pty":
+            from .capture.pty_capture import capture_command
+
+            code = capture_command(cmd, output, size=getattr(args, "pty_size", None), **kwargs)
+        else:
+            from .capture.pipe_capture import capture_command
+
+            code = capture_command(cmd, output, **kwargs)
+    except RuntimeError as e:
+        from .capture.expect import ExpectError
+
+        if not isinstance(e, ExpectError):
+            raise
+        # The logs are complete up to the failure
+        print(f"[loopster] expect: {e}")
+        code = 1
+    except SpawnError as e:
+        # Without a shell there is nobody to report a bad command for us; exit like one would
+        print(f"[loopster] {e.strerror}")
+        return 127
+    if stats is not None:
+        try:
+            stats.write_json(args.stats)
+            print(f"[loopster] stats saved → {args.stats}")
+        except Exception as e:
+            print(f"[loopster] failed to write stats: {e}")
+        if stats.first_output_seconds is not None:
+            print(
+                f"[loopster] startup ({stats.shell or 'login'} shell): spawn {stats.spawn_seconds * 1000:.0f} ms,"
+                f" first output after {stats.first_output_seconds * 1000:.0f} ms"
+            )
+    if usage is not None:
+        print(usage.banner())
+        if getattr(args, "usage", None):
+            try:
+                usage.write_json(args.usage)
+                print(f"[loopster] usage saved → {args.usage}")
+            except Exception as e:
+                print(f"[loopster] failed to write usage: {e}")
+        if getattr(args, "usage_banner", False):
+            # The header is written before the child starts, so the figures close the log instead
+            try:
+                _append_to_log(output, usage.banner())
+            except Exception as e:
+                print(f"[loopster] failed to append usage to the log: {e}")
+    if latency is not None:
+        block = latency.banner()
+        print(block.splitlines()[0])
+        if getattr(args, "latency", None):
+            try:
+                latency.write_json(args.latency)
+                print(f"[loopster] latency saved → {args.latency}")
+            except Exception as e:
+                print(f"[loopster] failed to write latency: {e}")
+        if getattr(args, "latency_banner", False):
+            # Like --usage-banner: the figures only exist once the session is over
+            try:
+                _append_to_log(output, block)
+            except Exception as e:
+                print(f"[loopster] failed to append latency to the log: {e}")
+    return code
+
+
+def _append_to_log(output: str, text: str) -> None:
+    """Append `text` as lines of its own to the (possibly compressed) log at `output`."""
+    from .compression import open_input, open_output, sniff_codec
+
+    last = b""
+    if sniff_codec(output) is None:
+        with open(output, "rb") as fh:
+            if fh.seek(0, os.SEEK_END):
+                fh.seek(-1, os.SEEK_END)
+                last = fh.read(1)
+    else:
+        with open_input(output) as fh:
+            for chunk in iter(lambda: fh.read(1 << 16), b""):
+                last = chunk[-1:]
+    # Output that stopped mid-line (e.g. `printf hi`) still gets its line of its own
+    lead = "\n" if last not in (b"", b"\n") else ""
+    with open_output(output, append=True) as fh:
+        fh.write((lead + text + "\n").encode("utf-8"))
+
+
+# Options of a single --cmd capture; the manifest's jobs do not take them
+_SINGLE_CAPTURE_FLAGS = (
+    ("cmd", "--cmd"),
+    ("output", "--out"),
+    ("timeout", "--timeout"),
+    ("raw", "--raw"),
+    ("engine", "--engine"),
+    ("pty_size", "--pty-size"),
+    ("no_mirror", "--no-mirror"),
+    ("mirror_policy", "--mirror-policy"),
+    ("input_file", "--input-file"),
+    ("input_delay", "--input-delay"),
+    ("expect", "--expect"),
+    ("stderr", "--stderr"),
+    ("stream_index", "--stream-index"),
+    ("timeline", "--timeline"),
+    ("max_bytes", "--max-bytes"),
+    ("keep", "--keep"),
+    ("zero_copy", "--zero-copy"),
+    ("pipeline", "--pipeline"),
+    ("stats", "--stats"),
+    ("usage", "--usage"),
+    ("usage_banner", "--usage-banner"),
+    ("latency", "--latency"),
+    ("latency_banner", "--latency-banner"),
+)
+# Non-empty defaults of the options above
+_SINGLE_CAPTURE_DEFAULTS = {"engine": "pipe", "mirror_policy": "block"}
+
+
+def _capture_manifest(args: argparse.Namespace) -> int:
+    """Capture every job of a --manifest concurrently; return the first failing exit code."""
+    from .capture.manifest import load_manifest, run_jobs
+
+    given = [
+        flag
+        for dest, flag in _SINGLE_CAPTURE_FLAGS
+        if getattr(args, dest, None) not in (None, False, _SINGLE_CAPTURE_DEFAULTS.get(dest))
+    ]
+    if given:
+        print(f"[loopster] capture: --manifest jobs are set in the manifest; drop {', '.join(given)}")
+        return 2
+    try:
+        jobs = load_manifest(args.manifest)
+    except Exception as e:
+        print(f"[loopster] capture: invalid manifest: {e}")
+        return 2
+    if getattr(args, "max_parallel", None) is not None and args.max_parallel < 1:
+        print("[loopster] capture: --max-parallel must be at least 1")
+        return 2
+    if getattr(args, "exec_direct", False) and getattr(args, "worker", False):
+        print("[loopster] capture: --worker runs jobs through a shell; drop --exec")
+        return 2
+    if getattr(args, "unbuffer", False) and getattr(args, "worker", False):
+        print("[loopster] capture: --unbuffer is not supported with --worker")
+        return 2
+    print(f"[loopster] capturing {len(jobs)} jobs from {args.manifest}")
+
+    def _report(index: int, job, code: int) -> None:
+        print(f"[loopster] job {index + 1}: exit code {code} → {job.log}")
+
+    def _report_error(index: int, job, error: BaseException) -> None:
+        from .capture.shell import SpawnError
+
+        print(f"[loopster] job {index + 1}: {error.strerror if isinstance(error, SpawnError) else error}")
+
+    env = None
+    shell = "exec" if getattr(args, "exec_direct", False) else getattr(args, "shell", "login")
+    if shell == "cached-login":
+        from .capture.login_env import default_cache_path, login_env
+
+        try:
+            env, hit = login_env(refresh=getattr(args, "refresh_login_env", False))
+        except (OSError, RuntimeError, subprocess.SubprocessError) as e:
+            print(f"[loopster] could not snapshot the login environment: {e}")
+            return 2
+        if not hit:
+            print(f"[loopster] login environment snapshot saved → {default_cache_path()}")
+        shell = "non-login"
+    header = None
+    if getattr(args, "include_invocation", False):
+
+        def header(job) -> str:
+            return f"[loopster] capturing: {job.cmd}\n[loopster] log: {job.log}\n"
+
+    if getattr(args, "worker", False):
+        from .capture.manifest import run_jobs_in_worker
+        from .capture.worker import WorkerDied
+
+        try:
+            codes = run_jobs_in_worker(
+                jobs,
+                shell=shell,
+                env=env,
+                raw_fsync_interval=getattr(args, "raw_fsync", None),
+                on_done=_report,
+                header=header,
+            )
+        except WorkerDied as e:
+            print(f"[loopster] capture: {e}")
+            return 1
+    else:
+        codes = run_jobs(
+            jobs,
+            max_parallel=getattr(args, "max_parallel", None),
+            env=env,
+            raw_fsync_interval=getattr(args, "raw_fsync", None),
+            on_done=_report,
+            shell=shell,
+            header=header,
+            unbuffer=getattr(args, "unbuffer", False),
+            on_error=_report_error,
+        )
+    failed = [c for c in codes if c != 0]
+    print(f"[loopster] finished {len(codes)} jobs, {len(failed)} failed")
+    return failed[0] if failed else 0
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -30,8 +361,67 @@ def build_parser() -> argparse.ArgumentParser:
     run_p.add_argument("--cmd", type=str, default=None, help="Command to run")
     run_p.add_argument("--log-out", type=str, default=None, help="Path to save the session log")
     run_p.add_argument("--raw", type=str, default=None, help="Optional path to save raw log")
+    run_p.add_argument(
+        "--raw-fsync", type=float, default=None, metavar="SECONDS", help="fsync the raw log at most every SECONDS"
+    )
     run_p.add_argument("--timeout", type=float, default=None, help="Timeout in seconds")
+    run_p.add_argument("--input-file", type=str, default=None, help="File whose lines are fed to the command's stdin")
+    run_p.add_argument(
+        "--input-delay", type=float, default=None, metavar="SECONDS", help="Wait before each --input-file line"
+    )
+    run_p.add_argument(
+        "--expect", type=str, default=None, metavar="SCRIPT", help="Drive stdin with an expect/send script"
+    )
+    run_p.add_argument("--stats", type=str, default=None, help="Path to save capture statistics (JSON)")
+    run_p.add_argument(
+        "--timeline", type=str, default=None, help="Path to record timestamped output (.cast, or binary .lpt)"
+    )
+    run_p.add_argument(
+        "--shell",
+        type=str,
+        choices=["login", "non-login", "cached-login"],
+        default="login",
+        help="Run --cmd via bash -lc, bash -c, or bash -c with a cached login environment",
+    )
+    run_p.add_argument("--refresh-login-env", action="store_true", help="Re-snapshot the cached login environment")
+    run_p.add_argument("--exec", dest="exec_direct", action="store_true", help="Run --cmd directly, without a shell")
+    run_p.add_argument(
+        "--unbuffer", action="store_true", help="Ask the command not to block-buffer its piped output"
+    )
+    run_p.add_argument(
+        "--zero-copy", action="store_true", help="Linux: splice output to --raw and the terminal in the kernel"
+    )
+    run_p.add_argument(
+        "--pipeline", action="store_true", help="Write the raw and cleaned logs from their own threads"
+    )
+    run_p.add_argument(
+        "--engine", type=str, choices=["pipe", "pty"], default="pipe", help="Capture through pipes or a pseudo-terminal"
+    )
+    run_p.add_argument(
+        "--pty-size", type=_parse_pty_size, default=None, metavar="ROWSxCOLS", help="Terminal size for --engine pty"
+    )
+    run_p.add_argument("--usage", type=str, default=None, help="Path to save the child's resource usage (JSON)")
+    run_p.add_argument("--usage-banner", action="store_true", help="End the log with a resource usage line")
+    run_p.add_argument("--latency", type=str, default=None, help="Path to save per-turn latency of the command (JSON)")
+    run_p.add_argument("--latency-banner", action="store_true", help="End the log with a per-turn latency block")
+    run_p.add_argument("--stderr", type=str, default=None, help="Also save stderr alone (cleaned) to this path")
+    run_p.add_argument(
+        "--stream-index", type=str, default=None, help="Path to record how stdout and stderr interleave"
+    )
+    run_p.add_argument(
+        "--max-bytes", type=_parse_size, default=None, metavar="N", help="Keep at most N bytes of output per --keep end"
+    )
+    run_p.add_argument(
+        "--keep", type=_parse_keep, default=None, metavar="head,tail", help="With --max-bytes: which ends to keep"
+    )
     run_p.add_argument("--no-mirror", action="store_true", help="Do not mirror child output")
+    run_p.add_argument(
+        "--mirror-policy",
+        type=str,
+        choices=["block", "drop", "summarize"],
+        default="block",
+        help="What to do when the terminal falls behind the child",
+    )
     run_p.add_argument("--include-invocation", action="store_true", help="Prepend banner + invocation to the log")
     # model and outputs
     run_p.add_argument("--model", type=str, default=None)
@@ -69,17 +459,230 @@ def build_parser() -> argparse.ArgumentParser:
             " the partial cleaned log is saved, and exit code 124 is returned."
         ),
     )
+    cap_p.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help=(
+            "TOML file of [[job]] entries (cmd, log, optional timeout/raw/inputs) to capture"
+            " concurrently in one process instead of --cmd"
+        ),
+    )
+    cap_p.add_argument(
+        "--max-parallel",
+        type=int,
+        default=None,
+        help="With --manifest: run at most this many jobs at once (default: all)",
+    )
+    cap_p.add_argument(
+        "--worker",
+        action="store_true",
+        help=(
+            "With --manifest: run the jobs one after another through a single persistent shell"
+            " instead of a process each (much cheaper for many short commands; honors --shell)"
+        ),
+    )
+    cap_p.add_argument(
+        "--shell",
+        type=str,
+        choices=["login", "non-login", "cached-login"],
+        default="login",
+        help=(
+            "login: run --cmd with bash -lc, sourcing your login profile (default)."
+            " non-login: bash -c, skipping the profile (faster, quieter logs)."
+            " cached-login: bash -c with the environment a login shell produced, snapshotted once"
+            " and reused until a profile file changes."
+        ),
+    )
+    cap_p.add_argument(
+        "--refresh-login-env",
+        action="store_true",
+        help="With --shell cached-login, take a fresh snapshot even if the profiles look unchanged",
+    )
+    cap_p.add_argument(
+        "--exec",
+        dest="exec_direct",
+        action="store_true",
+        help="Split --cmd like a shell would and run it directly, with no shell at all (no pipes or $VARS)",
+    )
+    cap_p.add_argument(
+        "--unbuffer",
+        action="store_true",
+        help=(
+            "Pipe engine: set PYTHONUNBUFFERED and preload coreutils' libstdbuf (as stdbuf -oL does) so"
+            " Python and C programs write output as it happens instead of in late bursts;"
+            " with --stats, compare the reported time to first output"
+        ),
+    )
+    cap_p.add_argument(
+        "--zero-copy",
+        action="store_true",
+        help=(
+            "Pipe engine on Linux, with an uncompressed --raw: move output into the raw log and the terminal"
+            " with splice/sendfile, never through Python; the cleaned log is sanitized from the raw log on a"
+            " side thread (it may lag behind very fast output)"
+        ),
+    )
+    cap_p.add_argument(
+        "--pipeline",
+        action="store_true",
+        help=(
+            "Split capture into a reader that only drains the child's output and consumer threads for the"
+            " cleaned log (sanitizer, compressor) and raw log, behind bounded queues; --stats then reports"
+            " per-stage queue depth and throughput"
+        ),
+    )
+    cap_p.add_argument(
+        "--engine",
+        type=str,
+        choices=["pipe", "pty"],
+        default="pipe",
+        help=(
+            "pipe: plain pipes (default). pty: give the child a pseudo-terminal so interactive"
+            " tools keep line buffering; your keystrokes are forwarded to it."
+        ),
+    )
+    cap_p.add_argument(
+        "--pty-size",
+        type=_parse_pty_size,
+        default=None,
+        metavar="ROWSxCOLS",
+        help="Terminal size for --engine pty (default: this terminal's size, or 24x80)",
+    )
+    cap_p.add_argument(
+        "--input-file",
+        type=str,
+        default=None,
+        help="Feed this file to the command's stdin, line by line, while capturing (stdin is closed afterwards)",
+    )
+    cap_p.add_argument(
+        "--input-delay",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="With --input-file: wait SECONDS before sending each line",
+    )
+    cap_p.add_argument(
+        "--expect",
+        type=str,
+        default=None,
+        metavar="SCRIPT",
+        help=(
+            "Drive stdin with a script of 'expect REGEX', 'send TEXT', 'sendline TEXT', 'fail REGEX' and"
+            " 'timeout SECONDS' lines: each send waits for the previous pattern in the cleaned output"
+            " (exit code 1 if the script fails)"
+        ),
+    )
+    cap_p.add_argument(
+        "--stats",
+        type=str,
+        default=None,
+        help="Path to save capture statistics as JSON (bytes read, read syscalls, bytes per read)",
+    )
+    cap_p.add_argument(
+        "--timeline",
+        type=str,
+        default=None,
+        help=(
+            "Record every output chunk with its timestamp: asciicast v2 (e.g. out.cast, playable with"
+            " asciinema) or the compact binary format for *.lpt. Inspect with `loopster timeline`."
+        ),
+    )
+    cap_p.add_argument(
+        "--usage",
+        type=str,
+        default=None,
+        help=(
+            "Path to save resource usage as JSON: the child's CPU user/sys time, max RSS, context"
+            " switches and wall time, plus loopster's own CPU time"
+        ),
+    )
+    cap_p.add_argument(
+        "--usage-banner",
+        action="store_true",
+        help="Append a one-line resource usage summary to the end of the cleaned log",
+    )
+    cap_p.add_argument(
+        "--latency",
+        type=str,
+        default=None,
+        help=(
+            "Path to save a latency profile as JSON: output bursts and idle gaps, and per turn (startup, then"
+            " each prompt sent) the time to first output, response time and estimated tokens per second"
+        ),
+    )
+    cap_p.add_argument(
+        "--latency-banner",
+        action="store_true",
+        help="Append the latency summary, one line per turn, to the end of the cleaned log",
+    )
+    cap_p.add_argument(
+        "--stderr",
+        type=str,
+        default=None,
+        help=(
+            "Read stderr from its own pipe and also save it alone (cleaned) to this path;"
+            " the main log still shows both streams interleaved (pipe engine only)"
+        ),
+    )
+    cap_p.add_argument(
+        "--stream-index",
+        type=str,
+        default=None,
+        help=(
+            "Record (stream, offset, length, time) for every chunk of stdout/stderr, so each"
+            " stream can be recovered from --raw and the merged view from the streams (pipe engine only)"
+        ),
+    )
+    cap_p.add_argument(
+        "--max-bytes",
+        type=_parse_size,
+        default=None,
+        metavar="N",
+        help=(
+            "Bound the cleaned log: keep only the first and/or last N bytes of output (e.g. 4M),"
+            " with a marker for what was elided. --raw still receives everything."
+        ),
+    )
+    cap_p.add_argument(
+        "--keep",
+        type=_parse_keep,
+        default=None,
+        metavar="head,tail",
+        help="With --max-bytes: keep the head, the tail, or both (default: head,tail)",
+    )
     cap_p.add_argument(
         "--no-mirror",
         action="store_true",
         help="Do not mirror child output to this terminal (useful for noisy TUIs)",
     )
+    cap_p.add_argument(
+        "--mirror-policy",
+        type=str,
+        choices=["block", "drop", "summarize"],
+        default="block",
+        help=(
+            "When the terminal falls behind the child: block (wait, lose nothing), drop (skip new"
+            " output and print a marker), or summarize (skip the stale backlog and jump to the newest"
+            " output). Logs always keep everything."
+        ),
+    )
     cap_p.add_argument(
         "--raw",
         type=str,
         default=None,
         help="Optional path to save the raw, uncleaned log (for debugging)",
     )
+    cap_p.add_argument(
+        "--raw-fsync",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help=(
+            "Force the raw log to disk at most every SECONDS (0 = after every chunk)."
+            " The raw log is always appended as output arrives."
+        ),
+    )
     cap_p.add_argument(
         "--include-invocation",
         action="store_true",
@@ -124,6 +727,26 @@ def build_parser() -> argparse.ArgumentParser:
     san_p.add_argument("--raw", type=str, required=True, help="Path to raw log")
     san_p.add_argument("--out", type=str, required=True, help="Path to cleaned log")
 
+    # timeline
+    tl_p = subparsers.add_parser(
+        "timeline",
+        help="Inspect, slice, sanitize or replay a --timeline recording",
+        description=(
+            "Read a timeline recorded with `capture --timeline`.\n"
+            "- Without --out or --replay, prints the number of chunks, bytes and duration.\n"
+            "- --start/--end select a time range (seconds since the capture started)."
+        ),
+    )
+    tl_p.add_argument("--in", dest="input", type=str, required=True, help="Path to the timeline (.cast or .lpt)")
+    tl_p.add_argument("--start", type=float, default=None, metavar="SECONDS", help="Skip output before this time")
+    tl_p.add_argument("--end", type=float, default=None, metavar="SECONDS", help="Stop at this time")
+    tl_p.add_argument("--out", type=str, default=None, help="Write the cleaned text of the range to this path")
+    tl_p.add_argument("--replay", action="store_true", help="Replay the range to this terminal with original timing")
+    tl_p.add_argument("--speed", type=float, default=1.0, help="With --replay: playback speed multiplier")
+    tl_p.add_argument(
+        "--max-idle", type=float, default=None, metavar="SECONDS", help="With --replay: cap pauses at SECONDS"
+    )
+
     return parser
 
 
@@ -251,7 +874,6 @@ def main(argv: list[str] | None = None) -> int:
         if err:
             return 2
         # Prepare capture
-        from .capture.pipe_capture import capture_command
         from pathlib import Path
         import tempfile
 
@@ -273,21 +895,58 @@ def main(argv: list[str] | None = None) -> int:
                 parts += ["--log-out", log_path]
             if getattr(args, "raw", None):
                 parts += ["--raw", args.raw]
+            if getattr(args, "raw_fsync", None) is not None:
+                parts += ["--raw-fsync", str(args.raw_fsync)]
             if getattr(args, "timeout", None) is not None:
                 parts += ["--timeout", str(args.timeout)]
+            if getattr(args, "input_file", None):
+                parts += ["--input-file", args.input_file]
+            if getattr(args, "input_delay", None) is not None:
+                parts += ["--input-delay", str(args.input_delay)]
+            if getattr(args, "expect", None):
+                parts += ["--expect", args.expect]
+            if getattr(args, "stats", None):
+                parts += ["--stats", args.stats]
+            if getattr(args, "timeline", None):
+                parts += ["--timeline", args.timeline]
+            if getattr(args, "usage", None):
+                parts += ["--usage", args.usage]
+            if getattr(args, "usage_banner", False):
+                parts += ["--usage-banner"]
+            if getattr(args, "latency", None):
+                parts += ["--latency", args.latency]
+            if getattr(args, "latency_banner", False):
+                parts += ["--latency-banner"]
+            if getattr(args, "stderr", None):
+                parts += ["--stderr", args.stderr]
+            if getattr(args, "stream_index", None):
+                parts += ["--stream-index", args.stream_index]
+            if getattr(args, "max_bytes", None) is not None:
+                parts += ["--max-bytes", str(args.max_bytes)]
+            if getattr(args, "keep", None):
+                parts += ["--keep", ",".join(args.keep)]
+            if getattr(args, "exec_direct", False):
+                parts += ["--exec"]
+            elif getattr(args, "shell", "login") != "login":
+                parts += ["--shell", args.shell]
+            if getattr(args, "unbuffer", False):
+                parts += ["--unbuffer"]
+            if getattr(args, "zero_copy", False):
+                parts += ["--zero-copy"]
+            if getattr(args, "pipeline", False):
+                parts += ["--pipeline"]
+            if getattr(args, "engine", "pipe") != "pipe":
+                parts += ["--engine", args.engine]
+            if getattr(args, "pty_size", None) is not None:
+                parts += ["--pty-size", "{}x{}".format(*args.pty_size)]
             if getattr(args, "no_mirror", False):
                 parts += ["--no-mirror"]
+            if getattr(args, "mirror_policy", "block") != "block":
+                parts += ["--mirror-policy", args.mirror_policy]
             parts += ["--include-invocation"]
             header = " ".join(parts) + "\n" + f"[loopster] run: capturing → {args.cmd}\n[loopster] log: {log_path}\n"
 
-        child_code = capture_command(
-            args.cmd,
-            log_path,
-            timeout=getattr(args, "timeout", None),
-            mirror_to_stdout=not getattr(args, "no_mirror", False),
-            raw_output_path=getattr(args, "raw", None),
-            prepend_header=header,
-        )
+        child_code = _capture_with_engine(args, args.cmd, log_path, header)
         if auto_log:
             print(f"[loopster] session saved to: {log_path}")
         print(f"[loopster] child exit code: {child_code}")
@@ -465,10 +1124,10 @@ def main(argv: list[str] | None = None) -> int:
             print(f"[loopster] analysis applied to {args.config}")
         return 0
     if args.command == "capture":
-        # Lazy import to keep CLI fast
-        from .capture.pipe_capture import capture_command
         import tempfile
 
+        if getattr(args, "manifest", None):
+            return _capture_manifest(args)
         if not getattr(args, "cmd", None):
             print("[loopster] capture: provide --cmd to run (no-op)")
             return 0
@@ -495,21 +1154,58 @@ def main(argv: list[str] | None = None) -> int:
                 parts += ["--out", output]
             if getattr(args, "raw", None):
                 parts += ["--raw", args.raw]
+            if getattr(args, "raw_fsync", None) is not None:
+                parts += ["--raw-fsync", str(args.raw_fsync)]
             if getattr(args, "timeout", None) is not None:
                 parts += ["--timeout", str(args.timeout)]
+            if getattr(args, "input_file", None):
+                parts += ["--input-file", args.input_file]
+            if getattr(args, "input_delay", None) is not None:
+                parts += ["--input-delay", str(args.input_delay)]
+            if getattr(args, "expect", None):
+                parts += ["--expect", args.expect]
+            if getattr(args, "stats", None):
+                parts += ["--stats", args.stats]
+            if getattr(args, "timeline", None):
+                parts += ["--timeline", args.timeline]
+            if getattr(args, "usage", None):
+                parts += ["--usage", args.usage]
+            if getattr(args, "usage_banner", False):
+                parts += ["--usage-banner"]
+            if getattr(args, "latency", None):
+                parts += ["--latency", args.latency]
+            if getattr(args, "latency_banner", False):
+                parts += ["--latency-banner"]
+            if getattr(args, "stderr", None):
+                parts += ["--stderr", args.stderr]
+            if getattr(args, "stream_index", None):
+                parts += ["--stream-index", args.stream_index]
+            if getattr(args, "max_bytes", None) is not None:
+                parts += ["--max-bytes", str(args.max_bytes)]
+            if getattr(args, "keep", None):
+                parts += ["--keep", ",".join(args.keep)]
+            if getattr(args, "exec_direct", False):
+                parts += ["--exec"]
+            elif getattr(args, "shell", "login") != "login":
+                parts += ["--shell", args.shell]
+            if getattr(args, "unbuffer", False):
+                parts += ["--unbuffer"]
+            if getattr(args, "zero_copy", False):
+                parts += ["--zero-copy"]
+            if getattr(args, "pipeline", False):
+                parts += ["--pipeline"]
+            if getattr(args, "engine", "pipe") != "pipe":
+                parts += ["--engine", args.engine]
+            if getattr(args, "pty_size", None) is not None:
+                parts += ["--pty-size", "{}x{}".format(*args.pty_size)]
             if getattr(args, "no_mirror", False):
                 parts += ["--no-mirror"]
+            if getattr(args, "mirror_policy", "block") != "block":
+                parts += ["--mirror-policy", args.mirror_policy]
             parts += ["--include-invocation"]
             cmd_line = " ".join(parts)
             header = cmd_line + "\n" + f"[loopster] capturing: {args.cmd}\n[loopster] log: {output}\n"
-        code = capture_command(
-            args.cmd,
-            output,
-            timeout=getattr(args, "timeout", None),
-            mirror_to_stdout=not getattr(args, "no_mirror", False),
-            raw_output_path=getattr(args, "raw", None),
-            prepend_header=header,
-        )
+        code = _capture_with_engine(args, args.cmd, output, header)
         if auto_output:
             print(f"[loopster] session saved to: {output}")
         print(f"[loopster] finished with exit code {code}")
@@ -522,8 +1218,9 @@ def main(argv: list[str] | None = None) -> int:
             print("[loopster] analyze: provide --log and --config (no-op)")
             return 0
         from pathlib import Path
+        from .compression import read_text
         try:
-            log_text = Path(log_path).read_text(encoding="utf-8")
+            log_text = read_text(log_path)
         except Exception as e:
             print(f"[loopster] analyze: failed to read log: {e}")
             return 2
@@ -727,8 +1424,9 @@ def main(argv: list[str] | None = None) -> int:
             print("[loopster] summarize: provide --log to generate a summary (no-op)")
             return 0
         from pathlib import Path
+        from .compression import read_text
         try:
-            log_text = Path(log_path).read_text(encoding="utf-8")
+            log_text = read_text(log_path)
         except Exception as e:
             print(f"[loopster] summarize: failed to read log: {e}")
             return 2
@@ -804,24 +1502,73 @@ def main(argv: list[str] | None = None) -> int:
         print(" - fake:<anything> (prints LOOPSTER_FAKE_RESPONSE or 'OK')")
         return 0
     if args.command == "sanitize":
-        from .capture.ansi_clean import sanitize_ansi
-        from pathlib import Path
+        import codecs
+
+        from .capture.ansi_clean import AnsiSanitizer
+        from .compression import open_input, open_output
 
         raw_path = args.raw
         out_path = args.out
         try:
-            raw_text = Path(raw_path).read_text(encoding="utf-8")
+            src = open_input(raw_path)
         except Exception as e:
             print(f"[loopster] sanitize: failed to read raw log: {e}")
             return 2
-        cleaned = sanitize_ansi(raw_text)
+        # Stream it through, so a large (possibly compressed) raw log is never
+        # held in memory; raw logs hold the exact captured bytes, so tolerate
+        # invalid UTF-8
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        sanitizer = AnsiSanitizer()
+        reading = False
         try:
-            Path(out_path).write_text(cleaned, encoding="utf-8")
+            with src, open_output(out_path) as fh:
+                while True:
+                    reading = True
+                    chunk = src.read(1 << 20)
+                    reading = False
+                    fh.write(sanitizer.feed(decoder.decode(chunk, final=not chunk)).encode("utf-8"))
+                    if not chunk:
+                        break
+                fh.write(sanitizer.close().encode("utf-8"))
         except Exception as e:
-            print(f"[loopster] sanitize: failed to write cleaned log: {e}")
+            what = "read raw log" if reading else "write cleaned log"
+            print(f"[loopster] sanitize: failed to {what}: {e}")
             return 2
         print(f"[loopster] sanitized → {out_path}")
         return 0
+    if args.command == "timeline":
+        from pathlib import Path
+        from .capture.timeline import Timeline
+
+        try:
+            timeline = Timeline(args.input)
+        except Exception as e:
+            print(f"[loopster] timeline: failed to read {args.input}: {e}")
+            return 2
+        with timeline:
+            if args.out:
+                try:
+                    Path(args.out).write_text(timeline.sanitize(args.start, args.end), encoding="utf-8")
+                except Exception as e:
+                    print(f"[loopster] timeline: failed to write cleaned log: {e}")
+                    return 2
+                print(f"[loopster] sanitized → {args.out}")
+            if args.replay:
+                try:
+                    timeline.replay(speed=args.speed, max_idle=args.max_idle, start=args.start, end=args.end)
+                except KeyboardInterrupt:
+                    pass
+            if not args.out and not args.replay:
+                count = size = 0
+                first = last = 0.0
+                for t, chunk in timeline.events(args.start, args.end):
+                    if not count:
+                        first = t
+                    count += 1
+                    size += len(chunk)
+                    last = t
+                print(f"[loopster] {args.input}: {count} chunks, {size} bytes over {last - first:.3f}s")
+        return 0
 
     parser.print_help()
     return 2
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import bz2
+import gzip
+import io
+import lzma
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+
+# Output codec is chosen by file extension; inputs by extension too, else by magic bytes.
+SUFFIXES = {
+    ".gz": "gzip",
+    ".xz": "xz",
+    ".lzma": "xz",
+    ".bz2": "bz2",
+    ".zst": "zstd",
+}
+
+_MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"BZh", "bz2"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+)
+
+
+def codec_for(path: str | Path) -> str | None:
+    """Codec implied by the extension of `path` ("gzip", "xz", "bz2", "zstd"), or None."""
+    return SUFFIXES.get(Path(path).suffix.lower())
+
+
+def _zstd_open() -> Callable[..., BinaryIO]:
+    try:
+        from compression import zstd  # type: ignore[import-not-found]  # Python 3.14+
+
+        return zstd.open
+    except ImportError:
+        pass
+    try:
+        import zstandard  # type: ignore[import-not-found]
+
+        return zstandard.open
+    except ImportError:
+        raise RuntimeError(".zst files need Python 3.14+ or the 'zstandard' package") from None
+
+
+def _open(path: Path, codec: str | None, mode: str) -> BinaryIO:
+    if codec == "gzip":
+        return gzip.open(path, mode)
+    if codec == "xz":
+        return lzma.open(path, mode)
+    if codec == "bz2":
+        return bz2.open(path, mode)
+    if codec == "zstd":
+        return _zstd_open()(path, mode)
+    return path.open(mode)
+
+
+def compress_writer(fh: BinaryIO, codec: str) -> BinaryIO:
+    """
+    Wrap an open binary file so writes are compressed with `codec`.
+
+    Closing the wrapper finishes the stream but leaves `fh` open (so callers
+    can still fsync it). Codecs buffer internally; ``flush()`` pushes out what
+    it can (gzip emits a sync point).
+    """
+    if codec == "gzip":
+        # Level 6 keeps up with fast producers while still shrinking TUI redraws a lot
+        return gzip.GzipFile(fileobj=fh, mode="wb", compresslevel=6)  # type: ignore[return-value]
+    if codec == "xz":
+        return lzma.LZMAFile(fh, "wb")  # type: ignore[return-value]
+    if codec == "bz2":
+        return bz2.BZ2File(fh, "wb")  # type: ignore[return-value]
+    if codec == "zstd":
+        return _zstd_open()(fh, "wb")
+    raise ValueError(f"unknown codec: {codec!r}")
+
+
+def open_output(path: str | Path, append: bool = False) -> BinaryIO:
+    """
+    Open `path` for binary writing, compressing on the fly if its extension asks for it.
+
+    With `append`, compressed files get another compressed stream appended,
+    which every supported codec decompresses as one continuous file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    mode = "ab" if append else "wb"
+    codec = codec_for(path)
+    if codec is None:
+        return path.open(mode)
+    return _open(path, codec, mode)
+
+
+def sniff_codec(path: str | Path) -> str | None:
+    """
+    Codec of an existing file (None if uncompressed).
+
+    A compression extension decides, as it did when the file was written (so
+    an empty or just-created ``.gz`` is still gzip); other files are checked
+    for the codecs' leading magic bytes.
+    """
+    codec = codec_for(path)
+    if codec is not None:
+        return codec
+    with Path(path).open("rb") as fh:
+        head = fh.read(6)
+    for magic, codec in _MAGIC:
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def open_input(path: str | Path) -> BinaryIO:
+    """Open `path` for binary reading, decompressing transparently as it is read."""
+    path = Path(path)
+    return _open(path, sniff_codec(path), "rb")
+
+
+def read_text(path: str | Path, encoding: str | None = "utf-8", errors: str = "strict") -> str:
+    """Like ``Path.read_text`` but also reads gzip/xz/bz2/zstd files, decompressing in memory."""
+    with open_input(path) as fh:
+        with io.TextIOWrapper(fh, encoding=encoding, errors=errors) as text:
+            return text.read()
+
+
+def read_bytes(path: str | Path) -> bytes:
+    """Like ``Path.read_bytes`` but also reads compressed files."""
+    with open_input(path) as fh:
+        return fh.read()
+
+
+__all__ = [
+    "SUFFIXES",
+    "codec_for",
+    "compress_writer",
+    "open_input",
+    "open_output",
+    "read_bytes",
+    "read_text",
+    "sniff_codec",
+]
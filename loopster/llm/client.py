@@ -8,6 +8,7 @@ from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 
+from ..compression import read_text
 from .model_factory import get_chat_model, get_chat_model_for_model_name
 
 
@@ -53,7 +54,7 @@ class LLMClient:
     def _read_files(files: Iterable[Path]) -> Sequence[tuple[str, str]]:
         out = []
         for p in files:
-            text = Path(p).read_text()
+            text = read_text(p, encoding=None)
             out.append((str(p), text))
         return out
 
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import os
+import sys
+
+from loopster.capture.async_capture import capture_command_async
+from loopster.capture.loop import MIN_READ_SIZE, AdaptiveReader
+from loopster.capture.pipe_capture import capture_command
+from loopster.capture.stats import CaptureStats
+from loopster.capture.zerocopy import can_zero_copy
+from loopster.cli import main
+
+
+def test_reader_grows_while_pipe_stays_full():
+    r, w = os.pipe()
+    try:
+        os.write(w, b"x" * 60000)
+        stats = CaptureStats()
+        reader = AdaptiveReader(r, stats=stats)
+        sizes = []
+        total = 0
+        while total < 60000:
+            chunk = reader.read()
+            sizes.append(len(chunk))
+            total += len(chunk)
+        assert sizes[0] == MIN_READ_SIZE
+        assert max(sizes) > MIN_READ_SIZE
+        assert stats.bytes_read == 60000
+        assert stats.read_calls == len(sizes)
+    finally:
+        os.close(r)
+        os.close(w)
+
+
+def test_capture_records_bytes_per_read(tmp_path):
+    stats = CaptureStats()
+    cmd = f"{sys.executable} -c \"import sys; sys.stdout.write('y' * 2000000)\""
+    code = capture_command(cmd, str(tmp_path / "s.log"), mirror_to_stdout=False, stats=stats)
+    assert code == 0
+    assert stats.bytes_read >= 2000000
+    assert stats.bytes_per_read > MIN_READ_SIZE
+
+
+def test_cli_capture_writes_stats_json(tmp_path, capsys):
+    stats_path = tmp_path / "stats.json"
+    code = main([
+        "capture", "--cmd", "echo hi", "--out", str(tmp_path / "s.log"), "--no-mirror", "--stats", str(stats_path)
+    ])
+    assert code == 0
+    data = json.loads(stats_path.read_text())
+    assert data["bytes_read"] >= 3
+    assert data["read_calls"] >= 1
+    assert "bytes_per_read" in data
+
+
+def test_engines_agree_on_read_counts(tmp_path):
+    def run(capture, **kwargs):
+        stats = CaptureStats()
+        log = str(tmp_path / "s.log")
+        code = capture("printf abcd", log, mirror_to_stdout=False, shell="non-login", stats=stats, **kwargs)
+        assert code == 0
+        return stats.bytes_read, stats.read_calls, stats.bytes_per_read, stats.max_read_size
+
+    expected = (4, 1, 4.0, 4)
+    assert run(capture_command) == expected
+    assert run(lambda *a, **kw: asyncio.run(capture_command_async(*a, **kw))) == expected
+    raw = str(tmp_path / "s.raw")
+    if can_zero_copy(raw, False):
+        assert run(capture_command, zero_copy=True, raw_output_path=raw) == expected
@@ -0,0 +1,95 @@
+from pathlib import Path
+
+from loopster.capture.ansi_clean import AnsiSanitizer, sanitize_ansi
+from loopster.capture.sinks import CleanLogSink
+
+
+def feed_in_pieces(text: str, size: int) -> str:
+    s = AnsiSanitizer()
+    out = [s.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    out.append(s.close())
+    return "".join(out)
+
+
+def test_streaming_matches_whole_text_on_codex_sample():
+    root = Path(__file__).resolve().parents[2]
+    raw = (root / "codex_raw.txt").read_text(encoding="utf-8")
+    expected = sanitize_ansi(raw)
+    for size in (1, 7, 4096):
+        assert feed_in_pieces(raw, size) == expected
+
+
+def test_escape_split_across_feeds_is_held_back():
+    s = AnsiSanitizer()
+    assert s.feed("Hello\x1b[3") == ""
+    assert s.feed("2mWorld\n") == "HelloWorld\n"
+    assert s.close() == ""
+
+
+def test_finalized_lines_are_returned_before_close():
+    s = AnsiSanitizer()
+    assert s.feed("\x1b[1mone\ntw") == "one\n"
+    assert s.feed("o\r") == ""
+    assert s.close() == "two"
+
+
+def test_clean_sink_handles_multibyte_split_and_header(tmp_path):
+    out = tmp_path / "clean.log"
+    sink = CleanLogSink(out, header="[loopster] header")
+    data = "café \x1b[32mok\x1b[0m\n".encode("utf-8")
+    cut = data.index(b"\xc3") + 1  # split inside the two-byte sequence
+    sink.write(data[:cut])
+    sink.write(data[cut:])
+    # The finished line is on disk before the sink is closed
+    assert out.read_text(encoding="utf-8") == "[loopster] header\ncafé ok\n"
+    sink.close()
+    assert out.read_text(encoding="utf-8") == "[loopster] header\ncafé ok\n"
+
+
+def test_unterminated_osc_is_given_up_after_a_bound():
+    s = AnsiSanitizer()
+    out = [s.feed("start\n\x1b]0;title")]
+    out += [s.feed(f"line {n}\n") for n in range(4000)]
+    assert len(s._pending) < 5000
+    out.append(s.close())
+    text = "".join(out)
+    # The stray ESC is dropped and the log keeps updating
+    assert text.startswith("start\n]0;titleline 0\nline 1\n")
+    assert text.endswith("line 3999\n")
+    assert text == sanitize_ansi("start\n\x1b]0;title" + "".join(f"line {n}\n" for n in range(4000)))
+    # A short split OSC still waits for its terminator
+    s = AnsiSanitizer()
+    assert s.feed("a\x1b]0;ti") == "" and s.feed("tle\x1b") == "" and s.feed("\\b\n") == "ab\n"
+
+
+def test_escape_free_text_matches_streaming(tmp_path):
+    raw = "progress 10%\rprogress 100%\ndone  \r\nstep 1\rstep 22\r"
+    assert sanitize_ansi(raw) == "progress 100%\ndone\nstep 22"
+    assert feed_in_pieces(raw, 3) == sanitize_ansi(raw)
+    clean = tmp_path / "clean.log"
+    sink = CleanLogSink(str(clean))
+    sink.write(raw.encode())
+    sink.close()
+    assert clean.read_text() == sanitize_ansi(raw)
+
+
+def test_plain_line_blocks_after_other_rows():
+    raw = "spin |\rspin /\rok  \n" + "y   \n" * 1000 + "\x1b[32mz\x1b[0m\rw\n" + "tail\n" * 3 + "last"
+    expected = "okin\n" + "y\n" * 1000 + "w\n" + "tail\n" * 3 + "last"
+    assert sanitize_ansi(raw) == expected
+    for size in (1, 5, 4096):
+        assert feed_in_pieces(raw, size) == expected
+
+
+def test_long_terminated_osc_is_stripped_whole_or_split():
+    payload = "QUJD" * 2000  # an OSC 52 clipboard write well past _OSC_MAX
+    for end in ("\x07", "\x1b\\"):
+        text = "hi\x1b]52;c;" + payload + end + "there\n"
+        assert sanitize_ansi(text) == "hithere\n"
+        for size in (1000, 4093, 4096, 8192):
+            assert feed_in_pieces(text, size) == "hithere\n"
+    # Dropped as it arrives: nothing of it is held back
+    s = AnsiSanitizer()
+    assert s.feed("a\x1b]8;;" + "x" * 10000) == ""
+    assert len(s._pending) < 5000
+    assert s.feed("y" * 10000 + "\x1b") == "" and s.feed("\\b\n") == "ab\n"
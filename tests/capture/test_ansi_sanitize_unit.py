@@ -10,3 +10,18 @@ def test_cup_upward_spaces_should_not_erase_history_unit():
     assert "Hello world" in out
     assert "Tail" in out
 
+
+
+def test_spaces_in_a_run_keep_text_they_overwrite():
+    # Only the non-space characters of "x  y" replace what the CR went back over
+    assert sanitize_ansi("\x1b[0mabcdef\rx  y\n") == "xbcy\n"
+    assert sanitize_ansi("\x1bab\x1b[2Gz") == "az"
+    # A tab pads to the next stop; a later write lands inside the padding
+    assert sanitize_ansi("\x1b[0mab\tc\x1b[5Gd\n") == "ab  d   c\n"
+
+
+def test_styling_inside_text_and_stray_escapes():
+    assert sanitize_ansi("\x1b[1mre\x1b[0md\x1b]0;title\x07y\x1b7!\n") == "redy!\n"
+    # A stray ESC is dropped on its own; what follows it is text
+    assert sanitize_ansi("\x1b\x1b[31m[x\x1bQ\n") == "[xQ\n"
+    assert sanitize_ansi("ok\x1b]0;unterminated") == "ok"
@@ -0,0 +1,161 @@
+import asyncio
+import io
+import sys
+import threading
+from pathlib import Path
+
+from loopster.capture.async_capture import capture_command_async
+from loopster.capture.stats import CaptureStats
+
+
+def test_async_capture_sanitizes_and_writes_raw(tmp_path):
+    log_path = tmp_path / "session.log"
+    raw_path = tmp_path / "session.raw"
+    cmd = "python -c \"import sys; sys.stdout.write('\\x1b[32mhello\\x1b[0m\\n')\""
+    code = asyncio.run(
+        capture_command_async(
+            cmd,
+            str(log_path),
+            mirror_to_stdout=False,
+            raw_output_path=str(raw_path),
+            prepend_header="[loopster] header",
+        )
+    )
+    assert code == 0
+    lines = Path(log_path).read_text().splitlines()
+    assert lines[0] == "[loopster] header"
+    assert "hello" in lines
+    assert b"\x1b[32mhello" in raw_path.read_bytes()
+
+
+def test_async_capture_inputs_and_exit_code(tmp_path):
+    script = tmp_path / "echo.py"
+    script.write_text("import sys\nfor line in sys.stdin:\n    print('got', line.strip())\nsys.exit(3)\n")
+    log_path = tmp_path / "session.log"
+    code = asyncio.run(
+        capture_command_async(
+            f"{sys.executable} {script}", str(log_path), inputs=["a\n", b"b\n"], mirror_to_stdout=False
+        )
+    )
+    assert code == 3
+    text = Path(log_path).read_text()
+    assert "got a" in text and "got b" in text
+
+
+def test_async_capture_timeout_returns_124(tmp_path):
+    log_path = tmp_path / "session.log"
+    code = asyncio.run(
+        capture_command_async("sleep 5", str(log_path), timeout=0.5, mirror_to_stdout=False)
+    )
+    assert code == 124
+
+
+def test_async_captures_share_one_loop_and_cancel(tmp_path):
+    async def scenario():
+        quick = [
+            capture_command_async(f"echo job{i}", str(tmp_path / f"{i}.log"), mirror_to_stdout=False)
+            for i in range(5)
+        ]
+        slow = asyncio.ensure_future(
+            capture_command_async("sleep 30", str(tmp_path / "slow.log"), mirror_to_stdout=False)
+        )
+        codes = await asyncio.gather(*quick)
+        slow.cancel()
+        try:
+            await slow
+        except asyncio.CancelledError:
+            return codes, True
+        return codes, False
+
+    codes, cancelled = asyncio.run(scenario())
+    assert codes == [0] * 5
+    assert cancelled
+    for i in range(5):
+        assert f"job{i}" in (tmp_path / f"{i}.log").read_text()
+
+
+def test_async_captures_start_no_watcher_threads(tmp_path):
+    import threading
+
+    from loopster.capture import async_capture
+
+    async def scenario():
+        jobs = [
+            capture_command_async(
+                f"sleep 0.5; echo job{i}", str(tmp_path / f"{i}.log"), mirror_to_stdout=False, shell="non-login"
+            )
+            for i in range(5)
+        ]
+        tasks = [asyncio.ensure_future(job) for job in jobs]
+        await asyncio.sleep(0.3)
+        threads = threading.active_count()
+        return await asyncio.gather(*tasks), threads
+
+    codes, threads = asyncio.run(scenario())
+    assert codes == [0] * 5
+    if async_capture._WATCH_PIDFD:
+        assert threads == threading.active_count()
+    for i in range(5):
+        assert (tmp_path / f"{i}.log").read_text() == f"job{i}\n"
+
+
+def test_async_capture_counts_only_reads_with_data(tmp_path):
+    stats = CaptureStats()
+    code = asyncio.run(
+        capture_command_async(
+            "printf abcd", str(tmp_path / "session.log"), mirror_to_stdout=False, shell="non-login", stats=stats
+        )
+    )
+    assert code == 0
+    # One chunk of output; the end-of-file read is not a read of output
+    assert (stats.bytes_read, stats.read_calls, stats.bytes_per_read) == (4, 1, 4.0)
+
+
+def test_blocked_mirror_does_not_stall_the_loop(tmp_path, monkeypatch):
+    release = threading.Event()
+    timer = threading.Timer(5, release.set)  # never hang, even if the loop is stuck
+
+    class SlowStdout:
+        def __init__(self):
+            self.buffer = self
+            self.data = io.BytesIO()
+
+        def write(self, data):
+            release.wait()
+            self.data.write(data)
+
+        def flush(self):
+            pass
+
+    slow = SlowStdout()
+    monkeypatch.setattr(sys, "stdout", slow)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tick = asyncio.ensure_future(ticker())
+        cmd = f"{sys.executable} -c \"import sys; sys.stdout.write('y' * 4000000)\""
+        capture = asyncio.ensure_future(capture_command_async(cmd, str(tmp_path / "s.log"), shell="non-login"))
+        await asyncio.sleep(1.0)
+        stuck, seen = not capture.done(), ticks
+        release.set()
+        code = await capture
+        tick.cancel()
+        return stuck, seen, code
+
+    timer.start()
+    try:
+        stuck, ticks, code = asyncio.run(main())
+    finally:
+        timer.cancel()
+    assert code == 0
+    # The capture waited for the terminal while the loop kept running
+    assert stuck and ticks > 30
+    assert (tmp_path / "s.log").stat().st_size == 4000000
+    assert len(slow.data.getvalue()) == 4000000
@@ -0,0 +1,98 @@
+import pytest
+
+from loopster.capture.pipe_capture import capture_command
+from loopster.capture.ring import RingBuffer
+from loopster.capture.sinks import CleanLogSink
+from loopster.cli import _parse_size, main
+
+
+def test_ring_buffer_keeps_latest_bytes():
+    ring = RingBuffer(8)
+    ring.write(b"abc")
+    assert ring.getvalue() == b"abc"
+    ring.write(memoryview(b"defgh"))
+    assert ring.getvalue() == b"abcdefgh"
+    ring.write(b"ij")
+    assert ring.getvalue() == b"cdefghij"
+    ring.write(b"0123456789")
+    assert ring.getvalue() == b"23456789"
+    assert ring.total == 20 and ring.dropped == 12
+
+
+def _clean(tmp_path, chunks, **kwargs):
+    path = tmp_path / "out.log"
+    sink = CleanLogSink(path, **kwargs)
+    for chunk in chunks:
+        sink.write(memoryview(chunk))
+    sink.close()
+    return path.read_text()
+
+
+LINES = [f"line {n:02}\n".encode() for n in range(20)]  # 8 bytes each
+
+
+def test_head_and_tail_with_marker(tmp_path):
+    text = _clean(tmp_path, LINES, max_bytes=24, keep=("head", "tail"))
+    assert text == (
+        "line 00\nline 01\nline 02\n"
+        "[loopster] elided 112 bytes of output\n"
+        "line 17\nline 18\nline 19\n"
+    )
+
+
+def test_head_only_and_tail_only(tmp_path):
+    assert _clean(tmp_path, LINES, max_bytes=16, keep=("head",)) == (
+        "line 00\nline 01\n[loopster] elided 144 bytes of output\n"
+    )
+    assert _clean(tmp_path, LINES, max_bytes=16, keep=("tail",)) == (
+        "[loopster] elided 144 bytes of output\nline 18\nline 19\n"
+    )
+
+
+def test_tail_only_marker_is_followed_by_the_tail_alone(tmp_path):
+    # A tail that is only the end of the last line adds no empty line
+    assert _clean(tmp_path, [b"abc\n"], max_bytes=1, keep=("tail",)) == "[loopster] elided 3 bytes of output\n"
+    assert _clean(tmp_path, [b"abc\r\n"], max_bytes=2, keep=("tail",)) == "[loopster] elided 3 bytes of output\n"
+    # Nor does a tail that starts right at a line break
+    assert _clean(tmp_path, [b"ab\nxy\n"], max_bytes=4, keep=("tail",)) == "[loopster] elided 2 bytes of output\nxy\n"
+
+
+def test_nothing_elided_when_output_fits(tmp_path):
+    # A colored line split across head and tail is cleaned as one stream
+    chunks = [b"\x1b[31mre", b"d\x1b[0m\n", b"ok\n"]
+    assert _clean(tmp_path, chunks, max_bytes=10) == "red\nok\n"
+
+
+def test_invalid_bounds(tmp_path):
+    with pytest.raises(ValueError):
+        CleanLogSink(tmp_path / "a.log", max_bytes=0)
+    with pytest.raises(ValueError):
+        CleanLogSink(tmp_path / "a.log", max_bytes=10, keep=("middle",))
+
+
+def test_capture_bounds_clean_log_but_not_raw(tmp_path):
+    log_path = tmp_path / "session.log"
+    raw_path = tmp_path / "session.raw"
+    code = capture_command(
+        "seq 1 100000",
+        str(log_path),
+        timeout=60,
+        mirror_to_stdout=False,
+        raw_output_path=str(raw_path),
+        max_bytes=1000,
+        keep=("tail",),
+    )
+    assert code == 0
+    text = log_path.read_text()
+    assert text.endswith("99999\n100000\n")
+    assert "[loopster] elided" in text
+    assert len(text) < 1100
+    assert raw_path.read_bytes().endswith(b"".join(b"%d\n" % n for n in range(1, 100001)))
+
+
+def test_cli_size_parsing():
+    assert _parse_size("4096") == 4096
+    assert _parse_size("10M") == 10 << 20
+    assert _parse_size("2kb") == 2048
+    assert main(["capture", "--cmd", "true", "--max-bytes", "0"]) == 2
+    assert main(["capture", "--cmd", "true", "--max-bytes", "1K", "--keep", "middle"]) == 2
@@ -0,0 +1,59 @@
+import os
+import threading
+import time
+
+from loopster.capture.pipe_capture import capture_command
+
+
+def test_returns_when_child_exits_even_if_pipe_stays_open(tmp_path):
+    # The background sleep inherits stdout, so EOF never arrives while it runs;
+    # the capture must end on the shell's exit instead.
+    log_path = tmp_path / "session.log"
+    start = time.monotonic()
+    code = capture_command("sleep 15 & echo hi", str(log_path), mirror_to_stdout=False)
+    assert code == 0
+    assert time.monotonic() - start < 10
+    assert "hi" in log_path.read_text()
+
+
+def test_sigchld_fallback_without_pidfd(tmp_path, monkeypatch):
+    monkeypatch.delattr(os, "pidfd_open", raising=False)
+    log_path = tmp_path / "session.log"
+    code = capture_command("echo hi; exit 3", str(log_path), mirror_to_stdout=False)
+    assert code == 3
+    assert "hi" in log_path.read_text()
+
+
+def test_poll_fallback_off_main_thread(tmp_path, monkeypatch):
+    monkeypatch.delattr(os, "pidfd_open", raising=False)
+    log_path = tmp_path / "session.log"
+    result = {}
+    worker = threading.Thread(
+        target=lambda: result.setdefault(
+            "code", capture_command("echo hi", str(log_path), timeout=30, mirror_to_stdout=False)
+        )
+    )
+    worker.start()
+    worker.join()
+    assert result["code"] == 0
+    assert "hi" in log_path.read_text()
+
+
+def test_timeout_uses_deadline_without_pidfd(tmp_path, monkeypatch):
+    monkeypatch.delattr(os, "pidfd_open", raising=False)
+    log_path = tmp_path / "session.log"
+    code = capture_command("sleep 5", str(log_path), timeout=0.5, mirror_to_stdout=False)
+    assert code == 124
+
+
+def test_timeout_applies_while_draining_after_exit(tmp_path):
+    # The shell exits at once, but its background job keeps the pipe full;
+    # draining it must still stop at the deadline
+    log_path = tmp_path / "session.log"
+    start = time.monotonic()
+    code = capture_command(
+        "yes & sleep 0.2; exit 0", str(log_path), mirror_to_stdout=False, shell="non-login", timeout=2
+    )
+    assert code == 124
+    assert time.monotonic() - start < 10
+    assert log_path.read_text().startswith("y\ny\n")
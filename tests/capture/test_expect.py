@@ -0,0 +1,159 @@
+import time
+
+import pytest
+
+from loopster.capture.ansi_clean import AnsiSanitizer
+from loopster.capture.expect import ExpectError, ExpectScript
+from loopster.capture.pipe_capture import capture_command
+from loopster.capture.pty_capture import capture_command as pty_capture_command
+
+
+SCRIPT = """\
+# answer two prompts
+timeout 10
+fail Traceback
+expect Name:
+sendline ada
+expect Colour\\?
+send blue\\n
+"""
+
+PROMPTS = "printf 'Name: '; read n; printf 'Colour? '; read c; echo \"hi $n, $c\""
+
+
+def test_parse_steps_and_escapes():
+    steps = ExpectScript.parse(SCRIPT + "send \\x41\\t\\e\\\\\n").steps
+    assert [(s.kind, s.arg) for s in steps] == [
+        ("fail", "Traceback"),
+        ("expect", "Name:"),
+        ("send", "ada\n"),
+        ("expect", "Colour\\?"),
+        ("send", "blue\n"),
+        ("send", "A\t\x1b\\"),
+    ]
+    assert steps[1].timeout == 10 and steps[1].fails == ["Traceback"] and steps[1].line == 4
+
+
+@pytest.mark.parametrize("text", ["expect (", "timeout soon", "wait x", "expect"])
+def test_parse_errors_name_the_line(text):
+    with pytest.raises(ValueError, match="line 2"):
+        ExpectScript.parse("sendline x\n" + text)
+
+
+def test_sanitizer_peek_shows_unfinished_row():
+    s = AnsiSanitizer()
+    assert s.feed("done\n\x1b[32mName: \x1b[0m") == "done\n"
+    assert s.peek() == "Name:"
+    assert s.peek() == "Name:"
+    assert s.close() == "Name:"
+
+
+def test_pipe_answers_prompts(tmp_path):
+    log = tmp_path / "out.log"
+    code = capture_command(
+        PROMPTS, str(log), mirror_to_stdout=False, shell="non-login", timeout=30, expect=ExpectScript.parse(SCRIPT)
+    )
+    assert code == 0
+    assert log.read_text() == "Name: Colour? hi ada, blue\n"
+
+
+def test_pty_answers_prompts(tmp_path):
+    log = tmp_path / "out.log"
+    code = pty_capture_command(
+        PROMPTS,
+        str(log),
+        mirror_to_stdout=False,
+        shell="non-login",
+        timeout=30,
+        forward_stdin=False,
+        expect=ExpectScript.parse(SCRIPT),
+    )
+    assert code == 0
+    # The terminal echoes what was typed
+    assert log.read_text().splitlines() == ["Name: ada", "Colour? blue", "hi ada, blue"]
+
+
+def test_timeout_stops_child_and_keeps_log(tmp_path):
+    log = tmp_path / "out.log"
+    script = ExpectScript.parse("timeout 0.5\nexpect never\nsendline x\n")
+    start = time.monotonic()
+    with pytest.raises(ExpectError, match="timed out after 0.5s waiting for /never/") as info:
+        capture_command("echo started; sleep 30", str(log), mirror_to_stdout=False, shell="non-login", expect=script)
+    assert time.monotonic() - start < 10
+    assert info.value.line == 2
+    assert log.read_text() == "started\n"
+
+
+def test_fail_pattern_aborts(tmp_path):
+    log = tmp_path / "out.log"
+    script = ExpectScript.parse("fail ^Error: (.*)\nexpect ready\nsendline go\n")
+    with pytest.raises(ExpectError, match="fail pattern /\\^Error: \\(\\.\\*\\)/ matched 'Error: disk full'"):
+        capture_command(
+            "echo 'Error: disk full'; sleep 30; echo ready",
+            str(log),
+            mirror_to_stdout=False,
+            shell="non-login",
+            timeout=20,
+            expect=script,
+        )
+    assert log.read_text() == "Error: disk full\n"
+
+
+def test_fail_pattern_after_the_last_step_still_applies(tmp_path):
+    log = tmp_path / "out.log"
+    script = ExpectScript.parse("fail Traceback\nexpect ready\nsendline go\nfail FATAL\n")
+    with pytest.raises(ExpectError, match="fail pattern /FATAL/ matched 'FATAL' \\(script line 4\\)"):
+        capture_command(
+            "echo ready; read a; echo \"got $a\"; sleep 0.3; echo FATAL; sleep 30",
+            str(log),
+            mirror_to_stdout=False,
+            shell="non-login",
+            timeout=20,
+            expect=script,
+        )
+    assert log.read_text() == "ready\ngot go\nFATAL\n"
+
+
+def test_output_ending_early_is_an_error(tmp_path):
+    log = tmp_path / "out.log"
+    with pytest.raises(ExpectError, match="output ended while waiting for /Password/"):
+        capture_command(
+            "echo bye", str(log), mirror_to_stdout=False, shell="non-login", expect=ExpectScript.parse("expect Password")
+        )
+
+
+def test_expect_rejects_other_inputs(tmp_path):
+    with pytest.raises(ValueError):
+        capture_command("true", str(tmp_path / "x.log"), inputs=["a"], expect=ExpectScript.parse("sendline y"))
+
+
+def test_cli_expect_failure_exits_1(tmp_path, capsys):
+    from loopster.cli import main
+
+    script = tmp_path / "script.exp"
+    script.write_text("timeout 0.5\nexpect Name:\nsendline ada\n")
+    log = tmp_path / "out.log"
+    args = ["capture", "--cmd", "echo nope; sleep 30", "--out", str(log), "--no-mirror", "--shell", "non-login"]
+    code = main(args + ["--expect", str(script)])
+    assert code == 1
+    assert "[loopster] expect: timed out after 0.5s waiting for /Name:/ (script line 2)" in capsys.readouterr().out
+    assert log.read_text() == "nope\n"
+    assert main(["capture", "--cmd", "true", "--out", str(log), "--expect", str(script), "--input-file", str(script)]) == 2
+
+
+def test_failure_stops_background_jobs_of_the_command(tmp_path):
+    log = tmp_path / "out.log"
+    marker = tmp_path / "alive"
+    cmd = f"(sleep 1; touch {marker}) & echo Error: boom; wait"
+    with pytest.raises(ExpectError):
+        capture_command(
+            cmd,
+            str(log),
+            mirror_to_stdout=False,
+            shell="non-login",
+            timeout=20,
+            expect=ExpectScript.parse("fail ^Error\nexpect never\n"),
+        )
+    # The subshell was stopped with the shell, so the file never appears
+    time.sleep(1.5)
+    assert not marker.exists()
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from loopster.capture import latency as latency_mod
+from loopster.capture.latency import LatencyProfile
+from loopster.capture.pipe_capture import capture_command
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(latency_mod.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_turns_bursts_and_rates(clock):
+    p = LatencyProfile(burst_gap=0.5)
+    p.begin()
+    clock[0] += 0.2
+    p.sink.write(b"\x1b[32m$ \x1b[0m")
+    clock[0] += 1.0
+    p.input(b"hel")
+    p.input(b"lo\r")
+    clock[0] += 0.1
+    p.sink.write(b"\r\n")  # echo of the submitted line
+    clock[0] += 0.9
+    p.sink.write(b"a" * 40)
+    clock[0] += 0.2
+    p.sink.write(memoryview(b"b" * 40))
+    clock[0] += 3.0
+    p.sink.write(b"c" * 20)
+    clock[0] += 1.0
+    p.end()
+
+    t0, t1 = p.turns
+    assert t0.trigger == "start" and t0.first_output_seconds == pytest.approx(0.2) and t0.tokens == 0
+    assert (t1.trigger, t1.start, t1.input_bytes) == ("input", pytest.approx(1.2), 6)
+    # The echoed newline is not the answer
+    assert t1.first_output_seconds == pytest.approx(1.0)
+    assert t1.response_seconds == pytest.approx(4.2)
+    assert t1.tokens == 25 and t1.tokens_per_second == pytest.approx(25 / 3.2)
+    assert t1.bursts == 3 and t1.max_idle_seconds == pytest.approx(3.0)
+    assert [round(b.start, 3) for b in p.bursts] == [0.2, 1.3, 2.2, 5.4]
+    assert [round(g, 3) for g in p.idle_gaps] == [1.1, 0.9, 3.0]
+
+    data = p.to_dict()
+    assert data["duration_seconds"] == pytest.approx(6.4)
+    assert data["summary"]["turns"] == 2 and data["summary"]["bursts"] == 4
+    assert data["summary"]["response_seconds_max"] == pytest.approx(4.2)
+    lines = p.banner().splitlines()
+    assert lines[0].startswith("[loopster] latency: 2 turns over 6.40s")
+    assert lines[2].startswith("[loopster]   turn 1 (input at 1.20s): first output 1.00s, response 4.20s")
+
+
+def test_prompts_before_any_answer_merge(clock):
+    p = LatencyProfile()
+    p.begin()
+    clock[0] += 1.0
+    p.sent(4)
+    clock[0] += 1.0
+    p.sent(4)
+    clock[0] += 0.5
+    p.sink.write(b"ok\n")
+    assert len(p.turns) == 1
+    assert (p.turns[0].trigger, p.turns[0].input_bytes) == ("input", 8)
+    assert p.turns[0].first_output_seconds == pytest.approx(0.5)
+
+
+def test_pipe_capture_records_turns(tmp_path):
+    p = LatencyProfile()
+    log = tmp_path / "out.log"
+    cmd = "echo ready; read a; sleep 0.3; echo \"got $a\""
+    code = capture_command(
+        cmd, str(log), inputs=["x\n"], input_delay=0.5, mirror_to_stdout=False, shell="non-login", latency=p
+    )
+    assert code == 0
+    assert log.read_text() == "ready\ngot x\n"
+    assert [t.trigger for t in p.turns] == ["start", "input"]
+    assert p.turns[1].input_bytes == 2
+    assert 0.3 <= p.turns[1].first_output_seconds < 5
+
+
+def test_cli_latency_report_and_banner(tmp_path):
+    from loopster.cli import main
+
+    log = tmp_path / "out.log"
+    report = tmp_path / "latency.json"
+    code = main(
+        ["capture", "--cmd", "echo hi", "--out", str(log), "--no-mirror", "--shell", "non-login"]
+        + ["--latency", str(report), "--latency-banner"]
+    )
+    assert code == 0
+    data = json.loads(report.read_text())
+    assert data["summary"]["turns"] == 1 and data["turns"][0]["output_bytes"] == 3
+    lines = log.read_text().splitlines()
+    assert lines[0] == "hi"
+    assert lines[1].startswith("[loopster] latency: 1 turns over ")
+    assert lines[2].startswith("[loopster]   turn 0 (start at 0.00s): first output ")
+
+
+def test_cli_latency_banner_after_unterminated_output(tmp_path):
+    from loopster.cli import main
+    from loopster.compression import read_text
+
+    log = tmp_path / "out.log.gz"
+    args = ["capture", "--cmd", "printf hi", "--out", str(log), "--no-mirror", "--shell", "non-login"]
+    assert main(args + ["--latency-banner"]) == 0
+    lines = read_text(log).splitlines()
+    assert lines[0] == "hi"
+    assert lines[1].startswith("[loopster] latency: 1 turns over ")
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from loopster.capture import live
+from loopster.capture.live import CapturedLine, iter_capture
+
+
+SCRIPT = "printf 'one\\n'; sleep 0.5; printf '\\033[31mtwo\\033[0m\\r\\nthree'"
+
+
+def test_lines_arrive_while_the_child_runs(tmp_path):
+    log_path = tmp_path / "s.log"
+    seen = []
+    with iter_capture(SCRIPT, str(log_path), shell="non-login", timeout=30) as lines:
+        for line in lines:
+            seen.append((time.monotonic() - lines.started, line))
+    assert [line.text for _, line in seen] == ["one", "two", "three"]
+    # "one" is delivered before the child sleeps, not at exit
+    assert seen[0][0] < 0.4 and seen[1][0] >= 0.5
+    assert seen[0][1].time <= seen[1][1].time
+    assert lines.returncode == 0
+    assert log_path.read_text() == "one\ntwo\nthree"
+
+
+def test_stop_terminates_the_child(tmp_path):
+    start = time.monotonic()
+    lines = iter_capture("while :; do echo ERROR; sleep 0.01; done", shell="non-login")
+    for n, line in enumerate(lines):
+        assert line == CapturedLine(line.time, "ERROR")
+        if n == 3:
+            lines.stop()
+    assert time.monotonic() - start < 5
+    assert lines.returncode not in (None, 0)
+
+
+def test_stop_kills_a_group_that_ignores_sigterm(tmp_path):
+    marker = tmp_path / "alive"
+    lines = iter_capture(f"trap '' TERM; (sleep 3; touch {marker}) & echo ready; wait", shell="non-login")
+    start = time.monotonic()
+    for line in lines:
+        assert line.text == "ready"
+        lines.stop()
+    assert time.monotonic() - start < live.STOP_GRACE + 2
+    assert lines.returncode == -9
+    time.sleep(3.5)
+    assert not marker.exists()
+
+
+def test_break_cleans_up(tmp_path):
+    lines = iter_capture("yes", shell="non-login")
+    it = iter(lines)
+    assert next(it).text == "y"
+    it.close()
+    assert lines.returncode is not None
+
+
+def test_timeout(tmp_path):
+    lines = iter_capture("echo before; sleep 30", shell="non-login", timeout=0.5)
+    assert [line.text for line in lines] == ["before"]
+    assert lines.returncode == 124
+
+
+def test_async_iteration(tmp_path):
+    async def collect():
+        lines = iter_capture("echo a; echo b", shell="non-login")
+        return [line.text async for line in lines], lines.returncode
+
+    assert asyncio.run(collect()) == (["a", "b"], 0)
@@ -0,0 +1,82 @@
+import json
+import os
+
+from loopster.capture import login_env as le
+from loopster.capture.pipe_capture import capture_command
+from loopster.cli import main
+
+
+def test_snapshot_is_reused_until_a_profile_changes(tmp_path, monkeypatch):
+    profile = tmp_path / ".profile"
+    profile.write_text("export FOO=1\n")
+    monkeypatch.setattr(le, "SYSTEM_PROFILES", ())
+    monkeypatch.setattr(le, "USER_PROFILES", (str(profile),))
+    runs = []
+
+    def fake_capture(timeout=30.0):
+        runs.append(1)
+        env = dict(os.environ, FOO=str(len(runs)), PWD="/elsewhere")
+        env.pop("LOOPSTER_TEST_GONE", None)
+        return env
+
+    monkeypatch.setattr(le, "capture_login_env", fake_capture)
+    monkeypatch.setenv("LOOPSTER_TEST_GONE", "x")
+    cache = tmp_path / "cache.json"
+
+    env, hit = le.login_env(base={"KEEP": "1", "LOOPSTER_TEST_GONE": "x"}, cache_path=cache)
+    assert not hit and env == {"KEEP": "1", "FOO": "1"}
+    assert cache.stat().st_mode & 0o777 == 0o600
+    assert json.loads(cache.read_text())["unset"] == ["LOOPSTER_TEST_GONE"]
+
+    env, hit = le.login_env(base={}, cache_path=cache)
+    assert hit and env == {"FOO": "1"} and len(runs) == 1
+
+    profile.write_text("export FOO=2\n")
+    env, hit = le.login_env(base={}, cache_path=cache)
+    assert not hit and env == {"FOO": "2"}
+
+    env, hit = le.login_env(base={}, cache_path=cache, refresh=True)
+    assert not hit and len(runs) == 3
+
+
+def test_snapshot_is_retaken_when_path_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(le, "SYSTEM_PROFILES", ())
+    monkeypatch.setattr(le, "USER_PROFILES", ())
+
+    def fake_capture(timeout=30.0):
+        return dict(os.environ, PATH="/login:" + os.environ["PATH"])
+
+    monkeypatch.setattr(le, "capture_login_env", fake_capture)
+    cache = tmp_path / "cache.json"
+    monkeypatch.setenv("PATH", "/usr/bin:/bin")
+    env, hit = le.login_env(cache_path=cache)
+    assert not hit and env["PATH"] == "/login:/usr/bin:/bin"
+    assert le.login_env(cache_path=cache) == (env, True)
+    # e.g. a virtualenv was activated: its PATH is not replaced by the old snapshot
+    monkeypatch.setenv("PATH", "/venv/bin:/usr/bin:/bin")
+    env, hit = le.login_env(cache_path=cache)
+    assert not hit and env["PATH"] == "/login:/venv/bin:/usr/bin:/bin"
+
+
+def test_capture_with_cached_login_env(tmp_path):
+    cache = tmp_path / "cache.json"
+    env, _ = le.login_env(cache_path=cache)
+    assert "PATH" in env
+    log_path = tmp_path / "s.log"
+    # A non-login shell with the snapshot sees the login PATH, without the profile's output
+    code = capture_command(
+        'printf "%s\\n" "$PATH"', str(log_path), timeout=30, mirror_to_stdout=False, shell="non-login", env=env
+    )
+    assert code == 0
+    assert log_path.read_text() == env["PATH"] + "\n"
+
+
+def test_cli_cached_login(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    argv = ["capture", "--cmd", "echo hi", "--shell", "cached-login", "--out", str(tmp_path / "s.log"), "--no-mirror"]
+    assert main(argv) == 0
+    assert "login environment snapshot saved" in capsys.readouterr().out
+    assert (tmp_path / "cache" / "loopster" / "login-env.json").exists()
+    assert main(argv) == 0
+    assert "snapshot saved" not in capsys.readouterr().out
+    assert (tmp_path / "s.log").read_text() == "hi\n"
@@ -0,0 +1,19 @@
+from loopster.capture.pipe_capture import capture_command
+
+
+def test_raw_log_keeps_exact_bytes(tmp_path):
+    # Invalid UTF-8 and escapes must reach the raw log byte-for-byte
+    payload = b"\x1b[31mred\x1b[0m \xff\xfe\n"
+    cmd = f"python -c \"import sys; sys.stdout.buffer.write({payload!r})\""
+    log_path = tmp_path / "session.log"
+    raw_path = tmp_path / "session.raw"
+    code = capture_command(
+        cmd,
+        str(log_path),
+        mirror_to_stdout=False,
+        raw_output_path=str(raw_path),
+        raw_fsync_interval=0,
+    )
+    assert code == 0
+    assert raw_path.read_bytes().endswith(payload)
+    assert "red" in log_path.read_text(encoding="utf-8")
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from loopster.capture.pipe_capture import capture_command
+from loopster.capture.pty_capture import capture_command as pty_capture_command
+from loopster.capture.sinks import ThreadedSink
+from loopster.capture.stats import CaptureStats, StageStats
+
+
+class SlowSink:
+    def __init__(self, delay=0.0, fail=False):
+        self.data = bytearray()
+        self.writes = 0
+        self.closed = False
+        self.delay = delay
+        self.fail = fail
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, chunk):
+        if self.fail:
+            raise OSError("disk full")
+        self.entered.set()
+        self.release.wait(5)
+        time.sleep(self.delay)
+        self.data += chunk
+        self.writes += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_threaded_sink_keeps_order_and_bounds_the_queue():
+    inner = SlowSink()
+    stage = StageStats()
+    sink = ThreadedSink(inner, max_backlog=10, stage=stage)
+    buf = bytearray(b"abcd")
+    sink.write(memoryview(buf))
+    buf[:] = b"zzzz"  # the engine reuses its buffer; the sink must have copied
+    assert inner.entered.wait(5)  # the stage is now busy with the first chunk
+    sink.write(b"efgh")
+    threading.Timer(0.2, inner.release.set).start()
+    sink.write(b"ijklmnop")  # over the limit: waits for the stage to drain
+    sink.close()
+    assert bytes(inner.data) == b"abcdefghijklmnop"
+    assert inner.closed
+    assert stage.chunks == 3 and stage.bytes == 16
+    assert stage.max_backlog == 8 and stage.batches == 3
+    assert stage.blocked_seconds > 0.1
+    assert stage.batches == inner.writes
+
+
+def test_threaded_sink_raises_stage_errors_on_close():
+    inner = SlowSink(fail=True)
+    sink = ThreadedSink(inner)
+    sink.write(b"x")
+    sink.write(b"y")
+    with pytest.raises(OSError, match="disk full"):
+        sink.close()
+    assert inner.closed
+
+
+SCRIPT = "for i in $(seq 1 3000); do printf '\\033[2K\\rline %d\\n' $i; done"
+
+
+@pytest.mark.parametrize("capture", [capture_command, pty_capture_command])
+def test_pipeline_capture_matches_serial(tmp_path, capture):
+    outputs = []
+    for pipeline in (False, True):
+        stats = CaptureStats()
+        log_path = tmp_path / f"{pipeline}.log"
+        raw_path = tmp_path / f"{pipeline}.raw"
+        kwargs = {"forward_stdin": False} if capture is pty_capture_command else {}
+        code = capture(
+            SCRIPT,
+            str(log_path),
+            timeout=60,
+            mirror_to_stdout=False,
+            raw_output_path=str(raw_path),
+            shell="non-login",
+            stats=stats,
+            pipeline=pipeline,
+            **kwargs,
+        )
+        assert code == 0
+        outputs.append(log_path.read_text())
+        if pipeline:
+            assert set(stats.stages) == {"raw", "clean"}
+            assert stats.stages["clean"].bytes == stats.bytes_read == raw_path.stat().st_size
+            assert stats.to_dict()["stages"]["clean"]["mb_per_s"] > 0
+        else:
+            assert stats.stages == {}
+    assert outputs[0] == outputs[1]
+    assert outputs[1].endswith("line 3000\n")
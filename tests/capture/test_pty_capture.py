@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+from loopster.capture.pty_capture import capture_command
+from loopster.cli import main
+
+
+def test_pty_child_sees_terminal_of_requested_size(tmp_path):
+    log_path = tmp_path / "session.log"
+    cmd = (
+        f"{sys.executable} -c \"import os, sys; "
+        "print('tty', sys.stdout.isatty(), os.get_terminal_size().lines, os.get_terminal_size().columns)\""
+    )
+    code = capture_command(cmd, str(log_path), mirror_to_stdout=False, size=(33, 101))
+    assert code == 0
+    assert "tty True 33 101" in Path(log_path).read_text()
+
+
+def test_pty_scripted_inputs(tmp_path):
+    script = tmp_path / "ask.py"
+    script.write_text("name = input('name? ')\nprint(f'hi {name}')\n")
+    log_path = tmp_path / "session.log"
+    code = capture_command(
+        f"{sys.executable} {script}", str(log_path), inputs=["bob\n"], mirror_to_stdout=False
+    )
+    assert code == 0
+    assert "hi bob" in Path(log_path).read_text()
+
+
+def test_pty_timeout_returns_124(tmp_path):
+    log_path = tmp_path / "session.log"
+    code = capture_command("sleep 5", str(log_path), timeout=0.5, mirror_to_stdout=False)
+    assert code == 124
+
+
+def test_cli_capture_engine_pty(tmp_path, capsys):
+    out_path = tmp_path / "cap.log"
+    code = main([
+        "capture",
+        "--cmd",
+        f"{sys.executable} -c \"import sys; print(sys.stdout.isatty())\"",
+        "--out",
+        str(out_path),
+        "--no-mirror",
+        "--engine",
+        "pty",
+        "--pty-size",
+        "24x80",
+    ])
+    assert code == 0
+    assert "True" in out_path.read_text()
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+from loopster.capture.async_capture import capture_command_async
+from loopster.capture.pipe_capture import capture_command
+from loopster.capture.pty_capture import capture_command as pty_capture_command
+from loopster.capture.stats import ResourceUsage
+from loopster.cli import main
+
+
+# Burn a little CPU in the child and hold ~50 MB so max RSS stands out
+BUSY = "python3 -c 'b = bytearray(50 * 1024 * 1024); sum(range(3_000_000)); print(\"done\")'"
+
+
+def _check_child(usage: ResourceUsage) -> None:
+    assert usage.user_seconds + usage.sys_seconds > 0.05
+    assert usage.max_rss_kb > 40 * 1024
+    assert usage.wall_seconds >= usage.user_seconds * 0.5
+    assert usage.voluntary_switches + usage.involuntary_switches > 0
+    assert usage.loop_user_seconds + usage.loop_sys_seconds >= 0
+
+
+def test_pipe_engine_records_child_usage(tmp_path):
+    usage = ResourceUsage()
+    code = capture_command(BUSY, str(tmp_path / "s.log"), timeout=60, mirror_to_stdout=False, usage=usage)
+    assert code == 0
+    assert usage.source == "wait4"
+    _check_child(usage)
+
+
+def test_pty_engine_records_child_usage(tmp_path):
+    usage = ResourceUsage()
+    code = pty_capture_command(
+        BUSY, str(tmp_path / "s.log"), timeout=60, mirror_to_stdout=False, forward_stdin=False, usage=usage
+    )
+    assert code == 0
+    assert usage.source == "wait4"
+    _check_child(usage)
+
+
+def test_async_engine_falls_back_to_children_totals(tmp_path):
+    usage = ResourceUsage()
+    code = asyncio.run(
+        capture_command_async(BUSY, str(tmp_path / "s.log"), timeout=60, mirror_to_stdout=False, usage=usage)
+    )
+    assert code == 0
+    assert usage.source == "rusage_children"
+    assert usage.user_seconds + usage.sys_seconds > 0.05
+
+
+def test_cli_usage_sidecar_and_banner(tmp_path):
+    log_path = tmp_path / "s.log"
+    usage_path = tmp_path / "usage.json"
+    code = main(
+        [
+            "capture",
+            "--cmd",
+            "echo hi",
+            "--out",
+            str(log_path),
+            "--no-mirror",
+            "--usage",
+            str(usage_path),
+            "--usage-banner",
+        ]
+    )
+    assert code == 0
+    data = json.loads(usage_path.read_text())
+    assert {"wall_seconds", "user_seconds", "sys_seconds", "max_rss_kb", "loop_user_seconds"} <= set(data)
+    lines = log_path.read_text().splitlines()
+    assert lines[-2] == "hi"
+    assert lines[-1].startswith("[loopster] usage: wall ")
+
+
+def test_cli_usage_banner_after_unterminated_output(tmp_path):
+    log_path = tmp_path / "s.log"
+    args = ["capture", "--cmd", "printf hi", "--out", str(log_path), "--no-mirror", "--shell", "non-login"]
+    assert main(args + ["--usage-banner"]) == 0
+    lines = log_path.read_text().splitlines()
+    assert lines[0] == "hi"
+    assert lines[1].startswith("[loopster] usage: wall ")
@@ -0,0 +1,103 @@
+import pytest
+
+import asyncio
+
+from loopster.capture import pipe_capture
+from loopster.capture.async_capture import capture_command_async
+from loopster.capture.pipe_capture import capture_command
+from loopster.capture.pty_capture import capture_command as pty_capture_command
+from loopster.capture.shell import SpawnError, command_argv
+from loopster.capture.stats import CaptureStats
+from loopster.cli import main
+
+
+def test_command_argv():
+    assert command_argv("echo hi") == ["bash", "-lc", "echo hi"]
+    assert command_argv("echo hi", "non-login") == ["bash", "-c", "echo hi"]
+    assert command_argv("printf '%s\\n' 'a b'", "exec") == ["printf", "%s\\n", "a b"]
+    with pytest.raises(ValueError):
+        command_argv("   ", "exec")
+    with pytest.raises(ValueError):
+        command_argv("true", "zsh")
+
+
+@pytest.mark.parametrize("shell", ["non-login", "exec"])
+def test_modes_skip_login_profile(tmp_path, shell):
+    log_path = tmp_path / "s.log"
+    stats = CaptureStats()
+    code = capture_command(
+        "printf '%s\\n' 'a b'", str(log_path), timeout=30, mirror_to_stdout=False, stats=stats, shell=shell
+    )
+    assert code == 0
+    # No login profile, so nothing ahead of the command's own output
+    assert log_path.read_text() == "a b\n"
+    assert stats.shell == shell
+    assert stats.spawn_seconds > 0
+    assert stats.first_output_seconds is not None and stats.first_output_seconds >= stats.spawn_seconds
+
+
+def test_exec_mode_under_pty(tmp_path):
+    log_path = tmp_path / "s.log"
+    code = pty_capture_command(
+        "echo direct", str(log_path), timeout=30, mirror_to_stdout=False, forward_stdin=False, shell="exec"
+    )
+    assert code == 0
+    assert log_path.read_text() == "direct\n"
+
+
+def test_no_output_leaves_first_output_unset(tmp_path):
+    stats = CaptureStats()
+    code = capture_command("true", str(tmp_path / "s.log"), timeout=30, mirror_to_stdout=False, stats=stats, shell="exec")
+    assert code == 0
+    assert stats.first_output_seconds is None
+
+
+def test_cli_exec_unknown_program(tmp_path, capsys):
+    code = main(["capture", "--cmd", "no-such-program-xyz", "--exec", "--out", str(tmp_path / "s.log"), "--no-mirror"])
+    assert code == 127
+    assert "cannot execute 'no-such-program-xyz'" in capsys.readouterr().out
+    assert main(["capture", "--cmd", "echo 'unclosed", "--exec", "--out", str(tmp_path / "s.log")]) == 127
+
+
+@pytest.mark.parametrize(
+    "capture",
+    [
+        capture_command,
+        lambda *a, **kw: pty_capture_command(*a, forward_stdin=False, **kw),
+        lambda *a, **kw: asyncio.run(capture_command_async(*a, **kw)),
+    ],
+)
+def test_engines_raise_spawn_error(tmp_path, capture):
+    with pytest.raises(SpawnError, match="cannot execute 'no-such-program-xyz'") as info:
+        capture("no-such-program-xyz --flag", str(tmp_path / "s.log"), mirror_to_stdout=False, shell="exec")
+    assert isinstance(info.value.__cause__, FileNotFoundError)
+
+
+def test_cli_exec_does_not_hide_other_errors(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise PermissionError(13, "log directory is read-only")
+
+    monkeypatch.setattr(pipe_capture, "open_sinks", fail)
+    with pytest.raises(PermissionError, match="read-only"):
+        main(["capture", "--cmd", "true", "--exec", "--out", str(tmp_path / "s.log"), "--no-mirror"])
+
+
+def test_cli_reports_startup(tmp_path, capsys):
+    code = main(
+        [
+            "capture",
+            "--cmd",
+            "echo hi",
+            "--shell",
+            "non-login",
+            "--out",
+            str(tmp_path / "s.log"),
+            "--no-mirror",
+            "--stats",
+            str(tmp_path / "stats.json"),
+        ]
+    )
+    assert code == 0
+    out = capsys.readouterr().out
+    assert "[loopster] startup (non-login shell): spawn " in out
+    assert "first output after" in out
@@ -0,0 +1,95 @@
+import os
+import time
+
+import pytest
+
+from loopster.capture.manifest import CaptureJob, run_jobs_in_worker
+from loopster.capture.stats import CaptureStats
+from loopster.capture.worker import ShellWorker, WorkerDied
+from loopster.cli import main
+
+
+def test_worker_runs_commands_with_their_own_logs_and_codes(tmp_path):
+    with ShellWorker(shell="non-login") as worker:
+        for i in range(20):
+            code = worker.run(f"echo out {i}; echo err >&2; exit {i % 3}", str(tmp_path / f"{i}.log"))
+            assert code == i % 3
+        assert worker.starts == 1 and worker.commands == 20
+    assert (tmp_path / "7.log").read_text() == "out 7\nerr\n"
+
+
+def test_worker_framing_and_isolation(tmp_path):
+    stats = CaptureStats()
+    with ShellWorker(shell="non-login") as worker:
+        # No trailing newline: the sentinel still ends the output exactly
+        assert worker.run("printf 'partial'", str(tmp_path / "a.log"), stats=stats) == 0
+        assert (tmp_path / "a.log").read_text() == "partial"
+        assert stats.bytes_read > 0 and stats.first_output_seconds is not None
+        # cd and variables stay inside the command's subshell
+        assert worker.run("cd /; export LOOPSTER_TEST_X=1", str(tmp_path / "b.log")) == 0
+        assert worker.run('pwd; echo "x=$LOOPSTER_TEST_X"', str(tmp_path / "c.log")) == 0
+        assert (tmp_path / "c.log").read_text() == f"{os.getcwd()}\nx=\n"
+        assert worker.run("if then", str(tmp_path / "d.log")) == 2
+        assert "syntax error" in (tmp_path / "d.log").read_text()
+        # stdin is /dev/null unless a file is given
+        assert worker.run("cat", str(tmp_path / "e.log")) == 0
+        stdin = tmp_path / "in.txt"
+        stdin.write_text("fed\n")
+        assert worker.run("cat", str(tmp_path / "f.log"), stdin_path=str(stdin)) == 0
+        assert (tmp_path / "f.log").read_text() == "fed\n"
+
+
+def test_worker_timeout_restarts_the_shell(tmp_path):
+    with ShellWorker(shell="non-login") as worker:
+        assert worker.run("echo before; sleep 30", str(tmp_path / "t.log"), timeout=0.3) == 124
+        assert (tmp_path / "t.log").read_text() == "before\n"
+        assert not worker.alive
+        assert worker.run("echo after", str(tmp_path / "u.log")) == 0
+        assert worker.starts == 2
+
+
+def test_worker_kills_background_jobs_left_by_a_command(tmp_path):
+    marker = tmp_path / "alive"
+    with ShellWorker(shell="non-login") as worker:
+        assert worker.run("echo first; (sleep 0.3; echo LEAK) &", str(tmp_path / "a.log")) == 0
+        assert worker.run("sleep 0.5; echo second", str(tmp_path / "b.log")) == 0
+        assert (tmp_path / "a.log").read_text() == "first\n"
+        assert (tmp_path / "b.log").read_text() == "second\n"
+        # A timed-out command's jobs go too, not only the worker
+        assert worker.run(f"(sleep 0.5; touch {marker}) & sleep 30", str(tmp_path / "c.log"), timeout=0.2) == 124
+    time.sleep(0.8)
+    assert not marker.exists()
+
+
+def test_worker_died(tmp_path):
+    with ShellWorker(shell="non-login") as worker:
+        with pytest.raises(WorkerDied):
+            worker.run("kill -9 $$", str(tmp_path / "k.log"))
+        assert worker.run("echo back", str(tmp_path / "l.log")) == 0
+
+
+def test_login_worker_keeps_profile_output_out_of_logs(tmp_path):
+    jobs = [CaptureJob(cmd="echo one", log=str(tmp_path / "one.log")), CaptureJob(cmd="cat", log=str(tmp_path / "two.log"), inputs=["two\n"])]
+    codes = run_jobs_in_worker(jobs, header=lambda job: f"[loopster] capturing: {job.cmd}\n")
+    assert codes == [0, 0]
+    assert (tmp_path / "one.log").read_text() == "[loopster] capturing: echo one\none\n"
+    assert (tmp_path / "two.log").read_text() == "[loopster] capturing: cat\ntwo\n"
+
+
+def test_cli_manifest_worker(tmp_path, capsys):
+    manifest = tmp_path / "jobs.toml"
+    manifest.write_text(
+        f"""
+[[job]]
+cmd = "echo one"
+log = "{tmp_path / 'one.log'}"
+
+[[job]]
+cmd = "echo two; exit 3"
+log = "{tmp_path / 'two.log'}"
+"""
+    )
+    code = main(["capture", "--manifest", str(manifest), "--worker", "--shell", "non-login", "--include-invocation"])
+    assert code == 3
+    assert "finished 2 jobs, 1 failed" in capsys.readouterr().out
+    assert (tmp_path / "two.log").read_text().endswith("[loopster] log: " + str(tmp_path / "two.log") + "\ntwo\n")
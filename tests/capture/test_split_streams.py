@@ -0,0 +1,110 @@
+import pytest
+
+from loopster.capture.pipe_capture import capture_command
+from loopster.capture.sinks import CleanLogSink, ThreadedSink, channel_of
+from loopster.capture.streams import STDERR, STDOUT, StreamIndex, StreamIndexWriter
+from loopster.cli import main
+
+
+SCRIPT = (
+    "printf 'out 1\\n'; sleep 0.2; printf 'err 1\\n' >&2; sleep 0.2; "
+    "printf 'out 2\\n'; sleep 0.2; printf 'err 2\\n' >&2"
+)
+
+
+def test_stderr_split_and_index(tmp_path):
+    log_path = tmp_path / "session.log"
+    err_path = tmp_path / "session.err.log"
+    raw_path = tmp_path / "session.raw"
+    index_path = tmp_path / "session.streams"
+    code = capture_command(
+        SCRIPT,
+        str(log_path),
+        timeout=30,
+        mirror_to_stdout=False,
+        raw_output_path=str(raw_path),
+        stderr_output_path=str(err_path),
+        stream_index_path=str(index_path),
+    )
+    assert code == 0
+    # The main log keeps the merged view; the stderr log has only errors
+    assert log_path.read_text().endswith("out 1\nerr 1\nout 2\nerr 2\n")
+    assert err_path.read_text().endswith("err 1\nerr 2\n")
+    assert "out" not in err_path.read_text()
+
+    index = StreamIndex(index_path)
+    raw = raw_path.read_bytes()
+    streams = index.split(raw)
+    assert streams[STDOUT].endswith(b"out 1\nout 2\n")
+    assert streams[STDERR].endswith(b"err 1\nerr 2\n")
+    assert index.merge(streams) == raw
+    assert sum(index.totals().values()) == len(raw)
+    windows = index.windows(STDERR, gap=0.1)
+    assert [w[2] for w in windows][-2:] == [6, 6]
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_streams_are_cleaned_apart_before_merging(tmp_path, threaded):
+    log = CleanLogSink(tmp_path / "merged.log")
+    sink = ThreadedSink(log) if threaded else log
+    out, err = sink, channel_of(sink, STDERR)
+    # stdout's "é" and color escape are cut by stderr output in between
+    out.write(b"caf\xc3")
+    err.write(b"warn\n")
+    out.write(b"\xa9 \x1b[3")
+    err.write(b"\x1b[1mE\x1b")
+    out.write(b"2mok\x1b[0m\n")
+    err.write(b"[0mrror")
+    sink.close()
+    assert (tmp_path / "merged.log").read_text(encoding="utf-8") == "warn\ncafé ok\nError"
+
+
+@pytest.mark.parametrize("pipeline", [False, True])
+def test_split_capture_keeps_characters_cut_by_the_other_stream(tmp_path, pipeline):
+    log_path = tmp_path / "session.log"
+    code = capture_command(
+        "printf 'caf\\303'; sleep 0.2; echo oops >&2; sleep 0.2; printf '\\251\\n'",
+        str(log_path),
+        timeout=30,
+        mirror_to_stdout=False,
+        shell="non-login",
+        stderr_output_path=str(tmp_path / "err.log"),
+        pipeline=pipeline,
+    )
+    assert code == 0
+    assert log_path.read_text(encoding="utf-8") == "oops\ncafé\n"
+
+
+def test_late_stderr_is_not_lost(tmp_path):
+    # stdout closes first; the loop keeps reading stderr until it ends too
+    err_path = tmp_path / "err.log"
+    code = capture_command(
+        "exec 1>&-; sleep 0.3; echo late >&2",
+        str(tmp_path / "session.log"),
+        timeout=30,
+        mirror_to_stdout=False,
+        stderr_output_path=str(err_path),
+    )
+    assert code == 0
+    assert err_path.read_text().endswith("late\n")
+
+
+def test_index_roundtrip(tmp_path):
+    path = tmp_path / "idx"
+    writer = StreamIndexWriter(path)
+    out, err = writer.sink(STDOUT), writer.sink(STDERR)
+    out.write(b"ab")
+    err.write(memoryview(b"XYZ"))
+    out.write(b"c")
+    out.close()
+    index = StreamIndex(path)
+    assert [(c.stream, c.offset, c.length) for c in index] == [(1, 0, 2), (2, 0, 3), (1, 2, 1)]
+    assert index.merge({STDOUT: b"abc", STDERR: b"XYZ"}) == b"abXYZc"
+    assert index.split(b"abXYZc") == {STDOUT: b"abc", STDERR: b"XYZ"}
+
+
+def test_cli_rejects_split_with_pty(tmp_path):
+    code = main(
+        ["capture", "--cmd", "true", "--engine", "pty", "--stderr", str(tmp_path / "e.log"), "--no-mirror"]
+    )
+    assert code == 2
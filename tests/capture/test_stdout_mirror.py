@@ -0,0 +1,86 @@
+import io
+import sys
+import threading
+
+from loopster.capture.sinks import StdoutMirror
+from loopster.capture.stats import CaptureStats
+
+
+class SlowStdout:
+    """Stand-in terminal whose writes block until released."""
+
+    def __init__(self):
+        self.buffer = self
+        self.data = io.BytesIO()
+        self.release = threading.Event()
+        self.entered = threading.Event()
+        self.writes = 0
+
+    def write(self, data):
+        self.entered.set()
+        self.release.wait()
+        self.writes += 1
+        self.data.write(data)
+
+    def flush(self):
+        pass
+
+
+def run_mirror(monkeypatch, policy):
+    slow = SlowStdout()
+    monkeypatch.setattr(sys, "stdout", slow)
+    stats = CaptureStats()
+    mirror = StdoutMirror(policy=policy, max_backlog=10, stats=stats)
+    mirror.write(b"first\n")
+    slow.entered.wait(5)  # the writer now holds "first" and is stuck on the terminal
+    for i in range(5):
+        mirror.write(f"line{i}\n".encode())
+    slow.release.set()
+    mirror.close()
+    return slow.data.getvalue().decode(), stats, slow
+
+
+def test_mirror_coalesces_writes(monkeypatch):
+    slow = SlowStdout()
+    monkeypatch.setattr(sys, "stdout", slow)
+    mirror = StdoutMirror()
+    mirror.write(b"x")
+    slow.entered.wait(5)  # the writer is stuck on the first chunk
+    for i in range(99):
+        mirror.write(b"x")
+    slow.release.set()
+    mirror.close()
+    assert slow.data.getvalue() == b"x" * 100
+    # Everything queued behind the blocked write goes out in one more write
+    assert slow.writes == 2
+
+
+def test_drop_policy_keeps_oldest_and_marks_gap(monkeypatch):
+    out, stats, _ = run_mirror(monkeypatch, "drop")
+    assert out.startswith("first\nline0\n")
+    assert "line4" not in out
+    assert "[loopster] mirror fell behind; skipped" in out
+    assert stats.mirror_dropped_bytes > 0
+
+
+def test_summarize_policy_jumps_to_newest(monkeypatch):
+    out, stats, _ = run_mirror(monkeypatch, "summarize")
+    assert out.startswith("first\n")
+    assert "line0" not in out
+    assert out.rstrip().endswith("line4")
+    assert "lines (" in out
+    assert stats.mirror_dropped_bytes > 0
+
+
+def test_block_policy_loses_nothing(monkeypatch):
+    slow = SlowStdout()
+    monkeypatch.setattr(sys, "stdout", slow)
+    mirror = StdoutMirror(policy="block", max_backlog=10)
+    writer = threading.Thread(target=lambda: [mirror.write(f"line{i}\n".encode()) for i in range(5)])
+    writer.start()
+    writer.join(0.2)
+    assert writer.is_alive()  # producer is held back by the slow terminal
+    slow.release.set()
+    writer.join()
+    mirror.close()
+    assert slow.data.getvalue().decode() == "".join(f"line{i}\n" for i in range(5))
@@ -0,0 +1,71 @@
+import time
+
+from loopster.capture.inputs import WRITE_SIZE, iter_input_items
+from loopster.capture.pipe_capture import capture_command
+from loopster.cli import main
+
+
+def test_large_input_does_not_deadlock(tmp_path):
+    # cat echoes stdin straight back: writing all 4 MB up front would block
+    # once both pipes are full. The selector feeds stdin as output drains.
+    size = 4 * 1024 * 1024
+    line = b"x" * 1023 + b"\n"
+    raw_path = tmp_path / "session.raw"
+    code = capture_command(
+        "cat",
+        str(tmp_path / "session.log"),
+        inputs=(line for _ in range(size // len(line))),
+        timeout=60,
+        mirror_to_stdout=False,
+        raw_output_path=str(raw_path),
+    )
+    assert code == 0
+    assert raw_path.read_bytes().endswith(line * 4)
+    assert raw_path.stat().st_size >= size
+
+
+def test_input_file_is_read_in_blocks(tmp_path):
+    feed = tmp_path / "in.bin"
+    feed.write_bytes(b"x" * (3 * WRITE_SIZE + 10))
+    assert [len(b) for b in iter_input_items(input_file=str(feed))] == [WRITE_SIZE] * 3 + [10]
+    feed.write_bytes(b"one\ntwo\n")
+    assert list(iter_input_items(["zero\n"], input_file=str(feed), by_line=True)) == [b"zero\n", b"one\n", b"two\n"]
+
+
+def test_input_file_and_delay(tmp_path):
+    feed = tmp_path / "in.txt"
+    feed.write_text("one\ntwo\nthree\n")
+    log_path = tmp_path / "session.log"
+    start = time.monotonic()
+    code = capture_command(
+        "cat",
+        str(log_path),
+        inputs=["zero\n"],
+        input_file=str(feed),
+        input_delay=0.2,
+        mirror_to_stdout=False,
+    )
+    assert code == 0
+    # Four items, each sent after a 0.2 s wait
+    assert time.monotonic() - start >= 0.8
+    lines = [ln for ln in log_path.read_text().splitlines() if ln in {"zero", "one", "two", "three"}]
+    assert lines == ["zero", "one", "two", "three"]
+
+
+def test_cli_capture_input_file(tmp_path, capsys):
+    feed = tmp_path / "in.txt"
+    feed.write_text("hello\nexit\n")
+    out_path = tmp_path / "cap.log"
+    code = main([
+        "capture", "--cmd", "cat", "--out", str(out_path), "--no-mirror", "--input-file", str(feed)
+    ])
+    assert code == 0
+    assert "hello" in out_path.read_text()
+
+
+def test_cli_capture_missing_input_file(tmp_path, capsys):
+    out_path = tmp_path / "cap.log"
+    missing = tmp_path / "missing.txt"
+    code = main(["capture", "--cmd", "cat", "--out", str(out_path), "--no-mirror", "--input-file", str(missing)])
+    assert code == 2
+    assert f"[loopster] cannot read --input-file {missing}: No such file or directory" in capsys.readouterr().out
@@ -0,0 +1,89 @@
+import io
+import json
+
+import pytest
+
+from loopster.capture.pipe_capture import capture_command
+from loopster.capture.timeline import Timeline, TimelineSink, index_path
+from loopster.cli import main
+
+
+def _record(path, chunks):
+    sink = TimelineSink(path, command="demo", size=(10, 40))
+    for chunk in chunks:
+        sink.write(memoryview(chunk))
+    sink.close()
+
+
+@pytest.mark.parametrize("name", ["out.cast", "out.lpt"])
+def test_roundtrip_and_sanitize(tmp_path, name):
+    path = tmp_path / name
+    # The euro sign is split across two chunks
+    _record(path, [b"hello \xe2\x82", b"\xac\n", b"\x1b[31mred\x1b[0m\r\n", b"spin\rdone\n"])
+    with Timeline(path) as tl:
+        assert tl.header["width"] == 40 and tl.header["height"] == 10
+        assert tl.header["command"] == "demo"
+        data = b"".join(chunk for _, chunk in tl.events())
+        assert data == b"hello \xe2\x82\xac\n\x1b[31mred\x1b[0m\r\nspin\rdone\n"
+        assert tl.sanitize() == "hello €\nred\ndone\n"
+        times = [t for t, _ in tl.events()]
+        assert times == sorted(times)
+
+
+def test_cast_is_asciicast_v2(tmp_path):
+    path = tmp_path / "out.cast"
+    _record(path, [b"a\n", b"b\n"])
+    lines = path.read_text().splitlines()
+    assert json.loads(lines[0])["version"] == 2
+    events = [json.loads(line) for line in lines[1:]]
+    assert [e[1:] for e in events] == [["o", "a\n"], ["o", "b\n"]]
+
+
+@pytest.mark.parametrize("name", ["out.cast", "out.lpt"])
+def test_slice_by_time(tmp_path, name, monkeypatch):
+    clock = iter(float(n) for n in range(100))
+    monkeypatch.setattr("loopster.capture.timeline.time.monotonic", lambda: next(clock))
+    path = tmp_path / name
+    _record(path, [f"line {n}\n".encode() for n in range(10)])
+    with Timeline(path) as tl:
+        assert len(tl) == 10
+        assert tl.duration == 10.0
+        assert [c for _, c in tl.events(3.0, 6.0)] == [b"line 2\n", b"line 3\n", b"line 4\n"]
+        assert tl.sanitize(start=9.5) == "line 9\n"
+        assert list(tl.events(start=50.0)) == []
+
+    # Without the index the reader rebuilds it by scanning
+    index_path(path).unlink()
+    with Timeline(path) as tl:
+        assert [c for _, c in tl.events(3.0, 4.0)] == [b"line 2\n"]
+
+
+def test_replay_writes_range(tmp_path):
+    path = tmp_path / "out.lpt"
+    _record(path, [b"one\n", b"two\n"])
+    out = io.BytesIO()
+    with Timeline(path) as tl:
+        tl.replay(out, speed=0)
+    assert out.getvalue() == b"one\ntwo\n"
+
+
+def test_capture_records_timeline(tmp_path, capsys):
+    path = tmp_path / "session.cast"
+    code = capture_command(
+        "printf 'first\\n'; sleep 0.3; printf 'second\\n'",
+        str(tmp_path / "session.log"),
+        timeout=30,
+        mirror_to_stdout=False,
+        timeline_path=str(path),
+    )
+    assert code == 0
+    with Timeline(path) as tl:
+        events = list(tl.events())
+        assert tl.sanitize().endswith("first\nsecond\n")
+    assert events[-1][0] - events[0][0] >= 0.25
+
+    out = tmp_path / "clean.log"
+    assert main(["timeline", "--in", str(path), "--out", str(out)]) == 0
+    assert out.read_text().endswith("first\nsecond\n")
+    assert main(["timeline", "--in", str(path)]) == 0
+    assert f"{len(events)} chunks" in capsys.readouterr().out
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from loopster.capture.pipe_capture import capture_command
+from loopster.capture.stats import CaptureStats
+from loopster.capture.unbuffer import find_libstdbuf, unbuffer_env
+
+
+def _first_output(tmp_path, cmd, unbuffer):
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONUNBUFFERED"}
+    stats = CaptureStats()
+    log_path = tmp_path / f"{unbuffer}.log"
+    code = capture_command(
+        cmd, str(log_path), timeout=30, env=env, mirror_to_stdout=False, stats=stats, shell="non-login", unbuffer=unbuffer
+    )
+    assert code == 0
+    assert log_path.read_text() == "a\nb\n"
+    return stats.first_output_seconds
+
+
+def test_unbuffer_env():
+    env = unbuffer_env({"LD_PRELOAD": "/x.so", "KEEP": "1"})
+    assert env["PYTHONUNBUFFERED"] == "1" and env["KEEP"] == "1"
+    lib = find_libstdbuf()
+    if lib is not None:
+        assert env["LD_PRELOAD"] == f"/x.so {lib}" and env["_STDBUF_O"] == "L"
+        assert unbuffer_env(env)["LD_PRELOAD"] == env["LD_PRELOAD"]
+
+
+def test_python_child_output_arrives_early(tmp_path):
+    cmd = "python3 -c 'import time; print(\"a\"); time.sleep(1); print(\"b\")'"
+    assert _first_output(tmp_path, cmd, unbuffer=False) >= 1
+    assert _first_output(tmp_path, cmd, unbuffer=True) < 0.9
+
+
+@pytest.mark.skipif(find_libstdbuf() is None, reason="coreutils libstdbuf.so not installed")
+def test_stdio_child_output_arrives_early(tmp_path):
+    # grep block-buffers a pipe; the preloaded libstdbuf makes it line-buffered
+    cmd = "(echo a; sleep 1; echo b) | grep ."
+    assert _first_output(tmp_path, cmd, unbuffer=False) >= 1
+    assert _first_output(tmp_path, cmd, unbuffer=True) < 0.9
@@ -0,0 +1,80 @@
+import errno
+import os
+import subprocess
+import sys
+
+import pytest
+
+from loopster.capture.pipe_capture import capture_command
+from loopster.capture.stats import CaptureStats
+from loopster.capture.zerocopy import splice_available
+
+
+pytestmark = pytest.mark.skipif(not splice_available(), reason="os.splice is Linux-only")
+
+# Enough output to take many splice calls, with escapes for the sanitizer
+SCRIPT = "for i in $(seq 1 20000); do printf '\\033[1mline %d\\033[0m of output\\n' $i; done; printf 'spin\\rdone'"
+
+
+def test_zero_copy_matches_regular_capture(tmp_path, monkeypatch):
+    calls = []
+    splice = os.splice
+    monkeypatch.setattr(os, "splice", lambda *a, **k: calls.append(1) or splice(*a, **k))
+    logs = {}
+    for zero_copy in (False, True):
+        stats = CaptureStats()
+        log_path = tmp_path / f"{zero_copy}.log"
+        raw_path = tmp_path / f"{zero_copy}.raw"
+        code = capture_command(
+            SCRIPT,
+            str(log_path),
+            timeout=60,
+            mirror_to_stdout=False,
+            raw_output_path=str(raw_path),
+            prepend_header="[loopster] header",
+            shell="non-login",
+            stats=stats,
+            zero_copy=zero_copy,
+        )
+        assert code == 0
+        assert stats.bytes_read == raw_path.stat().st_size
+        logs[zero_copy] = (log_path.read_bytes(), raw_path.read_bytes())
+    assert calls
+    assert logs[True] == logs[False]
+    assert logs[True][0].startswith(b"[loopster] header\nline 1 of output\n")
+    assert logs[True][0].endswith(b"line 20000 of output\ndone")
+
+
+def test_falls_back_without_raw_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "splice", None)
+    code = capture_command(
+        "echo hi", str(tmp_path / "s.log"), timeout=30, mirror_to_stdout=False, shell="non-login", zero_copy=True
+    )
+    assert code == 0
+    assert (tmp_path / "s.log").read_text() == "hi\n"
+
+
+MIRROR = """
+import os, sys
+from loopster.capture.pipe_capture import capture_command
+if sys.argv[2] == "no-sendfile":
+    def sendfile(*args):
+        raise OSError({einval}, "no sendfile to this file")
+    os.sendfile = sendfile
+sys.exit(capture_command({script!r}, sys.argv[1] + "/s.log", raw_output_path=sys.argv[1] + "/s.raw",
+                         shell="non-login", zero_copy=True))
+"""
+
+
+@pytest.mark.parametrize("mode", ["sendfile", "no-sendfile"])
+def test_mirror_gets_every_byte(tmp_path, mode):
+    code = MIRROR.format(einval=errno.EINVAL, script=SCRIPT)
+    proc = subprocess.run(
+        [sys.executable, "-c", code, str(tmp_path), mode],
+        stdout=subprocess.PIPE,
+        timeout=60,
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    )
+    assert proc.returncode == 0
+    assert proc.stdout == (tmp_path / "s.raw").read_bytes()
+    assert len(proc.stdout) > 500_000
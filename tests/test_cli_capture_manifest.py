@@ -0,0 +1,151 @@
+import io
+from contextlib import redirect_stdout
+
+import pytest
+
+from loopster.capture.manifest import parse_manifest
+from loopster.cli import main
+
+
+def run_cli(args):
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        code = main(args)
+    return code, buf.getvalue()
+
+
+def test_capture_manifest_runs_all_jobs(tmp_path):
+    manifest = tmp_path / "jobs.toml"
+    manifest.write_text(
+        f"""
+timeout = 20
+
+[[job]]
+cmd = "echo one"
+log = "{tmp_path / 'one.log'}"
+
+[[job]]
+cmd = "cat"
+log = "{tmp_path / 'two.log'}"
+inputs = ["two\\n"]
+
+[[job]]
+cmd = "echo three; exit 5"
+log = "{tmp_path / 'three.log'}"
+raw = "{tmp_path / 'three.raw'}"
+"""
+    )
+    code, out = run_cli(["capture", "--manifest", str(manifest), "--max-parallel", "2"])
+    assert code == 5
+    assert "finished 3 jobs, 1 failed" in out
+    assert "one" in (tmp_path / "one.log").read_text()
+    assert "two" in (tmp_path / "two.log").read_text()
+    assert "three" in (tmp_path / "three.raw").read_text()
+
+
+def test_parse_manifest_defaults_and_validation():
+    jobs = parse_manifest({"timeout": 3, "job": [{"cmd": "true", "log": "a.log"}]})
+    assert jobs[0].timeout == 3.0
+    assert jobs[0].inputs == []
+    with pytest.raises(ValueError):
+        parse_manifest({"job": [{"cmd": "true"}]})
+    with pytest.raises(ValueError):
+        parse_manifest({})
+
+
+def test_capture_manifest_invalid_file(tmp_path):
+    manifest = tmp_path / "jobs.toml"
+    manifest.write_text("[[job]]\ncmd = 'true'\n")
+    code, out = run_cli(["capture", "--manifest", str(manifest)])
+    assert code == 2
+    assert "invalid manifest" in out
+
+
+def test_parse_manifest_rejects_boolean_timeout():
+    with pytest.raises(ValueError, match="'timeout' must be a number"):
+        parse_manifest({"timeout": True, "job": [{"cmd": "true", "log": "a.log"}]})
+    with pytest.raises(ValueError, match="job 1: 'timeout'"):
+        parse_manifest({"job": [{"cmd": "true", "log": "a.log", "timeout": False}]})
+
+
+def test_manifest_paths_are_relative_to_the_manifest(tmp_path, monkeypatch):
+    jobs_dir = tmp_path / "jobs"
+    jobs_dir.mkdir()
+    (jobs_dir / "in.txt").write_text("fed\n")
+    manifest = jobs_dir / "jobs.toml"
+    manifest.write_text(
+        '[[job]]\ncmd = "cat"\nlog = "logs/one.log"\nraw = "one.raw"\ninput_file = "in.txt"\n'
+        f'[[job]]\ncmd = "echo two"\nlog = "{tmp_path / "two.log"}"\n'
+    )
+    monkeypatch.chdir(tmp_path)
+    code, out = run_cli(["capture", "--manifest", "jobs/jobs.toml"])
+    assert code == 0, out
+    assert "fed" in (jobs_dir / "logs" / "one.log").read_text()
+    assert (jobs_dir / "one.raw").read_bytes().endswith(b"fed\n")
+    assert "two" in (tmp_path / "two.log").read_text()
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        ["--cmd", "true"],
+        ["--engine", "pty"],
+        ["--timeout", "5"],
+        ["--raw", "x.raw"],
+        ["--no-mirror"],
+        ["--pipeline"],
+        ["--stats", "s.json"],
+        ["--usage", "u.json"],
+        ["--mirror-policy", "drop"],
+    ],
+)
+def test_manifest_rejects_single_capture_flags(tmp_path, extra):
+    manifest = tmp_path / "jobs.toml"
+    manifest.write_text(f'[[job]]\ncmd = "true"\nlog = "{tmp_path / "a.log"}"\n')
+    code, out = run_cli(["capture", "--manifest", str(manifest)] + extra)
+    assert code == 2
+    assert f"drop {extra[0]}" in out
+    assert not (tmp_path / "a.log").exists()
+
+
+@pytest.mark.parametrize("mode", [["--shell", "non-login"], ["--exec"]])
+def test_manifest_jobs_honor_the_shell_mode(tmp_path, mode):
+    manifest = tmp_path / "jobs.toml"
+    manifest.write_text(f'[[job]]\ncmd = "printf \'%s\\\\n\' \'a b\'"\nlog = "one.log"\n')
+    code, out = run_cli(["capture", "--manifest", str(manifest)] + mode)
+    assert code == 0, out
+    # No login profile in front of the output
+    assert (tmp_path / "one.log").read_text() == "a b\n"
+
+
+def test_manifest_job_errors_do_not_stop_the_others(tmp_path):
+    (tmp_path / "taken").mkdir()
+    manifest = tmp_path / "jobs.toml"
+    manifest.write_text(
+        '[[job]]\ncmd = "no-such-program-xyz"\nlog = "one.log"\n'
+        '[[job]]\ncmd = "echo two"\nlog = "taken"\n'
+        '[[job]]\ncmd = "echo three"\nlog = "three.log"\n'
+    )
+    code, out = run_cli(["capture", "--manifest", str(manifest), "--exec", "--include-invocation"])
+    assert code == 127
+    assert "job 1: cannot execute 'no-such-program-xyz'" in out
+    assert "job 1: exit code 127" in out
+    assert "job 2: exit code 1" in out
+    assert "finished 3 jobs, 2 failed" in out
+    assert (tmp_path / "three.log").read_text() == (
+        f"[loopster] capturing: echo three\n[loopster] log: {tmp_path / 'three.log'}\nthree\n"
+    )
+
+
+def test_manifest_reports_a_failed_login_env_snapshot(tmp_path, monkeypatch):
+    from loopster.capture import login_env
+
+    def fail(refresh=False):
+        raise RuntimeError("login shell exited with 1")
+
+    monkeypatch.setattr(login_env, "login_env", fail)
+    manifest = tmp_path / "jobs.toml"
+    manifest.write_text('[[job]]\ncmd = "true"\nlog = "a.log"\n')
+    code, out = run_cli(["capture", "--manifest", str(manifest), "--shell", "cached-login"])
+    assert code == 2
+    assert "could not snapshot the login environment: login shell exited with 1" in out
@@ -0,0 +1,111 @@
+import gzip
+import lzma
+
+import pytest
+
+from loopster.capture.ansi_clean import sanitize_ansi
+from loopster.capture.pipe_capture import capture_command
+from loopster.capture.sinks import CleanLogSink, RawLogSink
+from loopster.cli import main
+from loopster.compression import codec_for, open_output, read_bytes, read_text, sniff_codec
+from loopster.llm.client import LLMClient
+
+
+@pytest.mark.parametrize("name,codec", [("a.log.gz", "gzip"), ("a.log.xz", "xz"), ("a.log.bz2", "bz2")])
+def test_roundtrip_by_extension(tmp_path, name, codec):
+    path = tmp_path / name
+    assert codec_for(path) == codec
+    with open_output(path) as fh:
+        fh.write(b"line\r\n" * 1000)
+    assert sniff_codec(path) == codec
+    assert path.stat().st_size < 200
+    assert read_bytes(path) == b"line\r\n" * 1000
+    assert read_text(path) == "line\n" * 1000
+
+
+def test_plain_files_pass_through(tmp_path):
+    path = tmp_path / "a.log"
+    with open_output(path) as fh:
+        fh.write(b"plain\n")
+    assert codec_for(path) is None and sniff_codec(path) is None
+    assert read_text(path) == "plain\n"
+
+
+def test_sinks_compress_as_they_stream(tmp_path):
+    raw = RawLogSink(tmp_path / "s.raw.gz", fsync_interval=0)
+    clean = CleanLogSink(tmp_path / "s.log.xz", header="header")
+    for _ in range(100):
+        chunk = memoryview(b"\x1b[2K\rredraw\x1b[32m ok\x1b[0m\n")
+        raw.write(chunk)
+        clean.write(chunk)
+    raw.close()
+    clean.close()
+    assert gzip.decompress((tmp_path / "s.raw.gz").read_bytes()) == b"\x1b[2K\rredraw\x1b[32m ok\x1b[0m\n" * 100
+    assert lzma.decompress((tmp_path / "s.log.xz").read_bytes()).decode() == "header\n" + "redraw ok\n" * 100
+
+
+def test_capture_and_sanitize_compressed(tmp_path):
+    raw_path = tmp_path / "session.raw.gz"
+    code = capture_command(
+        "printf '\\033[31mred\\033[0m\\n'",
+        str(tmp_path / "session.log.gz"),
+        timeout=30,
+        mirror_to_stdout=False,
+        raw_output_path=str(raw_path),
+    )
+    assert code == 0
+    assert read_text(tmp_path / "session.log.gz").endswith("red\n")
+    assert read_bytes(raw_path).endswith(b"\x1b[31mred\x1b[0m\n")
+
+    out = tmp_path / "clean.log.bz2"
+    assert main(["sanitize", "--raw", str(raw_path), "--out", str(out)]) == 0
+    assert sniff_codec(out) == "bz2"
+    assert read_text(out).endswith("red\n")
+
+
+def test_extension_decides_before_magic_bytes(tmp_path):
+    empty = tmp_path / "new.log.gz"
+    empty.write_bytes(b"")
+    assert sniff_codec(empty) == "gzip"
+    unnamed = tmp_path / "session.raw"
+    unnamed.write_bytes(gzip.compress(b"x"))
+    assert sniff_codec(unnamed) == "gzip"
+
+
+def test_open_sinks_closes_earlier_sinks_on_failure(tmp_path, monkeypatch):
+    from loopster import compression
+    from loopster.capture import sinks
+
+    closed = []
+
+    class SpyRaw(RawLogSink):
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    def no_zstd():
+        raise RuntimeError(".zst files need Python 3.14+ or the 'zstandard' package")
+
+    monkeypatch.setattr(sinks, "RawLogSink", SpyRaw)
+    monkeypatch.setattr(compression, "_zstd_open", no_zstd)
+    with pytest.raises(RuntimeError, match="zstandard"):
+        sinks.open_sinks(str(tmp_path / "s.log.zst"), raw_output_path=str(tmp_path / "s.raw"), mirror_to_stdout=False)
+    assert len(closed) == 1
+
+
+def test_sanitize_streams_large_compressed_raw(tmp_path):
+    raw = "".join(f"\x1b[32mline {n}\x1b[0m\rLINE {n}\n" for n in range(100000)) + "\x1b]0;t\x07é tail"
+    raw_path = tmp_path / "big.raw.gz"
+    raw_path.write_bytes(gzip.compress(raw.encode()))
+    out = tmp_path / "big.log"
+    assert main(["sanitize", "--raw", str(raw_path), "--out", str(out)]) == 0
+    assert out.read_text() == sanitize_ansi(raw)
+    assert main(["sanitize", "--raw", str(tmp_path / "missing.raw"), "--out", str(out)]) == 2
+
+
+def test_llm_files_are_decompressed(tmp_path):
+    path = tmp_path / "session.log.gz"
+    path.write_bytes(gzip.compress(b"did things\n"))
+    assert LLMClient._read_files([path]) == [(str(path), "did things\n")]
+    code = main(["summarize", "--log", str(path), "--model", "fake:test"])
+    assert code == 0